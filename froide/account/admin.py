@@ -38,7 +38,12 @@ from .models import (
     annotate_deterministic_email,
 )
 from .services import AccountService
-from .tasks import merge_accounts_task, send_bulk_mail, start_export_task
+from .tasks import (
+    block_blocklisted_users_task,
+    merge_accounts_task,
+    send_bulk_mail,
+    start_export_task,
+)
 from .utils import (
     delete_all_unexpired_sessions_for_user,
     future_cancel_user,
@@ -429,6 +434,19 @@ class UserAdmin(RecentAuthRequiredAdminMixin, DjangoUserAdmin):
 @admin.register(AccountBlocklist)
 class AccountBlocklistAdmin(admin.ModelAdmin):
     search_fields = ("name",)
+    actions = ["block_matching_users"]
+
+    @admin.action(description=_("Block existing users matching these entries"))
+    def block_matching_users(self, request, queryset):
+        block_blocklisted_users_task.delay(
+            list(queryset.values_list("id", flat=True)),
+            notification_user_id=request.user.id,
+        )
+        self.message_user(
+            request,
+            _("Blocking matching users started, you will get an email when done."),
+        )
+        return None
 
 
 @admin.register(UserPreference)
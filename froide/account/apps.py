@@ -16,10 +16,16 @@ class AccountConfig(AppConfig):
 
     def ready(self):
         from django.contrib.auth.signals import user_logged_in
+        from django.db.models.signals import post_delete, post_save
 
         from froide.bounce.signals import user_email_bounced
 
+        from .blocklist import invalidate_blocklist
+        from .models import AccountBlocklist
+
         user_email_bounced.connect(deactivate_user_after_bounce)
+        post_save.connect(invalidate_blocklist, sender=AccountBlocklist)
+        post_delete.connect(invalidate_blocklist, sender=AccountBlocklist)
 
         menu_registry.register(get_settings_menu_item)
         menu_registry.register(get_request_menu_item)
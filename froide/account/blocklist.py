@@ -0,0 +1,124 @@
+"""
+Compiled matcher for account blocklist entries.
+
+The patterns of all entries are combined into one regex per field and
+kept per process. Saving or deleting entries bumps a version in the
+shared cache (see apps.py), so every process rebuilds its matcher on
+the next check. The version also expires, so processes that don't share
+a cache (e.g. with LocMemCache) rebuild within BLOCKLIST_VERSION_TIMEOUT.
+"""
+
+import logging
+import re
+import time
+from typing import Iterable, Iterator, List, Optional, Pattern, Tuple
+
+from django.core.cache import cache
+
+from froide.helper.text_utils import UNCOMBINABLE_RE
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_VERSION_KEY = "froide:account:blocklist_version"
+BLOCKLIST_VERSION_TIMEOUT = 5 * 60
+BLOCKLIST_FLAGS = re.I | re.S
+BLOCKLIST_FIELDS = ("address", "email", "full_name")
+BLOCKLIST_CHUNK_SIZE = 2000
+
+
+class FieldMatcher:
+    """
+    Matches a value against the pattern lines of one field of all entries
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        combinable: List[str] = []
+        self.separate: List[Pattern[str]] = []
+        for line in lines:
+            # An empty line would match everything
+            if not line:
+                continue
+            try:
+                regex = re.compile(line, BLOCKLIST_FLAGS)
+            except re.error:
+                logger.warning("Invalid account blocklist pattern %r", line)
+                continue
+            if UNCOMBINABLE_RE.search(line):
+                self.separate.append(regex)
+            else:
+                combinable.append(line)
+
+        self.combined: Optional[Pattern[str]] = None
+        if combinable:
+            try:
+                self.combined = re.compile(
+                    "|".join("(?:%s)" % line for line in combinable), BLOCKLIST_FLAGS
+                )
+            except re.error:
+                # e.g. the same group name in different lines
+                self.separate.extend(
+                    re.compile(line, BLOCKLIST_FLAGS) for line in combinable
+                )
+
+    def match(self, value: Optional[str]) -> bool:
+        value = value or ""
+        if self.combined is not None and self.combined.search(value):
+            return True
+        return any(regex.search(value) for regex in self.separate)
+
+
+class BlocklistMatcher:
+    def __init__(self, entries: Iterable[Tuple[str, str, str]]):
+        lines = {field: [] for field in BLOCKLIST_FIELDS}
+        for entry in entries:
+            for field, content in zip(BLOCKLIST_FIELDS, entry, strict=True):
+                lines[field].extend(content.splitlines())
+        self.fields = {field: FieldMatcher(lines[field]) for field in BLOCKLIST_FIELDS}
+
+    def match_address(self, address: str) -> bool:
+        return self.fields["address"].match(address)
+
+    def match_user(self, user) -> bool:
+        return (
+            self.fields["address"].match(user.address)
+            or self.fields["email"].match(user.email)
+            or self.fields["full_name"].match(user.get_full_name())
+        )
+
+    def filter_users(self, users) -> Iterator:
+        """
+        Yield the users of a queryset that match the blocklist
+        """
+        users = users.only("id", "address", "email", "first_name", "last_name")
+        for user in users.iterator(chunk_size=BLOCKLIST_CHUNK_SIZE):
+            if self.match_user(user):
+                yield user
+
+
+def get_blocklist_version() -> str:
+    version = cache.get(BLOCKLIST_VERSION_KEY)
+    if version is None:
+        version = str(time.time_ns())
+        if not cache.add(BLOCKLIST_VERSION_KEY, version, BLOCKLIST_VERSION_TIMEOUT):
+            version = cache.get(BLOCKLIST_VERSION_KEY, version)
+    return version
+
+
+def invalidate_blocklist(**kwargs) -> None:
+    cache.set(BLOCKLIST_VERSION_KEY, str(time.time_ns()), BLOCKLIST_VERSION_TIMEOUT)
+
+
+_matcher: Optional[Tuple[str, BlocklistMatcher]] = None
+
+
+def get_blocklist_matcher() -> BlocklistMatcher:
+    from .models import AccountBlocklist
+
+    global _matcher
+
+    # Read the version before the entries, a concurrent change bumps it again
+    version = get_blocklist_version()
+    if _matcher is None or _matcher[0] != version:
+        entries = AccountBlocklist.objects.values_list(*BLOCKLIST_FIELDS)
+        _matcher = (version, BlocklistMatcher(entries))
+    return _matcher[1]
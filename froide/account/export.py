@@ -1,11 +1,21 @@
 import json
+import logging
 import os
+import shutil
 import tempfile
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
 
 from django.conf import settings
+from django.core.files import File
 from django.core.files.storage import default_storage
+from django.db import connections
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
@@ -19,16 +29,70 @@ from froide.helper.csv_utils import get_dict
 from .tasks import start_export_task
 from .utils import send_mail_user
 
+logger = logging.getLogger(__name__)
+
 PURPOSE = "dataexport"
 EXPORT_MEDIA_PREFIX = "export"
 EXPORT_MAX_AGE = timedelta(days=7)
 EXPORT_LIMIT = timedelta(hours=6)
 
+# Exporters yield (path, content) where content is bytes,
+# a file path or an iterable of bytes chunks
+ExportContent = Union[bytes, os.PathLike, Iterable[bytes]]
+
 
 def get_path(token):
     return os.path.join(EXPORT_MEDIA_PREFIX, "{}.zip".format(token))
 
 
+def json_array(items: Iterable) -> Iterator[bytes]:
+    """
+    Encode items as a JSON array without building the whole document in memory,
+    the result is the same as json.dumps(list(items))
+    """
+    yield b"["
+    for index, item in enumerate(items):
+        if index:
+            yield b", "
+        yield json.dumps(item).encode("utf-8")
+    yield b"]"
+
+
+@dataclass
+class ExporterTiming:
+    name: str
+    file_count: int
+    duration: float
+
+
+class ExportWriter:
+    def __init__(self, zfile: zipfile.ZipFile, concurrent: bool = False):
+        self.zfile = zfile
+        self.concurrent = concurrent
+        self.lock = threading.Lock()
+
+    def write(self, path: str, content: ExportContent):
+        arcname = os.path.join("export", path)
+        if isinstance(content, bytes):
+            with self.lock:
+                self.zfile.writestr(arcname, content)
+        elif isinstance(content, os.PathLike):
+            with self.lock:
+                self.zfile.write(content, arcname)
+        elif self.concurrent:
+            # Spool chunks outside of the lock so other exporters can proceed
+            with tempfile.TemporaryFile() as spool:
+                for chunk in content:
+                    spool.write(chunk)
+                spool.seek(0)
+                with self.lock, self.zfile.open(arcname, "w") as zf:
+                    shutil.copyfileobj(spool, zf)
+        else:
+            with self.zfile.open(arcname, "w") as zf:
+                for chunk in content:
+                    zf.write(chunk)
+
+
 class ExportRegistry:
     def __init__(self):
         self.callbacks = []
@@ -41,6 +105,40 @@ class ExportRegistry:
         for callback in self.callbacks:
             yield from callback(user)
 
+    def run_exporter(self, callback, user, writer: ExportWriter) -> ExporterTiming:
+        start = time.monotonic()
+        file_count = 0
+        try:
+            for path, content in callback(user):
+                writer.write(path, content)
+                file_count += 1
+        finally:
+            if writer.concurrent:
+                # Worker threads open their own database connections
+                connections.close_all()
+        return ExporterTiming(
+            name="{}.{}".format(callback.__module__, callback.__name__),
+            file_count=file_count,
+            duration=time.monotonic() - start,
+        )
+
+    def write_export(
+        self, user, zfile: zipfile.ZipFile, max_workers: int = 1
+    ) -> List[ExporterTiming]:
+        if max_workers <= 1:
+            writer = ExportWriter(zfile)
+            return [
+                self.run_exporter(callback, user, writer) for callback in self.callbacks
+            ]
+
+        writer = ExportWriter(zfile, concurrent=True)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.run_exporter, callback, user, writer)
+                for callback in self.callbacks
+            ]
+            return [future.result() for future in futures]
+
 
 def request_export(user):
     from froide.accesstoken.models import AccessToken
@@ -124,25 +222,30 @@ def create_export(user, notification_user=None):
 
     export_file = tempfile.NamedTemporaryFile(delete=False)
     try:
-        zfile = zipfile.ZipFile(export_file, "w")
-        for path, filebytes in registry.get_export_files(user):
-            zfile.writestr(os.path.join("export", path), filebytes)
+        with zipfile.ZipFile(export_file, "w") as zfile:
+            timings = registry.write_export(
+                user, zfile, max_workers=settings.ACCOUNT_EXPORT_WORKERS
+            )
     except Exception:
-        zfile.close()
         export_file.close()
         os.remove(export_file.name)
         raise
-    finally:
-        try:
-            zfile.close()
-        except ValueError:
-            pass
+
+    for timing in timings:
+        logger.info(
+            "Export of user %s: %s wrote %d files in %.2fs",
+            user.id,
+            timing.name,
+            timing.file_count,
+            timing.duration,
+        )
 
     export_file.flush()
     export_file.seek(0)
 
     path = get_path(token)
-    default_storage.save(path, export_file)
+    # Storage copies the file in chunks
+    default_storage.save(path, File(export_file, name=path))
 
     export_file.close()
     os.remove(export_file.name)
@@ -165,6 +268,7 @@ def create_export(user, notification_user=None):
         },
     )
     send_mail_user(_("Your data export is ready"), body, notification_user)
+    return timings
 
 
 registry = ExportRegistry()
@@ -207,8 +311,7 @@ def export_user_data(user):
     yield ("account.json", json.dumps(user_data).encode("utf-8"))
     if user.profile_photo:
         filename = os.path.basename(user.profile_photo.path)
-        with open(user.profile_photo.path, "rb") as f:
-            yield (filename, f.read())
+        yield (filename, Path(user.profile_photo.path))
 
     apps = Application.objects.filter(user=user)
     if apps:
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:00
+
+import django.contrib.sessions.base_session
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations, models
+from django.utils import timezone
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def get_user_id(store, session_data):
+    try:
+        return int(store.decode(session_data).get(SESSION_KEY))
+    except (TypeError, ValueError):
+        return None
+
+
+def backfill_user_sessions(apps, schema_editor):
+    Session = apps.get_model("sessions", "Session")
+    UserSession = apps.get_model("account", "UserSession")
+    store = SessionStore()
+    sessions = Session.objects.filter(expire_date__gte=timezone.now()).order_by(
+        "session_key"
+    )
+    last_key = ""
+    while True:
+        chunk = list(sessions.filter(session_key__gt=last_key)[:BACKFILL_CHUNK_SIZE])
+        if not chunk:
+            break
+        UserSession.objects.bulk_create(
+            [
+                UserSession(
+                    session_key=session.session_key,
+                    session_data=session.session_data,
+                    expire_date=session.expire_date,
+                    user_id=get_user_id(store, session.session_data),
+                )
+                for session in chunk
+            ],
+            ignore_conflicts=True,
+        )
+        last_key = chunk[-1].session_key
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0038_application_allowed_origins_and_more"),
+        ("sessions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserSession",
+            fields=[
+                (
+                    "session_key",
+                    models.CharField(
+                        max_length=40,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="session key",
+                    ),
+                ),
+                ("session_data", models.TextField(verbose_name="session data")),
+                (
+                    "expire_date",
+                    models.DateTimeField(db_index=True, verbose_name="expire date"),
+                ),
+                ("user_id", models.IntegerField(db_index=True, null=True)),
+            ],
+            options={
+                "verbose_name": "user session",
+                "verbose_name_plural": "user sessions",
+                "abstract": False,
+            },
+            managers=[
+                ("objects", django.contrib.sessions.base_session.BaseSessionManager()),
+            ],
+        ),
+        migrations.RunPython(backfill_user_sessions, migrations.RunPython.noop),
+    ]
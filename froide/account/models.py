@@ -3,7 +3,7 @@ import os
 import re
 from functools import cached_property
 from re import Pattern
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from django.conf import settings
 from django.contrib.auth.models import (
@@ -12,6 +12,7 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.sessions.base_session import AbstractBaseSession
 from django.db import models
 from django.db.models.functions import Collate
 from django.db.models.query import QuerySet
@@ -389,21 +390,29 @@ class Application(AbstractApplication):
 
 class AccountBlocklistManager(models.Manager):
     def is_blocklisted(self, user: User) -> bool:
+        from .blocklist import get_blocklist_matcher
+
         if user.is_blocked:
             return True
-
-        for entry in AccountBlocklist.objects.all():
-            match = entry.match_user(user)
-            if match:
-                return True
-        return False
+        return get_blocklist_matcher().match_user(user)
 
     def should_block_address(self, address: str) -> bool:
-        for entry in AccountBlocklist.objects.all():
-            match = entry.match_content(entry.address, address)
-            if match:
-                return True
-        return False
+        from .blocklist import get_blocklist_matcher
+
+        return get_blocklist_matcher().match_address(address)
+
+    def get_blocklisted_users(
+        self, users: QuerySet[User], entries: Optional[QuerySet] = None
+    ) -> Iterator[User]:
+        """
+        Check a queryset of users in one pass, e.g. after adding entries
+        """
+        from .blocklist import BLOCKLIST_FIELDS, BlocklistMatcher
+
+        if entries is None:
+            entries = self.get_queryset()
+        matcher = BlocklistMatcher(entries.values_list(*BLOCKLIST_FIELDS))
+        return matcher.filter_users(users)
 
 
 class AccountBlocklist(models.Model):
@@ -480,3 +489,22 @@ class UserPreference(models.Model):
 
     def __str__(self):
         return "{} ({})".format(self.key, self.user)
+
+
+class UserSession(AbstractBaseSession):
+    """
+    Database session that records the id of the logged in user,
+    so the sessions of a user can be found without decoding all of them
+    """
+
+    user_id = models.IntegerField(null=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("user session")
+        verbose_name_plural = _("user sessions")
+
+    @classmethod
+    def get_session_store_class(cls):
+        from .session_backend import SessionStore
+
+        return SessionStore
@@ -1,6 +1,5 @@
 import hashlib
 import hmac
-import re
 from datetime import timedelta
 from typing import Dict, Optional
 from urllib.parse import urlencode
@@ -15,7 +14,7 @@ from django.utils.translation import gettext_lazy as _
 from froide.accesstoken.models import AccessToken
 from froide.helper.db_utils import save_obj_unique
 from froide.helper.email_sending import mail_registry
-from froide.helper.text_utils import slugify
+from froide.helper.text_utils import get_redaction_plan, slugify
 
 from . import account_activated
 from .models import AccountBlocklist, User
@@ -331,12 +330,10 @@ class AccountService(object):
         if self.user.organization_name:
             needles.append(self.user.organization_name)
 
-        needles = [re.escape(n) for n in needles]
-
-        for needle in needles:
-            content = re.sub(needle, replacement, content, flags=re.I | re.U)
-
-        return content
+        plan = get_redaction_plan(
+            tuple((needle, replacement) for needle in needles), word_boundary=False
+        )
+        return plan.apply(content)
 
     def get_user_redactions(self, replacements: Optional[Dict[str, str]] = None):
         if self.user.is_deleted:
@@ -0,0 +1,27 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+
+def get_session_user_id(session_dict):
+    try:
+        return int(session_dict.get(SESSION_KEY))
+    except (TypeError, ValueError):
+        return None
+
+
+# Keep the class name, it is part of the signing salt of the session data
+class SessionStore(DBStore):
+    """
+    Database session engine that stores the user id next to the session
+    """
+
+    @classmethod
+    def get_model_class(cls):
+        from .models import UserSession
+
+        return UserSession
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        obj.user_id = get_session_user_id(data)
+        return obj
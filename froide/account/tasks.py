@@ -4,6 +4,7 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models.query import QuerySet
 from django.utils import translation
+from django.utils.translation import gettext as _
 
 from oauth2_provider.models import clear_expired as clear_expired_oauth2_tokens
 
@@ -131,3 +132,35 @@ def send_bulk_mail(user_ids: QuerySet, subject: str, body: str) -> None:
         users = User.objects.filter(id__in=chunk)
         for user in users:
             send_template_mail(user, subject, body, priority=False)
+
+
+@celery_app.task
+def block_blocklisted_users_task(entry_ids, notification_user_id=None):
+    from .models import AccountBlocklist
+    from .utils import send_mail_user
+
+    translation.activate(settings.LANGUAGE_CODE)
+
+    users = User.objects.filter(
+        is_blocked=False, is_trusted=False, is_staff=False, is_superuser=False
+    )
+    entries = AccountBlocklist.objects.filter(id__in=entry_ids)
+    user_ids = [
+        user.id
+        for user in AccountBlocklist.objects.get_blocklisted_users(
+            users, entries=entries
+        )
+    ]
+    User.objects.filter(id__in=user_ids).update(is_blocked=True)
+
+    if notification_user_id is not None:
+        try:
+            notification_user = User.objects.get(id=notification_user_id)
+        except User.DoesNotExist:
+            return
+        send_mail_user(
+            _("Blocklist sweep finished"),
+            _("Blocked %(count)s users matching the blocklist entries.")
+            % {"count": len(user_ids)},
+            notification_user,
+        )
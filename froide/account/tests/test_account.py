@@ -1,4 +1,6 @@
+import json
 import re
+import zipfile
 from datetime import datetime, timedelta
 from unittest import mock
 from urllib.parse import urlencode
@@ -9,6 +11,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.messages.storage import default_storage
 from django.core import mail
 from django.db import IntegrityError
+from django.test import Client
 from django.test.utils import override_settings
 from django.urls import reverse
 from django.utils.html import escape
@@ -22,9 +25,15 @@ from froide.foirequestfollower.models import FoiRequestFollower
 from froide.publicbody.models import PublicBody
 
 from ..admin import UserAdmin
-from ..models import AccountBlocklist
+from ..export import ExportRegistry, json_array
+from ..models import AccountBlocklist, UserSession
 from ..services import AccountService
-from ..utils import merge_accounts
+from ..tasks import block_blocklisted_users_task
+from ..utils import (
+    all_unexpired_sessions_for_user,
+    delete_all_unexpired_sessions_for_user,
+    merge_accounts,
+)
 
 User = get_user_model()
 
@@ -759,6 +768,45 @@ def test_signup_blocklisted(world, client):
     assert user.is_blocked
 
 
+@pytest.mark.django_db
+def test_blocklist_matcher():
+    user = factories.UserFactory.create(email="spam.bot@example.org")
+    other_user = factories.UserFactory.create()
+    users = User.objects.filter(id__in=[user.id, other_user.id])
+    assert not AccountBlocklist.objects.is_blocklisted(user)
+
+    entry = AccountBlocklist.objects.create(
+        name="Spam", email="^spam\\.\n^nobody@", address="Nowhere 1\n\n"
+    )
+    assert AccountBlocklist.objects.is_blocklisted(user)
+    assert not AccountBlocklist.objects.is_blocklisted(other_user)
+    assert AccountBlocklist.objects.should_block_address("nowhere 1, Town")
+    assert not AccountBlocklist.objects.should_block_address("Dummystreet5")
+    assert list(AccountBlocklist.objects.get_blocklisted_users(users)) == [user]
+
+    entry.delete()
+    assert not AccountBlocklist.objects.is_blocklisted(user)
+
+
+@pytest.mark.django_db
+def test_block_blocklisted_users_task():
+    user = factories.UserFactory.create(email="spam.bot@example.org")
+    other_user = factories.UserFactory.create()
+    admin_user = factories.UserFactory.create(is_staff=True)
+    entry = AccountBlocklist.objects.create(name="Spam", email="^spam\\.")
+    mail.outbox = []
+
+    block_blocklisted_users_task([entry.id], notification_user_id=admin_user.id)
+
+    user.refresh_from_db()
+    other_user.refresh_from_db()
+    assert user.is_blocked
+    assert not other_user.is_blocked
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == [admin_user.email]
+    assert "Blocked 1 users" in mail.outbox[0].body
+
+
 @pytest.mark.django_db
 def test_send_mail(world, rf):
     user = User.objects.get(username="sw")
@@ -814,3 +862,48 @@ def test_multipart_name_redaction():
     repl = "NAME"
     redacted_name = account_service.apply_name_redaction(name, repl)
     assert redacted_name == "Reply-NAME-NAME-NAME.pdf"
+
+
+@pytest.mark.django_db
+def test_delete_sessions_for_user(client):
+    user = factories.UserFactory.create()
+    other_user = factories.UserFactory.create()
+    client.force_login(user)
+    other_client = Client()
+    other_client.force_login(other_user)
+
+    session = UserSession.objects.get(pk=client.session.session_key)
+    assert session.user_id == user.id
+    assert list(all_unexpired_sessions_for_user(user)) == [session]
+
+    delete_all_unexpired_sessions_for_user(user)
+    assert not UserSession.objects.filter(user_id=user.id).exists()
+    assert UserSession.objects.filter(user_id=other_user.id).exists()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_export_registry_content_types(tmp_path, max_workers):
+    file_path = tmp_path / "photo.jpg"
+    file_path.write_bytes(b"photo")
+    export_registry = ExportRegistry()
+
+    @export_registry.register
+    def export_bytes(user):
+        yield ("account.json", b"{}")
+        yield ("photo.jpg", file_path)
+
+    @export_registry.register
+    def export_chunks(user):
+        yield ("events.json", json_array({"id": i} for i in range(3)))
+
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as zfile:
+        timings = export_registry.write_export(None, zfile, max_workers=max_workers)
+
+    assert [t.file_count for t in timings] == [2, 1]
+    with zipfile.ZipFile(zip_path) as zfile:
+        assert zfile.read("export/account.json") == b"{}"
+        assert zfile.read("export/photo.jpg") == b"photo"
+        assert zfile.read("export/events.json") == json.dumps(
+            [{"id": i} for i in range(3)]
+        ).encode("utf-8")
@@ -2,6 +2,7 @@ import re
 from datetime import timedelta
 from typing import Any, Dict, Optional, Tuple, Union
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sessions.models import Session
 from django.db import transaction
@@ -17,6 +18,7 @@ from froide.helper.email_sending import (
 )
 
 from . import account_canceled, account_future_canceled, account_merged
+from .models import UserSession
 from .tasks import make_account_private_task
 
 POSTCODE_RE = re.compile(r"(\d{5})\s+(.*)")
@@ -25,6 +27,7 @@ TRAILING_COMMA = re.compile(r"\s*,\s*$")
 EXPIRE_UNCONFIRMED_USERS_AGE = timedelta(days=30)
 CANCEL_DEACTIVATED_USERS_AGE = timedelta(days=100)
 FUTURE_CANCEL_PERIOD = timedelta(days=31)
+USER_SESSION_ENGINE = "froide.account.session_backend"
 
 User = get_user_model()
 
@@ -135,8 +138,13 @@ def move_ownership(
 
 
 def all_unexpired_sessions_for_user(user: Union[SimpleLazyObject, User]) -> QuerySet:
+    now = timezone.now()
+    if settings.SESSION_ENGINE == USER_SESSION_ENGINE:
+        return UserSession.objects.filter(user_id=user.pk, expire_date__gte=now)
+
+    # Other database session engines need to decode every session
     user_sessions = []
-    all_sessions = Session.objects.filter(expire_date__gte=timezone.now())
+    all_sessions = Session.objects.filter(expire_date__gte=now)
     for session in all_sessions:
         session_data = session.get_decoded()
         if str(user.pk) == str(session_data.get("_auth_user_id")):
@@ -149,7 +157,7 @@ def delete_all_unexpired_sessions_for_user(
 ) -> None:
     session_list = all_unexpired_sessions_for_user(user)
     if session_to_omit is not None:
-        session_list.exclude(session_key=session_to_omit.session_key)
+        session_list = session_list.exclude(session_key=session_to_omit.session_key)
     session_list.delete()
 
 
@@ -1,6 +1,7 @@
 import os
 
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.db.models import signals
 from django.utils.translation import activate
 
@@ -76,6 +77,12 @@ def set_default_language():
     activate("en")
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Cached lookups must not leak between rolled back tests
+    cache.clear()
+
+
 @pytest.fixture(autouse=True)
 def email_always_send(monkeypatch, request):
     """Instantly mark all messages as delivered"""
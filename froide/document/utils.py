@@ -1,8 +1,9 @@
-from froide.helper.tasks import search_instance_save
+from froide.helper.search.index_queue import search_index_queue
 
 from .models import Document
 
 
 def update_document_index(document: Document) -> None:
-    for pk in document.pages.all().values_list("id", flat=True):
-        search_instance_save.delay("filingcabinet.page", pk)
+    search_index_queue.add(
+        "filingcabinet.page", document.pages.all().values_list("id", flat=True)
+    )
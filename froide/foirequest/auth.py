@@ -1,8 +1,8 @@
-from functools import lru_cache
-from typing import List
+from functools import partial
+from typing import Iterable, List
 
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from django.http import HttpRequest
 from django.test import RequestFactory
 from django.urls import reverse
@@ -18,6 +18,7 @@ from rest_framework.viewsets import ViewSet
 from froide.helper.auth import (
     can_manage_object,
     can_moderate_object,
+    can_read_many,
     can_read_object,
     can_write_object,
     check_permission,
@@ -25,6 +26,7 @@ from froide.helper.auth import (
     get_write_queryset,
     has_authenticated_access,
     make_q,
+    request_cached,
 )
 
 from .models import FoiAttachment, FoiMessage, FoiProject, FoiRequest
@@ -129,7 +131,7 @@ def get_read_foiattachment_queryset(request: HttpRequest, queryset=None):
     )
 
 
-@lru_cache()
+@request_cached
 def can_read_foirequest(
     foirequest: FoiRequest, request: HttpRequest, allow_code=True
 ) -> bool:
@@ -144,7 +146,7 @@ def can_read_foirequest(
     return False
 
 
-@lru_cache()
+@request_cached
 def can_read_foirequest_authenticated(
     foirequest: FoiRequest, request: HttpRequest, allow_code=True
 ) -> bool:
@@ -171,12 +173,28 @@ def can_read_foirequest_authenticated(
     return False
 
 
+def can_read_foirequests_authenticated(
+    foirequests: Iterable[FoiRequest], request: HttpRequest, allow_code=True
+) -> List[bool]:
+    """
+    Bulk version of can_read_foirequest_authenticated for list views
+    """
+    foirequests = list(foirequests)
+    if request.user.is_authenticated:
+        prefetch_related_objects(foirequests, "project", "campaign")
+    return can_read_many(
+        foirequests,
+        request,
+        check=partial(can_read_foirequest_authenticated, allow_code=allow_code),
+    )
+
+
 def can_read_foiproject(foiproject: FoiProject, request: HttpRequest) -> bool:
     assert isinstance(foiproject, FoiProject)
     return can_read_object(foiproject, request)
 
 
-@lru_cache()
+@request_cached
 def can_read_foiproject_authenticated(
     foiproject: FoiProject, request: HttpRequest
 ) -> bool:
@@ -186,7 +204,7 @@ def can_read_foiproject_authenticated(
     )
 
 
-@lru_cache()
+@request_cached
 def can_write_foirequest(
     foirequest: FoiRequest, request: HttpRequest, scope=None
 ) -> bool:
@@ -198,7 +216,7 @@ def can_write_foirequest(
     return False
 
 
-@lru_cache()
+@request_cached
 def can_moderate_foirequest(foirequest: FoiRequest, request: HttpRequest) -> bool:
     if not can_read_foirequest(foirequest, request):
         return False
@@ -300,16 +318,6 @@ def is_attachment_public(foirequest: FoiRequest, attachment: FoiAttachment) -> b
     return can_read_object(foirequest) and attachment.approved
 
 
-def clear_lru_caches():
-    for f in (
-        can_write_foirequest,
-        can_read_foirequest,
-        can_read_foirequest_authenticated,
-        can_moderate_foirequest,
-    ):
-        f.cache_clear()
-
-
 def has_attachment_access(
     request: HttpRequest, foirequest: FoiRequest, attachment: FoiAttachment
 ) -> bool:
@@ -23,6 +23,9 @@ class FoiRequestAuthBackend:
             return False
         if obj.campaign.group_id is None:
             return False
-        return User.objects.filter(
-            pk=user_obj.pk, groups=obj.campaign.group_id
-        ).exists()
+        # Cached on the user like Django's permission caches
+        if not hasattr(user_obj, "_campaign_group_cache"):
+            user_obj._campaign_group_cache = set(
+                User.objects.filter(pk=user_obj.pk).values_list("groups", flat=True)
+            )
+        return obj.campaign.group_id in user_obj._campaign_group_cache
@@ -0,0 +1,75 @@
+"""
+Shared cache for lookups done when delivering incoming mail.
+
+Entries are invalidated through model signals (see signals.py)
+and additionally expire so that bulk updates are picked up eventually.
+"""
+
+import time
+from typing import List
+
+from django.core.cache import cache
+
+DELIVERY_CACHE_TIMEOUT = 60 * 60
+PUBLICBODY_VERSION_KEY = "froide:foimail:publicbody_version"
+REQUEST_EMAILS_KEY = "froide:foimail:request_emails:{version}:{request_id}"
+PUBLICBODY_HOST_KEY = "froide:foimail:publicbody_host:{version}:{host}"
+
+
+def is_spam_sender(email: str) -> bool:
+    from .models import DeferredMessage
+
+    # Not cached, marking messages as spam in bulk sends no signals
+    return DeferredMessage.objects.filter(sender=email, spam=True).exists()
+
+
+def get_publicbody_version() -> str:
+    version = cache.get(PUBLICBODY_VERSION_KEY)
+    if version is None:
+        # A fresh version never collides with entries of an evicted one
+        version = str(time.time_ns())
+        if not cache.add(PUBLICBODY_VERSION_KEY, version, None):
+            version = cache.get(PUBLICBODY_VERSION_KEY, version)
+    return version
+
+
+def invalidate_publicbodies():
+    cache.set(PUBLICBODY_VERSION_KEY, str(time.time_ns()), None)
+
+
+def get_request_emails(foirequest) -> List:
+    from .utils import get_emails_from_request
+
+    cache_key = REQUEST_EMAILS_KEY.format(
+        version=get_publicbody_version(), request_id=foirequest.id
+    )
+    pb_info_list = cache.get(cache_key)
+    if pb_info_list is None:
+        pb_info_list = list(get_emails_from_request(foirequest))
+        cache.set(cache_key, pb_info_list, DELIVERY_CACHE_TIMEOUT)
+    return pb_info_list
+
+
+def invalidate_request_emails(request_id: int):
+    cache.delete(
+        REQUEST_EMAILS_KEY.format(
+            version=get_publicbody_version(), request_id=request_id
+        )
+    )
+
+
+def get_publicbody_ids_for_host(email_host: str) -> List[int]:
+    from froide.publicbody.models import PublicBody
+
+    cache_key = PUBLICBODY_HOST_KEY.format(
+        version=get_publicbody_version(), host=email_host
+    )
+    publicbody_ids = cache.get(cache_key)
+    if publicbody_ids is None:
+        publicbody_ids = list(
+            PublicBody.objects.filter_by_email_host(email_host).values_list(
+                "id", flat=True
+            )
+        )
+        cache.set(cache_key, publicbody_ids, DELIVERY_CACHE_TIMEOUT)
+    return publicbody_ids
@@ -1,3 +1,7 @@
+import itertools
+from typing import Dict, List
+
+from django.db.models import Prefetch, prefetch_related_objects
 from django.template.loader import render_to_string
 
 from django_elasticsearch_dsl import Document, fields
@@ -9,8 +13,9 @@ from froide.helper.search import (
     get_search_quote_analyzer,
     get_text_analyzer,
 )
+from froide.publicbody.models import Category, Classification
 
-from .models import FoiRequest
+from .models import FoiMessage, FoiRequest
 
 index = get_index("foirequest")
 analyzer = get_text_analyzer()
@@ -18,6 +23,19 @@ search_analyzer = get_search_analyzer()
 search_quote_analyzer = get_search_quote_analyzer()
 
 
+def get_ancestor_map(model) -> Dict[int, List[int]]:
+    """
+    Map every node of a materialized path tree to its ancestor ids
+    """
+    nodes = list(model.objects.values_list("id", "path"))
+    path_to_id = {path: node_id for node_id, path in nodes}
+    steplen = model.steplen
+    return {
+        node_id: [path_to_id[path[:end]] for end in range(steplen, len(path), steplen)]
+        for node_id, path in nodes
+    }
+
+
 @registry.register_document
 @index.document
 class FoiRequestDocument(Document):
@@ -55,11 +73,58 @@ class FoiRequestDocument(Document):
         model = FoiRequest
         queryset_chunk_size = 50
 
+    # Class level defaults keep these out of the document data
+    _ancestor_maps = None
+
     def get_queryset(self):
         """Not mandatory but to improve performance we can select related in one sql request"""
         return FoiRequest.objects.select_related(
             "jurisdiction",
             "public_body",
+            "public_body__classification",
+            "project",
+        )
+
+    def _get_actions(self, object_list, action):
+        if action == "delete":
+            yield from super()._get_actions(object_list, action)
+            return
+        chunk_size = self.django.queryset_chunk_size
+        object_iterator = iter(object_list)
+        while True:
+            chunk = list(itertools.islice(object_iterator, chunk_size))
+            if not chunk:
+                return
+            self.prepare_chunk(chunk)
+            yield from super()._get_actions(chunk, action)
+
+    def get_ancestor_maps(self):
+        if self._ancestor_maps is None:
+            self._ancestor_maps = {
+                "classification": get_ancestor_map(Classification),
+                "categories": get_ancestor_map(Category),
+            }
+        return self._ancestor_maps
+
+    def prepare_chunk(self, objs):
+        """
+        Load related objects of a chunk in bulk so that
+        preparing single objects does not hit the database
+        """
+        self.get_ancestor_maps()
+        messages_qs = (
+            FoiMessage.objects.filter(is_draft=False)
+            .select_related(
+                "sender_user", "sender_public_body", "recipient_public_body"
+            )
+            .prefetch_related("foiattachment_set")
+            .order_by("timestamp")
+        )
+        prefetch_related_objects(
+            objs,
+            "tags",
+            "public_body__categories",
+            Prefetch("foimessage_set", queryset=messages_qs, to_attr="_messages"),
         )
 
     def prepare_content(self, obj):
@@ -79,20 +144,20 @@ class FoiRequestDocument(Document):
     def prepare_classification(self, obj):
         if obj.public_body_id is None:
             return []
-        if obj.public_body.classification is None:
+        classification_id = obj.public_body.classification_id
+        if classification_id is None:
             return []
-        classification = obj.public_body.classification
-        return [classification.id] + [c.id for c in classification.get_ancestors()]
+        ancestor_map = self.get_ancestor_maps()["classification"]
+        return [classification_id] + ancestor_map.get(classification_id, [])
 
     def prepare_categories(self, obj):
         if obj.public_body:
-            cats = obj.public_body.categories.all()
-            return [o.id for o in cats] + [
-                c.id for o in cats for c in o.get_ancestors()
-            ]
+            ancestor_map = self.get_ancestor_maps()["categories"]
+            cat_ids = [o.id for o in obj.public_body.categories.all()]
+            return cat_ids + [c for o in cat_ids for c in ancestor_map.get(o, [])]
         return []
 
     def prepare_team(self, obj):
-        if obj.project and obj.project.team_id:
+        if obj.project_id and obj.project.team_id:
             return obj.project.team_id
         return None
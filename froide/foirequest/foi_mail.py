@@ -1,18 +1,34 @@
 import base64
+import hashlib
+import os
 import random
+import tempfile
+import time
+import uuid
 import zipfile
-from contextlib import closing, contextmanager
+from collections import defaultdict
+from contextlib import closing, contextmanager, suppress
+from datetime import timedelta
 from io import BytesIO
-from typing import Iterator, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from django.conf import settings
-from django.core.mail import EmailMessage, get_connection, mail_managers
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.mail import EmailMessage, mail_managers
+from django.db import transaction
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import override
 
-from froide.foirequest.models import DeferredMessage, FoiMessage, FoiRequest
+from froide.foirequest.models import (
+    DeferredMessage,
+    FoiAttachment,
+    FoiMessage,
+    FoiRequest,
+)
 from froide.helper.email_parsing import ParsedEmail, parse_email, parse_email_address
+from froide.helper.email_sending import get_mail_connection
 from froide.helper.email_utils import (
     get_mail_client,
     get_unread_mails,
@@ -22,6 +38,7 @@ from froide.helper.email_utils import (
 from froide.helper.name_generator import get_name_from_number
 from froide.publicbody.models import PublicBody
 
+from .delivery_cache import is_spam_sender
 from .utils import get_foi_mail_domains, get_publicbody_for_email
 
 unknown_foimail_subject = _("Unknown FoI-Mail Recipient")
@@ -38,6 +55,10 @@ Please investigate! %(url)s
 )
 
 DSN_RCPT_OPTIONS = ["NOTIFY=SUCCESS,DELAY,FAILURE"]
+MAIL_SPOOL_PREFIX = "mailspool"
+PACKAGE_CACHE_PATH = "packages"
+# Packages not downloaded for this long are removed
+PACKAGE_MAX_AGE = timedelta(days=7)
 
 
 def send_foi_mail(
@@ -53,8 +74,8 @@ def send_foi_mail(
     if kwargs.get("dsn"):
         backend_kwargs["rcpt_options"] = DSN_RCPT_OPTIONS
 
-    connection = get_connection(
-        backend=settings.EMAIL_BACKEND,
+    # Pooled by the SMTP backend
+    connection = get_mail_connection(
         username=settings.FOI_EMAIL_HOST_USER,
         password=settings.FOI_EMAIL_HOST_PASSWORD,
         host=settings.FOI_EMAIL_HOST,
@@ -110,6 +131,32 @@ def _process_mail(mail_bytes, mail_uid=None, manual=False):
             unflag_mail(mailbox, mail_uid)
 
 
+def get_mail_spool_storage() -> FileSystemStorage:
+    # Raw mails are unredacted, keep them out of MEDIA_ROOT
+    return FileSystemStorage(
+        location=os.path.join(settings.PRIVATE_MEDIA_ROOT, MAIL_SPOOL_PREFIX)
+    )
+
+
+def spool_mail(mail_bytes: bytes) -> str:
+    """
+    Store raw mail in storage so tasks only need to carry a reference
+    """
+    path = "{}.eml".format(uuid.uuid4())
+    return get_mail_spool_storage().save(path, ContentFile(mail_bytes))
+
+
+def _process_spooled_mail(mail_path: str, mail_uid=None):
+    storage = get_mail_spool_storage()
+    with storage.open(mail_path, "rb") as f:
+        mail_bytes = f.read()
+
+    _process_mail(mail_bytes, mail_uid=mail_uid)
+
+    # Keep spooled mail around if the delivery transaction fails
+    transaction.on_commit(lambda: storage.delete(mail_path))
+
+
 def create_deferred(
     secret_mail: str,
     mail_bytes: bytes,
@@ -303,8 +350,6 @@ def add_message_from_email(
 
 
 def should_drop_email(recipient_email: str, sender_email: str) -> bool:
-    from .models import DeferredMessage
-
     if (
         not settings.FOI_EMAIL_FIXED_FROM_ADDRESS
         and recipient_email == settings.FOI_EMAIL_HOST_USER
@@ -312,10 +357,7 @@ def should_drop_email(recipient_email: str, sender_email: str) -> bool:
         # foi mailbox email, but custom email required, dropping
         return True
 
-    previous_spam_sender = DeferredMessage.objects.filter(
-        sender=sender_email, spam=True
-    ).exists()
-    if previous_spam_sender:
+    if is_spam_sender(sender_email):
         # Drop previous spammer
         return True
 
@@ -356,6 +398,10 @@ def generate_foirequest_files(foirequest):
     yield from get_message_attachments_for_package(foirequest)
 
 
+def get_package_attachments(foimessage: FoiMessage):
+    return foimessage.foiattachment_set.filter(is_redacted=False, is_converted=False)
+
+
 def get_message_and_attachments(
     foimessage: FoiMessage, date_prefix: Optional[str] = None
 ):
@@ -367,11 +413,7 @@ def get_message_and_attachments(
     pdf_generator = FoiRequestMessagePDFGenerator(foimessage)
     yield ("%s.pdf" % date_prefix, pdf_generator.get_pdf_bytes(), "application/pdf")
 
-    att_queryset = foimessage.foiattachment_set.filter(
-        is_redacted=False, is_converted=False
-    )
-
-    for attachment in att_queryset:
+    for attachment in get_package_attachments(foimessage):
         if not attachment.file:
             continue
         filename = "%s-%s" % (date_prefix, attachment.name)
@@ -379,19 +421,52 @@ def get_message_and_attachments(
             yield (filename, f.read(), attachment.filetype)
 
 
+def get_message_package_files(
+    foimessage: FoiMessage,
+    date_prefix: str,
+    attachments: Iterable[FoiAttachment],
+) -> Iterator[Tuple[str, Union[bytes, str]]]:
+    """
+    Yield archive names with either PDF bytes or the path of an attachment
+    so attachments can be copied into the archive without loading them.
+    """
+    from .pdf_generator import FoiRequestMessagePDFGenerator
+
+    pdf_bytes = FoiRequestMessagePDFGenerator(foimessage).get_pdf_bytes()
+    yield ("%s.pdf" % date_prefix, pdf_bytes)
+
+    for attachment in attachments:
+        if not attachment.file:
+            continue
+        yield ("%s-%s" % (date_prefix, attachment.name), attachment.file.path)
+
+
+def write_package_file(zfile: zipfile.ZipFile, arcname: str, content):
+    if isinstance(content, bytes):
+        zfile.writestr(arcname, content)
+    else:
+        # Copied from disk in chunks, files are stored without recompression
+        zfile.write(content, arcname)
+
+
+def write_message_package(foimessage: FoiMessage, fileobj):
+    date_prefix = foimessage.timestamp.date().isoformat()
+    attachments = get_package_attachments(foimessage)
+    with override(settings.LANGUAGE_CODE):
+        with zipfile.ZipFile(fileobj, "w") as zfile:
+            path = str(foimessage.request_id)
+            files = get_message_package_files(foimessage, date_prefix, attachments)
+            for filename, content in files:
+                write_package_file(zfile, "%s/%s" % (path, filename), content)
+
+
 def package_message(foimessage: FoiMessage):
     zfile_obj = BytesIO()
-    with override(settings.LANGUAGE_CODE):
-        zfile = zipfile.ZipFile(zfile_obj, "w")
-        path = str(foimessage.request_id)
-        atts = get_message_and_attachments(foimessage)
-        for filename, filebytes, _ct in atts:
-            zfile.writestr("%s/%s" % (path, filename), filebytes)
-        zfile.close()
+    write_message_package(foimessage, zfile_obj)
     return zfile_obj.getvalue()
 
 
-def get_message_attachments_for_package(foirequest):
+def iter_package_messages(foirequest) -> Iterator[Tuple[FoiMessage, str]]:
     last_date = None
     date_count = 1
 
@@ -406,21 +481,138 @@ def get_message_attachments_for_package(foirequest):
             date_prefix += "_%d" % date_count
 
         last_date = current_date
+        yield foimessage, date_prefix
+
+
+def get_message_attachments_for_package(foirequest):
+    for foimessage, date_prefix in iter_package_messages(foirequest):
         yield from get_message_and_attachments(foimessage, date_prefix=date_prefix)
 
 
-def package_foirequest(foirequest: FoiRequest):
+def get_request_package_attachments(
+    foirequest: FoiRequest,
+) -> Dict[int, List[FoiAttachment]]:
+    attachments = defaultdict(list)
+    att_queryset = FoiAttachment.objects.filter(
+        belongs_to__request=foirequest, is_redacted=False, is_converted=False
+    )
+    for attachment in att_queryset:
+        attachments[attachment.belongs_to_id].append(attachment)
+    return attachments
+
+
+def write_foirequest_package(
+    foirequest: FoiRequest,
+    fileobj,
+    attachments: Optional[Dict[int, List[FoiAttachment]]] = None,
+):
     from .pdf_generator import FoiRequestPDFGenerator
 
-    zfile_obj = BytesIO()
+    if attachments is None:
+        attachments = get_request_package_attachments(foirequest)
+
     with override(settings.LANGUAGE_CODE):
-        zfile = zipfile.ZipFile(zfile_obj, "w")
-        path = str(foirequest.pk)
-        pdf_generator = FoiRequestPDFGenerator(foirequest)
-        correspondence_bytes = pdf_generator.get_pdf_bytes()
-        zfile.writestr("%s/_%s.pdf" % (path, foirequest.pk), correspondence_bytes)
-        atts = get_message_attachments_for_package(foirequest)
-        for filename, filebytes, _ct in atts:
-            zfile.writestr("%s/%s" % (path, filename), filebytes)
-        zfile.close()
+        with zipfile.ZipFile(fileobj, "w") as zfile:
+            path = str(foirequest.pk)
+            pdf_generator = FoiRequestPDFGenerator(foirequest)
+            correspondence_bytes = pdf_generator.get_pdf_bytes()
+            zfile.writestr("%s/_%s.pdf" % (path, foirequest.pk), correspondence_bytes)
+            for foimessage, date_prefix in iter_package_messages(foirequest):
+                # Message PDFs are rendered one by one as they are written
+                files = get_message_package_files(
+                    foimessage, date_prefix, attachments.get(foimessage.id, [])
+                )
+                for filename, content in files:
+                    write_package_file(zfile, "%s/%s" % (path, filename), content)
+
+
+def package_foirequest(foirequest: FoiRequest):
+    zfile_obj = BytesIO()
+    write_foirequest_package(foirequest, zfile_obj)
     return zfile_obj.getvalue()
+
+
+def get_package_cache_root() -> str:
+    # Packages contain unredacted files, keep them out of MEDIA_ROOT
+    return os.path.join(settings.PRIVATE_MEDIA_ROOT, PACKAGE_CACHE_PATH)
+
+
+def get_package_cache_dir(foirequest: FoiRequest) -> str:
+    return os.path.join(get_package_cache_root(), str(foirequest.pk))
+
+
+def get_package_cache_key(
+    foirequest: FoiRequest, attachments: Dict[int, List[FoiAttachment]]
+) -> str:
+    parts = [str(foirequest.last_modified_at)]
+    for foimessage in foirequest.messages:
+        parts.append("%s:%s" % (foimessage.id, foimessage.last_modified_at))
+        for attachment in attachments.get(foimessage.id, []):
+            parts.append("%s:%s" % (attachment.id, attachment.file.name))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def open_foirequest_package(foirequest: FoiRequest):
+    """
+    Return an open zip package of the request that is only rebuilt
+    when the request, its messages or their attachments changed.
+
+    The file is opened here, so a concurrent rebuild that removes it
+    from the cache can't break reading it.
+    """
+    attachments = get_request_package_attachments(foirequest)
+    cache_dir = get_package_cache_dir(foirequest)
+    key = get_package_cache_key(foirequest, attachments)
+    package_path = os.path.join(cache_dir, "%s.zip" % key)
+    try:
+        package_file = open(package_path, "rb")
+    except FileNotFoundError:
+        pass
+    else:
+        # Keep packages that are still downloaded
+        with suppress(FileNotFoundError):
+            os.utime(package_path)
+        return package_file
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as temp_file:
+        try:
+            write_foirequest_package(foirequest, temp_file, attachments)
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+    package_file = open(temp_file.name, "rb")
+    # Move into place atomically so readers never see partial packages
+    os.replace(temp_file.name, package_path)
+
+    for filename in os.listdir(cache_dir):
+        if filename.endswith(".zip") and filename != os.path.basename(package_path):
+            with suppress(FileNotFoundError):
+                os.remove(os.path.join(cache_dir, filename))
+    return package_file
+
+
+def remove_old_packages(max_age: timedelta = PACKAGE_MAX_AGE) -> int:
+    """
+    Remove packages that were not built or downloaded within max_age
+    """
+    cache_root = get_package_cache_root()
+    if not os.path.isdir(cache_root):
+        return 0
+    cutoff = time.time() - max_age.total_seconds()
+    count = 0
+    for dirname in os.listdir(cache_root):
+        cache_dir = os.path.join(cache_root, dirname)
+        if not os.path.isdir(cache_dir):
+            continue
+        for filename in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, filename)
+            with suppress(FileNotFoundError):
+                # Also removes leftovers of interrupted builds
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    count += 1
+        with suppress(OSError):
+            # Only succeeds when empty
+            os.rmdir(cache_dir)
+    return count
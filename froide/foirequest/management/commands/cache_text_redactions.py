@@ -1,58 +1,64 @@
 from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db.models import Q, QuerySet
-from django.db.models.functions import Length
 from django.utils import translation
 
-from froide.foirequest.models.request import FoiRequest
-from froide.helper.text_diff import CONTENT_CACHE_THRESHOLD
+from froide.foirequest.render_cache import (
+    RENDER_CACHE_CHUNK_SIZE,
+    RENDER_CACHE_TARGETS,
+    RENDER_CACHE_VERSION,
+    RENDER_CACHE_WORKERS,
+    RenderCacheBuilder,
+)
 
 
 class Command(BaseCommand):
     help = "Pre-calculate redaction diffs and markup for long texts."
 
-    def handle(self, *args, **options):
-        translation.activate(settings.LANGUAGE_CODE)
-        from froide.foirequest.models import FoiMessage
-        from froide.foirequest.templatetags.foirequest_tags import (
-            render_message_content,
-            render_request_description,
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=RENDER_CACHE_WORKERS,
+            help="Number of worker processes",
         )
-
-        needs_calculation = (
-            Q(content_rendered_auth__isnull=True)
-            | Q(content_rendered_anon__isnull=True)
-            | Q(redacted_content_auth__isnull=True)
-            | Q(redacted_content_anon__isnull=True)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=RENDER_CACHE_CHUNK_SIZE,
+            help="Number of objects per chunk",
         )
-
-        msgs: QuerySet[FoiMessage] = (
-            FoiMessage.objects.annotate(plaintext_length=Length("plaintext"))
-            .filter(plaintext_length__gt=CONTENT_CACHE_THRESHOLD)
-            .filter(needs_calculation)
+        parser.add_argument(
+            "--cache-version",
+            type=int,
+            default=RENDER_CACHE_VERSION,
+            help="Recalculate caches older than this version",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File to store progress in and resume from",
+        )
+        parser.add_argument(
+            "--only",
+            choices=list(RENDER_CACHE_TARGETS),
+            action="append",
+            help="Only cache these kinds of objects",
         )
 
-        for message in msgs:
-            # Cache the `redacted_content` property for the api
-            message.get_redacted_content(True)
-            message.get_redacted_content(False)
-
-            # Cache the rendered message content for the foi request page
-            render_message_content(message, True)
-            render_message_content(message, False)
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
 
-        reqs: QuerySet[FoiRequest] = (
-            FoiRequest.objects.annotate(description_length=Length("description"))
-            .filter(description_length__gt=CONTENT_CACHE_THRESHOLD)
-            .filter(
-                Q(redacted_description_auth__isnull=True)
-                | Q(redacted_description_anon__isnull=True)
-                | Q(rendered_description_auth__isnull=True)
-                | Q(rendered_description_anon__isnull=True)
+        def progress(target_name, count, last_id):
+            self.stdout.write(
+                "Cached %d %s objects up to id %d" % (count, target_name, last_id)
             )
+
+        builder = RenderCacheBuilder(
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            cache_version=options["cache_version"],
+            checkpoint_path=options["checkpoint"],
+            progress=progress,
         )
-        for req in reqs:
-            req.get_redacted_description(True)
-            req.get_redacted_description(False)
-            render_request_description(req, True)
-            render_request_description(req, False)
+        counts = builder.run(options["only"] or tuple(RENDER_CACHE_TARGETS))
+        for target_name, count in counts.items():
+            self.stdout.write("Cached %d %s objects in total" % (count, target_name))
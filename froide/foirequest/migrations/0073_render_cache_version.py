@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("foirequest", "0072_foirequest_null_empty_cached_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="foimessage",
+            name="render_cache_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="foirequest",
+            name="render_cache_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.16 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("foirequest", "0073_render_cache_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deferredmessage",
+            index=models.Index(fields=["sender"], name="foirequest__sender_2dda4a_idx"),
+        ),
+    ]
@@ -36,6 +36,7 @@ class DeferredMessage(models.Model):
         get_latest_by = "timestamp"
         verbose_name = _("Undelivered Message")
         verbose_name_plural = _("Undelivered Messages")
+        indexes = [models.Index(fields=["sender"])]
 
     def __str__(self):
         return _("Undelievered Message to %(recipient)s (%(request)s)") % {
@@ -172,6 +172,7 @@ class FoiMessage(models.Model):
     content_rendered_anon = models.TextField(blank=True, null=True)
     redacted_content_auth = models.JSONField(blank=True, null=True)
     redacted_content_anon = models.JSONField(blank=True, null=True)
+    render_cache_version = models.PositiveIntegerField(default=0)
     redacted = models.BooleanField(_("Was Redacted?"), default=False)
     not_publishable = models.BooleanField(_("Not publishable"), default=False)
     email_headers = models.JSONField(null=True, default=None, blank=True)
@@ -714,22 +715,21 @@ class FoiMessage(models.Model):
 
         resend_message(self, **kwargs)
 
+    def calculate_redacted_content(self, auth: bool) -> List[List]:
+        if auth:
+            show, hide = self.plaintext, self.get_content()
+        else:
+            show, hide = self.get_content(), self.plaintext
+        return [list(x) for x in get_differences(show, hide)]
+
     def get_redacted_content(self, auth: bool) -> List[Tuple[bool, str]]:
         if auth:
-            show, hide, cache_field = (
-                self.plaintext,
-                self.get_content(),
-                "redacted_content_auth",
-            )
+            cache_field = "redacted_content_auth"
         else:
-            show, hide, cache_field = (
-                self.get_content(),
-                self.plaintext,
-                "redacted_content_anon",
-            )
+            cache_field = "redacted_content_anon"
 
         if getattr(self, cache_field) is None:
-            redacted_content = [list(x) for x in get_differences(show, hide)]
+            redacted_content = self.calculate_redacted_content(auth)
             setattr(self, cache_field, redacted_content)
             FoiMessage.objects.filter(id=self.id).update(
                 **{cache_field: redacted_content}
@@ -313,6 +313,7 @@ class FoiRequest(models.Model):
     redacted_description_anon = models.JSONField(blank=True, null=True)
     rendered_description_auth = models.TextField(blank=True, null=True)
     rendered_description_anon = models.TextField(blank=True, null=True)
+    render_cache_version = models.PositiveIntegerField(default=0)
 
     summary = models.TextField(_("Summary"), blank=True)
 
@@ -673,22 +674,21 @@ class FoiRequest(models.Model):
                 self.save()
         return self.description_redacted
 
+    def calculate_redacted_description(self, auth: bool) -> List[List]:
+        if auth:
+            show, hide = self.description, self.get_description()
+        else:
+            show, hide = self.get_description(), self.description
+        return [list(x) for x in get_differences(show, hide)]
+
     def get_redacted_description(self, auth: bool) -> List[Tuple[bool, str]]:
         if auth:
-            show, hide, cache_field = (
-                self.description,
-                self.get_description(),
-                "redacted_description_auth",
-            )
+            cache_field = "redacted_description_auth"
         else:
-            show, hide, cache_field = (
-                self.get_description(),
-                self.description,
-                "redacted_description_anon",
-            )
+            cache_field = "redacted_description_anon"
 
         if not getattr(self, cache_field):
-            redacted_content = [list(x) for x in get_differences(show, hide)]
+            redacted_content = self.calculate_redacted_description(auth)
             setattr(self, cache_field, redacted_content)
             if redacted_content:
                 FoiRequest.objects.filter(id=self.pk).update(
@@ -71,16 +71,23 @@ def get_event_updates(start: datetime, end: datetime, **filter_kwargs):
 def get_comment_updates(start: datetime, end: datetime, **filter_kwargs):
     ct = ContentType.objects.get_for_model(FoiMessage)
 
-    comments = Comment.objects.filter(
-        content_type=ct, submit_date__gte=start, submit_date__lt=end
-    ).filter(**filter_kwargs)
+    comments = list(
+        Comment.objects.filter(
+            content_type=ct, submit_date__gte=start, submit_date__lt=end
+        ).filter(**filter_kwargs)
+    )
+    message_ids = {
+        int(comment.object_pk) for comment in comments if comment.object_pk.isdigit()
+    }
+    messages = FoiMessage.objects.select_related("request", "request__user").in_bulk(
+        message_ids
+    )
 
     for comment in comments:
-        try:
-            message = FoiMessage.objects.select_related("request").get(
-                pk=comment.object_pk
-            )
-        except FoiMessage.DoesNotExist:
+        if not comment.object_pk.isdigit():
+            continue
+        message = messages.get(int(comment.object_pk))
+        if message is None:
             continue
 
         yield Notification(
@@ -100,24 +107,35 @@ def batch_update_requester(
     if start is None or end is None:
         start, end = get_yesterday_datetime_range()
 
-    yesterdays_comments = list(get_comment_updates(start, end))
-
-    def key_func(n):
-        return (n.object.user_id, n.object.id, n.timestamp)
-
-    yesterdays_comments = sorted(yesterdays_comments, key=key_func)
-
-    for user_id, group in groupby(yesterdays_comments, lambda n: n.object.user_id):
-        if user_id is None:
+    notifications_by_user = defaultdict(list)
+    for notification in get_comment_updates(start, end):
+        if notification.object.user_id is None:
             continue
-        notifications = list(group)
-        user = notifications[0].object.user
+        notifications_by_user[notification.object.user_id].append(notification)
+
+    # Group users by language to switch translations as little as possible
+    users = sorted(
+        (
+            notifications[0].object.user
+            for notifications in notifications_by_user.values()
+        ),
+        key=lambda u: (u.language or settings.LANGUAGE_CODE, u.id),
+    )
+
+    for user in users:
+        notifications = sorted(
+            notifications_by_user[user.id],
+            key=lambda n: (n.object.id, n.timestamp),
+        )
         send_update(notifications, user=user)
 
 
 def send_update(notifications: List[Notification], user):
-    translation.activate(user.language or settings.LANGUAGE_CODE)
+    with translation.override(user.language or settings.LANGUAGE_CODE):
+        _send_update(notifications, user)
+
 
+def _send_update(notifications: List[Notification], user):
     # Add additional info to template context
     request_list = []
     grouped_notifications = groupby(notifications, lambda n: n.object.id)
@@ -1,12 +1,26 @@
+import hashlib
 import logging
+import os
+import tempfile
+from contextlib import suppress
+from datetime import timedelta
+from functools import lru_cache
 from types import ModuleType
 from typing import Optional
 
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.template.loader import render_to_string
+from django.utils import timezone
 
 from froide.helper.text_utils import remove_closing_inclusive
 
+# Bump to invalidate cached PDFs when rendering changes outside of templates
+PDF_CACHE_VERSION = "1"
+PDF_CACHE_PATH = "pdfcache"
+# Cached PDFs are rendered again after this long
+PDF_CACHE_MAX_AGE = timedelta(days=30)
+
 
 def get_wp() -> Optional[ModuleType]:
     try:
@@ -20,20 +34,110 @@ def get_wp() -> Optional[ModuleType]:
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def get_font_config():
+    """
+    Font configuration is expensive to set up, keep one per worker process
+    """
+    from weasyprint.text.fonts import FontConfiguration
+
+    return FontConfiguration()
+
+
+def render_pdf(html: str) -> bytes:
+    wp = get_wp()
+    if wp is None:
+        return b""
+    doc = wp.HTML(string=html)
+    return doc.write_pdf(font_config=get_font_config())
+
+
+def get_pdf_cache_storage() -> FileSystemStorage:
+    # Message PDFs contain unredacted text, keep them out of MEDIA_ROOT
+    return FileSystemStorage(
+        location=os.path.join(settings.PRIVATE_MEDIA_ROOT, PDF_CACHE_PATH)
+    )
+
+
+def get_pdf_cache_path(html: str) -> str:
+    wp = get_wp()
+    wp_version = wp.__version__ if wp is not None else ""
+    key = hashlib.sha256(
+        "{}:{}:{}".format(PDF_CACHE_VERSION, wp_version, html).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(key[:2], "{}.pdf".format(key))
+
+
+def get_cached_pdf_bytes(html: str) -> Optional[bytes]:
+    storage = get_pdf_cache_storage()
+    try:
+        with storage.open(get_pdf_cache_path(html), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def set_cached_pdf_bytes(html: str, pdf_bytes: bytes):
+    if not pdf_bytes:
+        return
+    pdf_path = get_pdf_cache_storage().path(get_pdf_cache_path(html))
+    cache_dir = os.path.dirname(pdf_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as pdf_file:
+        try:
+            pdf_file.write(pdf_bytes)
+        except Exception:
+            os.remove(pdf_file.name)
+            raise
+    # Concurrent renders of the same PDF replace each other atomically
+    os.replace(pdf_file.name, pdf_path)
+
+
+def remove_old_cached_pdfs(max_age: timedelta = PDF_CACHE_MAX_AGE) -> int:
+    """
+    Remove cached PDFs older than max_age, e.g. of changed messages
+    """
+    storage = get_pdf_cache_storage()
+    if not storage.exists(""):
+        return 0
+    cutoff = timezone.now() - max_age
+    count = 0
+    dirnames, _filenames = storage.listdir("")
+    for dirname in dirnames:
+        _dirnames, filenames = storage.listdir(dirname)
+        for filename in filenames:
+            path = os.path.join(dirname, filename)
+            with suppress(FileNotFoundError):
+                # Also removes leftovers of interrupted writes
+                if storage.get_modified_time(path) < cutoff:
+                    storage.delete(path)
+                    count += 1
+    return count
+
+
+def use_pdf_cache(generator: "PDFGenerator") -> bool:
+    return generator.cache_pdf and settings.FOI_PDF_CACHE
+
+
 class PDFGenerator(object):
     template_name: str
+    cache_pdf = False
 
     def __init__(self, obj):
         self.obj = obj
 
     def get_pdf_bytes(self):
-        wp = get_wp()
-        if wp is None:
-            return b""
-
         html = self.get_html_string()
-        doc = wp.HTML(string=html)
-        return doc.write_pdf()
+        use_cache = use_pdf_cache(self)
+        if use_cache:
+            pdf_bytes = get_cached_pdf_bytes(html)
+            if pdf_bytes is not None:
+                return pdf_bytes
+
+        pdf_bytes = render_pdf(html)
+        if use_cache:
+            set_cached_pdf_bytes(html, pdf_bytes)
+        return pdf_bytes
 
     def get_html_string(self):
         ctx = self.get_context_data(self.obj)
@@ -45,10 +149,12 @@ class PDFGenerator(object):
 
 class FoiRequestPDFGenerator(PDFGenerator):
     template_name = "foirequest/pdf/foirequest.html"
+    cache_pdf = True
 
 
 class FoiRequestMessagePDFGenerator(PDFGenerator):
     template_name = "foirequest/pdf/foimessage.html"
+    cache_pdf = True
 
 
 class LetterPDFGenerator(PDFGenerator):
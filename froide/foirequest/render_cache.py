@@ -0,0 +1,284 @@
+import json
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils import translation
+
+from froide.helper.text_diff import CONTENT_CACHE_THRESHOLD
+
+from .models import FoiMessage, FoiRequest
+
+logger = logging.getLogger(__name__)
+
+# Bump to re-render cached redaction diffs and markup of long texts,
+# e.g. after changing redaction templates or config
+RENDER_CACHE_VERSION = 1
+RENDER_CACHE_CHUNK_SIZE = 100
+RENDER_CACHE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Object id, texts the caches were calculated from and cache values
+ChunkResult = List[Tuple[int, Tuple, Dict]]
+
+
+class RenderCacheTarget:
+    model = None
+    text_field = ""
+    # Redacting changes these, caches of other values are stale
+    source_fields: Tuple[str, ...] = ()
+    cache_fields: Tuple[str, ...] = ()
+
+    def get_queryset(self, cache_version: int):
+        needs_calculation = Q(render_cache_version__lt=cache_version)
+        for field in self.cache_fields:
+            needs_calculation |= Q(**{"%s__isnull" % field: True})
+        return (
+            self.model.objects.annotate(text_length=Length(self.text_field))
+            .filter(text_length__gt=CONTENT_CACHE_THRESHOLD)
+            .filter(needs_calculation)
+        )
+
+    def get_objects(self, ids: List[int]):
+        raise NotImplementedError
+
+    def calculate(self, obj) -> Dict:
+        raise NotImplementedError
+
+
+class MessageRenderCache(RenderCacheTarget):
+    model = FoiMessage
+    text_field = "plaintext"
+    source_fields = ("plaintext", "plaintext_redacted")
+    cache_fields = (
+        "redacted_content_auth",
+        "redacted_content_anon",
+        "content_rendered_auth",
+        "content_rendered_anon",
+    )
+
+    def get_objects(self, ids):
+        return FoiMessage.objects.filter(id__in=ids).select_related("request__user")
+
+    def calculate(self, message):
+        from .templatetags.foirequest_tags import get_message_content_markup
+
+        return {
+            "redacted_content_auth": message.calculate_redacted_content(True),
+            "redacted_content_anon": message.calculate_redacted_content(False),
+            "content_rendered_auth": str(get_message_content_markup(message, True)),
+            "content_rendered_anon": str(get_message_content_markup(message, False)),
+        }
+
+
+class RequestRenderCache(RenderCacheTarget):
+    model = FoiRequest
+    text_field = "description"
+    source_fields = ("description", "description_redacted")
+    cache_fields = (
+        "redacted_description_auth",
+        "redacted_description_anon",
+        "rendered_description_auth",
+        "rendered_description_anon",
+    )
+
+    def get_objects(self, ids):
+        return FoiRequest.objects.filter(id__in=ids).select_related("user")
+
+    def calculate(self, foirequest):
+        from .templatetags.foirequest_tags import get_request_description_markup
+
+        values = {
+            "redacted_description_auth": foirequest.calculate_redacted_description(
+                True
+            ),
+            "redacted_description_anon": foirequest.calculate_redacted_description(
+                False
+            ),
+            "rendered_description_auth": str(
+                get_request_description_markup(foirequest, True)
+            ),
+            "rendered_description_anon": str(
+                get_request_description_markup(foirequest, False)
+            ),
+        }
+        # Empty descriptions are not cached, like when rendered on demand
+        return {key: value or None for key, value in values.items()}
+
+
+RENDER_CACHE_TARGETS: Dict[str, RenderCacheTarget] = {
+    "message": MessageRenderCache(),
+    "request": RequestRenderCache(),
+}
+
+
+def calculate_chunk(target_name: str, ids: List[int]) -> ChunkResult:
+    """
+    Calculate cache values of a chunk of objects, runs in worker processes
+    """
+    translation.activate(settings.LANGUAGE_CODE)
+    target = RENDER_CACHE_TARGETS[target_name]
+    results = []
+    for obj in target.get_objects(ids):
+        # Calculating may fill in the redacted text, read it afterwards
+        values = target.calculate(obj)
+        sources = tuple(getattr(obj, field) for field in target.source_fields)
+        results.append((obj.id, sources, values))
+    return results
+
+
+class RenderCacheCheckpoint:
+    """
+    Last written id per target, stored in a JSON file to resume from
+    """
+
+    def __init__(self, path: Optional[str], cache_version: int):
+        self.path = path
+        self.cache_version = cache_version
+        self.last_ids: Dict[str, int] = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            # A checkpoint of another version does not apply
+            if data.get("cache_version") == cache_version:
+                self.last_ids = data.get("last_ids", {})
+
+    def get(self, target_name: str) -> int:
+        return self.last_ids.get(target_name, 0)
+
+    def set(self, target_name: str, last_id: int) -> None:
+        self.last_ids[target_name] = last_id
+        if self.path is None:
+            return
+        tmp_path = "%s.tmp" % self.path
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"cache_version": self.cache_version, "last_ids": self.last_ids}, f
+            )
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.last_ids = {}
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def iter_id_chunks(queryset, start_id: int, chunk_size: int) -> Iterator[List[int]]:
+    last_id = start_id
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+class RenderCacheBuilder:
+    """
+    Precalculates redaction diffs and markup of long messages and
+    request descriptions.
+
+    Ids are paginated by keyset, chunks are calculated in a process
+    pool and written back in order with bulk_update. The last written
+    id per target is kept in a checkpoint so an interrupted run can
+    resume. Rows with missing caches or caches of an older version
+    than cache_version are selected.
+    """
+
+    def __init__(
+        self,
+        workers: int = RENDER_CACHE_WORKERS,
+        chunk_size: int = RENDER_CACHE_CHUNK_SIZE,
+        cache_version: int = RENDER_CACHE_VERSION,
+        checkpoint_path: Optional[str] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache_version = cache_version
+        self.checkpoint = RenderCacheCheckpoint(checkpoint_path, cache_version)
+        self.progress = progress
+
+    def run(self, target_names=tuple(RENDER_CACHE_TARGETS)) -> Dict[str, int]:
+        counts = {}
+        # Daemonic processes (e.g. celery prefork workers) cannot have children
+        if self.workers > 1 and not multiprocessing.current_process().daemon:
+            # Forked workers must not share the connection of this process,
+            # the first submit starts all of them before it reconnects
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                executor.submit(int).result()
+                for target_name in target_names:
+                    counts[target_name] = self.run_target(target_name, executor)
+        else:
+            for target_name in target_names:
+                counts[target_name] = self.run_target(target_name)
+        self.checkpoint.clear()
+        return counts
+
+    def run_target(self, target_name: str, executor=None) -> int:
+        target = RENDER_CACHE_TARGETS[target_name]
+        queryset = target.get_queryset(self.cache_version)
+        chunks = iter_id_chunks(
+            queryset, self.checkpoint.get(target_name), self.chunk_size
+        )
+        count = 0
+        if executor is None:
+            for ids in chunks:
+                count += self.write_chunk(
+                    target_name, ids[-1], calculate_chunk(target_name, ids)
+                )
+            return count
+
+        # Keep a bounded number of chunks in flight, write them in order
+        pending = deque()
+        for ids in chunks:
+            pending.append(
+                (ids[-1], executor.submit(calculate_chunk, target_name, ids))
+            )
+            if len(pending) >= self.workers * 2:
+                last_id, future = pending.popleft()
+                count += self.write_chunk(target_name, last_id, future.result())
+        while pending:
+            last_id, future = pending.popleft()
+            count += self.write_chunk(target_name, last_id, future.result())
+        return count
+
+    def write_chunk(self, target_name: str, last_id: int, results: ChunkResult) -> int:
+        target = RENDER_CACHE_TARGETS[target_name]
+        with transaction.atomic():
+            # Skip objects redacted since their caches were calculated,
+            # the new redaction cleared their caches
+            rows = (
+                target.model.objects.select_for_update()
+                .filter(id__in=[obj_id for obj_id, _sources, _values in results])
+                .values_list("id", *target.source_fields)
+            )
+            current_sources = {obj_id: tuple(sources) for obj_id, *sources in rows}
+            objs = [
+                target.model(
+                    id=obj_id, render_cache_version=self.cache_version, **values
+                )
+                for obj_id, sources, values in results
+                if current_sources.get(obj_id) == sources
+            ]
+            target.model.objects.bulk_update(
+                objs, list(target.cache_fields) + ["render_cache_version"]
+            )
+        self.checkpoint.set(target_name, last_id)
+        logger.info("Cached %d %s objects up to id %d", len(objs), target_name, last_id)
+        if self.progress is not None:
+            self.progress(target_name, len(objs), last_id)
+        return len(objs)
@@ -24,6 +24,7 @@ from froide.upload.fields import UploadRelatedField
 from .auth import (
     can_moderate_pii_foirequest,
     can_read_foirequest_authenticated,
+    can_read_foirequests_authenticated,
     can_write_foirequest,
     get_read_foiattachment_queryset,
 )
@@ -41,6 +42,16 @@ from .utils import postal_date
 from .validators import clean_reference
 
 
+class FoiRequestListListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        if request is not None:
+            # Fill the per request permission cache for all rows at once
+            can_read_foirequests_authenticated(iterable, request, allow_code=False)
+        return super().to_representation(iterable)
+
+
 class FoiRequestListSerializer(
     TaggitSerializer, serializers.HyperlinkedModelSerializer
 ):
@@ -74,6 +85,7 @@ class FoiRequestListSerializer(
 
     class Meta:
         model = FoiRequest
+        list_serializer_class = FoiRequestListListSerializer
         depth = 0
         fields = (
             "resource_uri",
@@ -9,10 +9,12 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from froide.helper.email_sending import mail_registry
-from froide.helper.signals import email_left_queue
+from froide.helper.signals import email_batch_left_queue, email_left_queue
 from froide.problem.models import ProblemReport
+from froide.publicbody.models import PublicBody
 
 from .consumers import MESSAGEEDIT_ROOM_PREFIX
+from .delivery_cache import invalidate_publicbodies, invalidate_request_emails
 from .models import (
     DeliveryStatus,
     FoiAttachment,
@@ -268,6 +270,39 @@ def foiattachment_delayed_remove(instance, **kwargs):
         pass
 
 
+# Mail delivery cache
+
+
+@receiver(
+    signals.post_save, sender=FoiRequest, dispatch_uid="foirequest_delivery_cache"
+)
+@receiver(
+    signals.post_delete, sender=FoiRequest, dispatch_uid="foirequest_delivery_cache"
+)
+def foirequest_invalidate_delivery_cache(instance, **kwargs):
+    invalidate_request_emails(instance.id)
+
+
+@receiver(
+    signals.post_save, sender=FoiMessage, dispatch_uid="foimessage_delivery_cache"
+)
+@receiver(
+    signals.post_delete, sender=FoiMessage, dispatch_uid="foimessage_delivery_cache"
+)
+def foimessage_invalidate_delivery_cache(instance, **kwargs):
+    invalidate_request_emails(instance.request_id)
+
+
+@receiver(
+    signals.post_save, sender=PublicBody, dispatch_uid="publicbody_delivery_cache"
+)
+@receiver(
+    signals.post_delete, sender=PublicBody, dispatch_uid="publicbody_delivery_cache"
+)
+def publicbody_invalidate_delivery_cache(instance, **kwargs):
+    invalidate_publicbodies()
+
+
 # Event creation
 
 
@@ -449,31 +484,73 @@ def pre_comment_foimessage(sender=None, comment=None, request=None, **kwargs):
 
 @receiver(email_left_queue)
 def save_delivery_status(
-    message_id: Optional[str], status: str, log: List[str], **kwargs
+    message_id: Optional[str],
+    status: str,
+    log: List[str],
+    batched: bool = False,
+    **kwargs,
 ):
-    if message_id is None or not message_id.startswith("<{}".format(MESSAGE_ID_PREFIX)):
+    if batched:
+        # Saved in bulk through email_batch_left_queue
         return
+    save_delivery_statuses([{"message_id": message_id, "status": status, "log": log}])
 
-    try:
-        message = FoiMessage.objects.filter(email_message_id=message_id).get()
-    except FoiMessage.DoesNotExist:
+
+@receiver(email_batch_left_queue)
+def save_batch_delivery_status(deliveries: List[dict], **kwargs):
+    save_delivery_statuses(deliveries)
+
+
+def save_delivery_statuses(deliveries: List[dict]):
+    # Only the last delivery of a message in the batch counts
+    deliveries_by_message_id = {}
+    for delivery in deliveries:
+        message_id = delivery.get("message_id")
+        if message_id is None or not message_id.startswith(
+            "<{}".format(MESSAGE_ID_PREFIX)
+        ):
+            continue
+        deliveries_by_message_id[message_id] = delivery
+    if not deliveries_by_message_id:
         return
 
-    delivery_status, _ = DeliveryStatus.objects.update_or_create(
-        message=message,
-        defaults={
-            "log": "".join(log),
-            "status": status,
-            "last_update": timezone.now(),
-        },
+    messages = FoiMessage.objects.filter(
+        email_message_id__in=deliveries_by_message_id.keys()
+    ).select_related("request")
+    now = timezone.now()
+    delivery_statuses = []
+    for message in messages:
+        delivery = deliveries_by_message_id[message.email_message_id]
+        delivery_statuses.append(
+            DeliveryStatus(
+                message=message,
+                log="".join(delivery["log"]),
+                status=delivery["status"],
+                last_update=now,
+            )
+        )
+    DeliveryStatus.objects.bulk_create(
+        delivery_statuses,
+        update_conflicts=True,
+        unique_fields=["message"],
+        update_fields=["log", "status", "last_update"],
+    )
+
+    failed_statuses = [ds for ds in delivery_statuses if ds.is_failed()]
+    reported_message_ids = set(
+        ProblemReport.objects.filter(
+            message__in=[ds.message for ds in failed_statuses],
+            kind=ProblemReport.PROBLEM.BOUNCE_PUBLICBODY,
+        ).values_list("message_id", flat=True)
     )
 
-    if status == "sent":
-        send_foimessage_sent_confirmation(message)
-    elif delivery_status.is_failed():
-        if not ProblemReport.objects.filter(
-            message=message, kind=ProblemReport.PROBLEM.BOUNCE_PUBLICBODY
-        ).exists():
+    for delivery_status in delivery_statuses:
+        message = delivery_status.message
+        if delivery_status.status == "sent":
+            send_foimessage_sent_confirmation(message)
+        elif delivery_status.is_failed():
+            if message.id in reported_message_ids:
+                continue
             ProblemReport.objects.report(
                 message=message,
                 kind=ProblemReport.PROBLEM.BOUNCE_PUBLICBODY,
@@ -1,6 +1,11 @@
+import contextlib
 import logging
+import os
 import re
 import smtplib
+import threading
+import time
+from collections import defaultdict
 
 from django.conf import settings
 from django.core.mail.backends.smtp import EmailBackend as DjangoEmailBackend
@@ -12,18 +17,202 @@ FIX_RE = re.compile(r'^([^"].*) <(.*)>$')
 
 logger = logging.getLogger(__name__)
 
+# Open SMTP sessions per server and worker process
+SMTP_POOL_MAX_CONNECTIONS = 4
+# Idle sessions are checked with NOOP before reuse after this many seconds
+SMTP_POOL_CHECK_AFTER = 5
+# and discarded after this many seconds
+SMTP_POOL_MAX_IDLE = 60
+# Seconds to wait for a free slot before connecting outside of the pool
+SMTP_POOL_SLOT_TIMEOUT = 5
+
 
 def fix_address(a):
     return FIX_RE.sub('"\\1" <\\2>', a)
 
 
+def quit_connection(connection):
+    try:
+        connection.quit()
+    except Exception:
+        with contextlib.suppress(Exception):
+            connection.close()
+
+
+class SMTPConnectionPool:
+    """
+    Keeps SMTP sessions open between sends of a worker process
+
+    A slot has to be acquired before a session is used and released
+    afterwards, which caps the open sessions per server. When no slot
+    becomes free in time the caller connects outside of the pool, so
+    a thread that holds all slots itself can't block forever.
+    """
+
+    def __init__(
+        self,
+        max_connections=SMTP_POOL_MAX_CONNECTIONS,
+        slot_timeout=SMTP_POOL_SLOT_TIMEOUT,
+    ):
+        self.max_connections = max_connections
+        self.slot_timeout = slot_timeout
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.idle = defaultdict(list)
+        self.slots = defaultdict(
+            lambda: threading.BoundedSemaphore(self.max_connections)
+        )
+
+    def check_process(self):
+        # Sessions must not be shared with forked worker processes
+        if self.pid != os.getpid():
+            self.reset()
+
+    def acquire(self, key):
+        """
+        Return (pooled, connection), connection is an idle session for key
+        or None if caller needs to connect. Sessions that are not pooled
+        must not be released.
+        """
+        self.check_process()
+        with self.lock:
+            slot = self.slots[key]
+        if not slot.acquire(timeout=self.slot_timeout):
+            logger.warning("No free SMTP pool slot, connecting outside of pool")
+            return False, None
+        while True:
+            with self.lock:
+                if not self.idle[key]:
+                    return True, None
+                connection, last_used = self.idle[key].pop()
+            idle_time = time.monotonic() - last_used
+            if idle_time > SMTP_POOL_MAX_IDLE:
+                quit_connection(connection)
+                continue
+            if idle_time > SMTP_POOL_CHECK_AFTER and not self.is_alive(connection):
+                quit_connection(connection)
+                continue
+            return True, connection
+
+    def release(self, key, connection, reuse=True):
+        try:
+            if connection is None:
+                return
+            if reuse and self.pid == os.getpid():
+                with self.lock:
+                    self.idle[key].append((connection, time.monotonic()))
+            else:
+                quit_connection(connection)
+        finally:
+            with self.lock:
+                slot = self.slots[key]
+            slot.release()
+
+    def is_alive(self, connection):
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, defaultdict(list)
+        for connections in idle.values():
+            for connection, _last_used in connections:
+                quit_connection(connection)
+
+
+smtp_connection_pool = SMTPConnectionPool()
+
+
 class EmailBackend(DjangoEmailBackend):
     def __init__(self, **kwargs):
         self.rcpt_options = kwargs.pop("rcpt_options", [])
         self.return_path = kwargs.pop("return_path", None)
         super().__init__(**kwargs)
+        self.reusable = True
+        self.pooled = False
+
+    def get_pool_key(self):
+        return (
+            self.host,
+            self.port,
+            self.username,
+            self.password,
+            self.use_tls,
+            self.use_ssl,
+        )
+
+    def open(self):
+        """
+        Take a session from the pool or connect a new one
+
+        Returns True like a new connection so that send_messages
+        hands the session back through close().
+        """
+        if self.connection:
+            return False
+        self.reusable = True
+        self.pooled, self.connection = smtp_connection_pool.acquire(self.get_pool_key())
+        if self.connection is not None:
+            return True
+        return self.connect()
+
+    def connect(self):
+        try:
+            opened = super().open()
+        except Exception:
+            self.release_slot()
+            raise
+        if not opened:
+            # Failed silently
+            self.release_slot()
+        return opened
+
+    def release_slot(self):
+        if self.pooled:
+            self.pooled = False
+            smtp_connection_pool.release(self.get_pool_key(), None)
+
+    def close(self):
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        if self.pooled:
+            self.pooled = False
+            smtp_connection_pool.release(
+                self.get_pool_key(), connection, reuse=self.reusable
+            )
+        else:
+            quit_connection(connection)
+
+    def reconnect(self):
+        # Takes over the pool slot of the broken session
+        quit_connection(self.connection)
+        self.connection = None
+        return self.connect()
+
+    def _send(self, email_message, retry=True):
+        try:
+            return self._send_message(email_message)
+        except smtplib.SMTPServerDisconnected as e:
+            if not retry:
+                logger.exception(e)
+                self.reusable = False
+                return False
+            logger.info("SMTP session disconnected, reconnecting")
+            try:
+                if not self.reconnect():
+                    return False
+            except Exception as e:
+                logger.exception(e)
+                return False
+            return self._send(email_message, retry=False)
 
-    def _send(self, email_message):
+    def _send_message(self, email_message):
         """A helper method that does the actual sending."""
         if not email_message.recipients():
             return False
@@ -48,10 +237,15 @@ class EmailBackend(DjangoEmailBackend):
             handle_smtp_error(e)
             logger.warn("SMTPRecipientsRefused: %s", e)
             return False
+        except smtplib.SMTPServerDisconnected:
+            raise
         except smtplib.SMTPException as e:
             logger.exception(e)
+            # Session state is unknown, don't hand it to the next sender
+            self.reusable = False
             return False
         except Exception as e:
             logger.exception(e)
+            self.reusable = False
             return False
         return True
@@ -19,12 +19,22 @@ from froide.foirequest.utils import find_attachment_name
 from froide.publicbody.models import PublicBody
 from froide.upload.models import Upload
 
-from .foi_mail import _fetch_mail, _process_mail, get_foi_mail_client
+from .foi_mail import (
+    _fetch_mail,
+    _process_mail,
+    _process_spooled_mail,
+    get_foi_mail_client,
+    remove_old_packages,
+    spool_mail,
+)
 from .models import FoiAttachment, FoiProject, FoiRequest
 from .notifications import batch_update_requester, send_classification_reminder
+from .pdf_generator import remove_old_cached_pdfs
 
 logger = logging.getLogger(__name__)
 
+PROJECT_MESSAGE_CHUNK_SIZE = 50
+
 
 @celery_app.task(name="froide.foirequest.tasks.process_mail", acks_late=True)
 def process_mail(*args, **kwargs):
@@ -34,10 +44,19 @@ def process_mail(*args, **kwargs):
         _process_mail(*args, **kwargs)
 
 
+@celery_app.task(name="froide.foirequest.tasks.process_spooled_mail", acks_late=True)
+def process_spooled_mail(mail_path, mail_uid=None):
+    translation.activate(settings.LANGUAGE_CODE)
+
+    with transaction.atomic():
+        _process_spooled_mail(mail_path, mail_uid=mail_uid)
+
+
 @celery_app.task(name="froide.foirequest.tasks.fetch_mail", expires=60)
 def fetch_mail():
     for mail_uid, rfc_data in _fetch_mail():
-        process_mail.delay(rfc_data, mail_uid=mail_uid)
+        mail_path = spool_mail(rfc_data)
+        process_spooled_mail.delay(mail_path, mail_uid=mail_uid)
 
 
 @celery_app.task
@@ -113,8 +132,24 @@ def create_project_request(project_id, publicbody_id, sequence=0, **kwargs):
 
 @celery_app.task
 def create_project_messages(foirequest_ids, user_id, **form_data):
+    foirequest_ids = list(foirequest_ids)
+    for offset in range(0, len(foirequest_ids), PROJECT_MESSAGE_CHUNK_SIZE):
+        create_project_message_batch.delay(
+            foirequest_ids[offset : offset + PROJECT_MESSAGE_CHUNK_SIZE],
+            user_id,
+            **form_data,
+        )
+
+
+@celery_app.task
+def create_project_message_batch(foirequest_ids, user_id, **form_data):
+    # The pooled SMTP backend reuses connections across the batch
     for req_id in foirequest_ids:
-        create_project_message.delay(req_id, user_id, **form_data)
+        try:
+            create_project_message(req_id, user_id, **form_data)
+        except Exception:
+            # Send the rest of the batch
+            logger.exception("Could not create project message for %s", req_id)
 
 
 @celery_app.task
@@ -468,13 +503,15 @@ def move_upload_to_attachment(att_id, upload_id):
 
     try:
         upload = Upload.objects.get(pk=upload_id)
-    except FoiAttachment.DoesNotExist:
+    except Upload.DoesNotExist:
         return
 
     file = upload.get_file()
     if file:
         att.pending = False
-        att.file.save(att.name, file, save=True)
+        # Storage moves the temporary file and reuses the upload's content hash
+        with file:
+            att.file.save(att.name, file, save=True)
     upload.finish()
     upload.delete()
 
@@ -516,6 +553,16 @@ def remove_old_drafts():
     draft_messages_to_be_deleted.delete()
 
 
+@celery_app.task(name="froide.foirequest.tasks.remove_old_packages_task")
+def remove_old_packages_task():
+    remove_old_packages()
+
+
+@celery_app.task(name="froide.foirequest.tasks.remove_old_cached_pdfs_task")
+def remove_old_cached_pdfs_task():
+    remove_old_cached_pdfs()
+
+
 @celery_app.task(
     name="froide.foirequest.tasks.warn_on_unprocessed_mail", time_limit=120
 )
@@ -120,15 +120,13 @@ def highlight_request(message, request):
     return mark_safe("".join(html))
 
 
-def render_message_content(message, authenticated_read=False, render_footer=True):
-    cached_content = message.get_cached_rendered_content(authenticated_read)
-    if cached_content is not None:
-        return mark_safe(cached_content)
-
+def get_message_content_markup(
+    message, authenticated_read=False, render_footer=True
+) -> SafeString:
     real_content = unify(message.get_real_content())
     redacted_content = unify(message.get_content())
 
-    content = markup_redacted_content(
+    return markup_redacted_content(
         real_content,
         redacted_content,
         authenticated_read=authenticated_read,
@@ -136,6 +134,16 @@ def render_message_content(message, authenticated_read=False, render_footer=True
         render_footer=render_footer,
     )
 
+
+def render_message_content(message, authenticated_read=False, render_footer=True):
+    cached_content = message.get_cached_rendered_content(authenticated_read)
+    if cached_content is not None:
+        return mark_safe(cached_content)
+
+    content = get_message_content_markup(
+        message, authenticated_read=authenticated_read, render_footer=render_footer
+    )
+
     message.set_cached_rendered_content(authenticated_read, content)
 
     return content
@@ -157,22 +165,28 @@ def redact_request_description(
     return render_request_description(foirequest, authenticated_read)
 
 
-def render_request_description(
+def get_request_description_markup(
     foirequest: FoiRequest, authenticated_read: bool
 ) -> SafeString:
-    cached_content = foirequest.get_cached_rendered_description(authenticated_read)
-    if cached_content:
-        return mark_safe(cached_content)
-
     real_content = unify(foirequest.description)
     redacted_content = unify(foirequest.get_description())
 
-    content = mark_redacted(
+    return mark_redacted(
         real_content,
         redacted_content,
         authenticated_read=authenticated_read,
     )
 
+
+def render_request_description(
+    foirequest: FoiRequest, authenticated_read: bool
+) -> SafeString:
+    cached_content = foirequest.get_cached_rendered_description(authenticated_read)
+    if cached_content:
+        return mark_safe(cached_content)
+
+    content = get_request_description_markup(foirequest, authenticated_read)
+
     if content:
         foirequest.set_cached_rendered_description(
             authenticated_read=authenticated_read, description=content
@@ -1,3 +1,5 @@
+import hashlib
+import os
 from datetime import timedelta
 
 from django.test import Client
@@ -9,8 +11,10 @@ import pytest
 from froide.document.factories import DocumentFactory
 from froide.foirequest.models.event import FoiEvent
 from froide.foirequest.models.message import MessageKind
+from froide.foirequest.tasks import move_upload_to_attachment
 from froide.foirequest.tests import factories
 from froide.upload.factories import UploadFactory
+from froide.upload.models import Upload
 
 
 @pytest.mark.django_db
@@ -387,3 +391,77 @@ def test_retrieve_attachment_on_draft(client: Client, user):
     data = response.json()
     assert len(data["objects"]) == 1
     assert data["objects"][0]["id"] == attachment.pk
+
+
+@pytest.mark.django_db
+def test_upload_tus_patch_and_concatenation(client: Client, user):
+    assert client.login(email=user.email, password="froide")
+    tus_headers = {
+        "content_type": "application/offset+octet-stream",
+        "HTTP_TUS_RESUMABLE": "1.0.0",
+    }
+
+    def create_upload(**headers):
+        response = client.post(reverse("api:upload-list"), **tus_headers, **headers)
+        assert response.status_code == 201
+        return response["Location"]
+
+    def patch_upload(url, data, offset, **headers):
+        return client.patch(
+            url, data=data, HTTP_UPLOAD_OFFSET=str(offset), **tus_headers, **headers
+        )
+
+    part_urls = [
+        create_upload(HTTP_UPLOAD_LENGTH="6", HTTP_UPLOAD_CONCAT="partial")
+        for _i in range(2)
+    ]
+    response = patch_upload(part_urls[0], b"abc", 0)
+    assert response.status_code == 204
+    assert response["Upload-Offset"] == "3"
+    response = patch_upload(part_urls[0], b"def", 3, HTTP_UPLOAD_CHECKSUM="md5 invalid")
+    assert response.status_code == 460
+    response = patch_upload(part_urls[0], b"defghi", 3)
+    assert response.status_code == 413
+    response = patch_upload(part_urls[0], b"def", 3)
+    assert response.status_code == 204
+    assert response["Upload-Offset"] == "6"
+    response = patch_upload(part_urls[1], b"ghijkl", 0)
+    assert response.status_code == 204
+
+    final_url = create_upload(HTTP_UPLOAD_CONCAT="final;{}".format(" ".join(part_urls)))
+    response = client.head(final_url, HTTP_TUS_RESUMABLE="1.0.0")
+    assert response.status_code == 200
+    assert response["Upload-Offset"] == "12"
+    assert response["Upload-Concat"].startswith("final;")
+    response = patch_upload(final_url, b"mno", 12)
+    assert response.status_code == 403
+
+    upload = Upload.objects.get_by_url(final_url, user=user)
+    assert upload.is_complete()
+    with open(upload.temporary_file_path, "rb") as f:
+        assert f.read() == b"abcdefghijkl"
+    # partial uploads are removed after concatenation
+    assert Upload.objects.get_by_url(part_urls[0], user=user) is None
+
+    # storage moves the file to the hash computed while concatenating
+    content_hash = hashlib.sha256(b"abcdefghijkl").hexdigest()
+    assert upload.content_hash == content_hash
+    att = factories.FoiAttachmentFactory.create(
+        name="concatenated.pdf", file=None, pending=True
+    )
+    temporary_file_path = upload.temporary_file_path
+    move_upload_to_attachment(att.id, upload.id)
+    att.refresh_from_db()
+    assert not att.pending
+    assert att.file.name.endswith(content_hash + ".pdf")
+    assert not os.path.exists(temporary_file_path)
+    with att.file.open("rb") as f:
+        assert f.read() == b"abcdefghijkl"
+
+    # partial uploads need to exist and be complete
+    response = client.post(
+        reverse("api:upload-list"),
+        HTTP_UPLOAD_CONCAT="final;{}".format(part_urls[0]),
+        **tus_headers,
+    )
+    assert response.status_code == 400
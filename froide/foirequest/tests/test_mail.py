@@ -1,9 +1,11 @@
 import os
+import smtplib
 from datetime import datetime
 from datetime import timezone as dt_timezone
 
 from django.conf import settings
 from django.core import mail
+from django.core.mail import EmailMessage
 from django.db.models import signals
 from django.test.utils import override_settings
 from django.utils import timezone
@@ -12,7 +14,14 @@ from django.utils.translation import gettext_lazy as _
 import pytest
 from factory.django import mute_signals
 
-from froide.foirequest.foi_mail import add_message_from_email
+from froide.foirequest import foi_mail, smtp
+from froide.foirequest.delivery_cache import is_spam_sender
+from froide.foirequest.foi_mail import (
+    _process_spooled_mail,
+    add_message_from_email,
+    should_drop_email,
+    spool_mail,
+)
 from froide.foirequest.models import DeferredMessage, FoiMessage, FoiRequest
 from froide.foirequest.services import BOUNCE_TAG
 from froide.foirequest.tasks import process_mail
@@ -445,6 +454,22 @@ def test_existing_spam(spammail_setup):
     assert len(mail.outbox) == 0
 
 
+@pytest.mark.django_db
+def test_spam_sender_cache_invalidation(spammail_setup):
+    recipient = spammail_setup["secret_address"]
+    sender = "hb@bad-example.com"
+    assert not should_drop_email(recipient, sender)
+
+    deferred = DeferredMessage.objects.create(
+        recipient=recipient, spam=True, sender=sender
+    )
+    assert should_drop_email(recipient, sender)
+
+    deferred.spam = False
+    deferred.save()
+    assert not should_drop_email(recipient, sender)
+
+
 @pytest.fixture
 def req_with_bounce_msg(world):
     secret_address = "sw+yurpykc1hr@fragdenstaat.de"
@@ -511,3 +536,111 @@ def test_parsing_attachment_without_content_disposition():
     assert attachment.name == "_1_0CCE8CEC0CCE8894004AF2EFC125893A.gif"
     assert attachment.size == 35
     assert attachment.content_type == "image/gif"
+
+
+class FakeSMTP:
+    def __init__(self, host, port, **kwargs):
+        self.sent = []
+        self.closed = False
+
+    def sendmail(self, from_email, recipients, message, rcpt_options=None):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected()
+        self.sent.append(recipients)
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def test_smtp_connection_pool(monkeypatch):
+    connections = []
+
+    def make_connection(*args, **kwargs):
+        connections.append(FakeSMTP(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(
+        smtp.EmailBackend, "connection_class", property(lambda self: make_connection)
+    )
+    monkeypatch.setattr(smtp, "smtp_connection_pool", smtp.SMTPConnectionPool())
+
+    def send(recipient):
+        backend = smtp.EmailBackend(host="localhost", port=25)
+        email = EmailMessage("Subject", "Body", "from@example.org", [recipient])
+        return backend.send_messages([email])
+
+    assert send("a@example.org") == 1
+    assert send("b@example.org") == 1
+    assert len(connections) == 1
+    assert connections[0].sent == [["a@example.org"], ["b@example.org"]]
+
+    # Server dropped the idle session
+    connections[0].closed = True
+    assert send("c@example.org") == 1
+    assert len(connections) == 2
+    assert connections[1].sent == [["c@example.org"]]
+
+
+def test_smtp_connection_pool_full(monkeypatch):
+    connections = []
+
+    def make_connection(*args, **kwargs):
+        connections.append(FakeSMTP(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(
+        smtp.EmailBackend, "connection_class", property(lambda self: make_connection)
+    )
+    monkeypatch.setattr(
+        smtp,
+        "smtp_connection_pool",
+        smtp.SMTPConnectionPool(max_connections=1, slot_timeout=0),
+    )
+
+    # The same thread holds the only slot, the next backend must not wait
+    holding = smtp.EmailBackend(host="localhost", port=25)
+    holding.open()
+    backend = smtp.EmailBackend(host="localhost", port=25)
+    email = EmailMessage("Subject", "Body", "from@example.org", ["a@example.org"])
+    assert backend.send_messages([email]) == 1
+    assert len(connections) == 2
+    assert connections[1].closed
+    holding.close()
+
+
+@pytest.mark.django_db
+def test_spool_mail(
+    settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.PRIVATE_MEDIA_ROOT = str(tmp_path)
+    processed = []
+    monkeypatch.setattr(
+        foi_mail,
+        "_process_mail",
+        lambda mail_bytes, **kwargs: processed.append(mail_bytes),
+    )
+
+    mail_path = spool_mail(b"Subject: Test")
+    spooled_file = tmp_path / "mailspool" / mail_path
+    assert spooled_file.read_bytes() == b"Subject: Test"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        _process_spooled_mail(mail_path)
+    assert processed == [b"Subject: Test"]
+    assert not spooled_file.exists()
+
+
+@pytest.mark.django_db
+def test_spam_sender_after_bulk_update():
+    DeferredMessage.objects.create(sender="spam@example.org", spam=False)
+    assert not is_spam_sender("spam@example.org")
+    # Bulk updates send no signals
+    DeferredMessage.objects.filter(sender="spam@example.org").update(spam=True)
+    assert is_spam_sender("spam@example.org")
+    assert not is_spam_sender("other@example.org")
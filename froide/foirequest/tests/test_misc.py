@@ -1,9 +1,12 @@
+import json
 from datetime import timedelta
+from io import StringIO
 from unittest.mock import MagicMock, patch
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
 from django.core import mail
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 from django.utils.safestring import SafeString
@@ -11,12 +14,22 @@ from django.utils.safestring import SafeString
 import pytest
 
 from froide.comments.models import FroideComment
+from froide.foirequest.documents import FoiRequestDocument
 from froide.foirequest.models import FoiMessage, FoiRequest
 from froide.foirequest.notifications import (
     Notification,
     batch_update_requester,
     send_update,
 )
+from froide.foirequest.pdf_generator import (
+    FoiRequestMessagePDFGenerator,
+    remove_old_cached_pdfs,
+)
+from froide.foirequest.render_cache import (
+    RENDER_CACHE_VERSION,
+    RenderCacheBuilder,
+    calculate_chunk,
+)
 from froide.foirequest.tasks import (
     classification_reminder,
     detect_asleep,
@@ -24,6 +37,7 @@ from froide.foirequest.tasks import (
 )
 from froide.foirequest.templatetags.foirequest_tags import (
     check_same_request,
+    get_message_content_markup,
     render_message_content,
 )
 from froide.foirequest.tests import factories
@@ -389,3 +403,135 @@ def test_cached_rendered_content(
         redacted_content = render_message_content(redacted_foi_message, auth)
         assert redacted_content == expected_redacted_content[auth]
         assert redacted_content == expected_redacted_content[auth]
+
+
+@pytest.mark.django_db
+def test_cache_text_redactions_command(foi_message_factory, tmp_path):
+    req_text = "Lorem ipsum dolor sit amet. " * (CONTENT_CACHE_THRESHOLD // 20)
+    message = foi_message_factory(
+        plaintext=f"Dear Mx. Example,\n\n{req_text}\n\nGreetings,\nAlex Example",
+        plaintext_redacted=f"Dear <<Redacted>>,\n\n{req_text}\n\nGreetings,\n<<Redacted>>",
+    )
+    short_message = foi_message_factory(plaintext="Short", plaintext_redacted="Short")
+    checkpoint = tmp_path / "checkpoint.json"
+
+    call_command(
+        "cache_text_redactions",
+        workers=1,
+        chunk_size=1,
+        checkpoint=str(checkpoint),
+        stdout=StringIO(),
+    )
+
+    message.refresh_from_db()
+    assert message.render_cache_version == RENDER_CACHE_VERSION
+    assert message.redacted_content_auth == message.calculate_redacted_content(True)
+    assert message.redacted_content_anon == message.calculate_redacted_content(False)
+    assert message.content_rendered_auth == get_message_content_markup(message, True)
+    assert message.content_rendered_anon == get_message_content_markup(message, False)
+    short_message.refresh_from_db()
+    assert short_message.content_rendered_auth is None
+    assert not checkpoint.exists()
+
+    # Resuming skips messages up to the checkpoint
+    cache_version = RENDER_CACHE_VERSION + 1
+    checkpoint.write_text(
+        json.dumps(
+            {"cache_version": cache_version, "last_ids": {"message": message.id}}
+        )
+    )
+    call_command(
+        "cache_text_redactions",
+        workers=1,
+        cache_version=cache_version,
+        checkpoint=str(checkpoint),
+        stdout=StringIO(),
+    )
+    message.refresh_from_db()
+    assert message.render_cache_version == RENDER_CACHE_VERSION
+
+    call_command(
+        "cache_text_redactions",
+        workers=1,
+        cache_version=cache_version,
+        stdout=StringIO(),
+    )
+    message.refresh_from_db()
+    assert message.render_cache_version == cache_version
+
+
+@pytest.mark.django_db
+def test_render_cache_skips_redacted_since(foi_message_factory):
+    req_text = "Lorem ipsum dolor sit amet. " * (CONTENT_CACHE_THRESHOLD // 20)
+    message = foi_message_factory(
+        plaintext=f"Dear Mx. Example,\n\n{req_text}",
+        plaintext_redacted=f"Dear <<Redacted>>,\n\n{req_text}",
+    )
+    results = calculate_chunk("message", [message.id])
+
+    # Redacted again while the chunk was calculated
+    message.plaintext_redacted = f"<<Redacted>> Mx. Example,\n\n{req_text}"
+    message.clear_render_cache()
+    message.save()
+
+    builder = RenderCacheBuilder(workers=1)
+    assert builder.write_chunk("message", message.id, results) == 0
+    message.refresh_from_db()
+    assert message.redacted_content_auth is None
+    assert message.content_rendered_auth is None
+
+
+@pytest.mark.django_db
+def test_message_pdf_cache(foi_message_factory, settings, tmp_path):
+    settings.FOI_PDF_CACHE = True
+    settings.PRIVATE_MEDIA_ROOT = tmp_path
+    message = foi_message_factory.create()
+
+    with patch(
+        "froide.foirequest.pdf_generator.render_pdf", return_value=b"%PDF"
+    ) as render_pdf:
+        assert FoiRequestMessagePDFGenerator(message).get_pdf_bytes() == b"%PDF"
+        assert FoiRequestMessagePDFGenerator(message).get_pdf_bytes() == b"%PDF"
+        assert FoiRequestMessagePDFGenerator(message).get_pdf_bytes() == b"%PDF"
+        assert render_pdf.call_count == 1
+
+        message.subject = "Changed subject"
+        assert FoiRequestMessagePDFGenerator(message).get_pdf_bytes() == b"%PDF"
+        assert render_pdf.call_count == 2
+
+    assert remove_old_cached_pdfs() == 0
+    assert remove_old_cached_pdfs(max_age=timedelta(0)) == 2
+    with patch(
+        "froide.foirequest.pdf_generator.render_pdf", return_value=b"%PDF"
+    ) as render_pdf:
+        FoiRequestMessagePDFGenerator(message).get_pdf_bytes()
+        assert render_pdf.call_count == 1
+
+
+@pytest.mark.django_db
+def test_search_document_chunk_preparation(
+    foi_request_factory,
+    foi_message_factory,
+    public_body_factory,
+    classification_factory,
+    django_assert_num_queries,
+):
+    root = classification_factory()
+    child = root.add_child(name="Child classification", slug="child-classification")
+    public_body = public_body_factory(classification=child)
+    requests = [
+        foi_request_factory(public_body=public_body, description_redacted="Desc")
+        for _ in range(3)
+    ]
+    for req in requests:
+        foi_message_factory(request=req, subject_redacted="Subject %s" % req.id)
+
+    doc = FoiRequestDocument()
+    objs = list(doc.get_queryset().filter(id__in=[r.id for r in requests]))
+    doc.prepare_chunk(objs)
+    with django_assert_num_queries(0):
+        data = {obj.id: doc.prepare(obj) for obj in objs}
+
+    for req in requests:
+        assert data[req.id]["classification"] == [child.id, root.id]
+        assert "Subject %s" % req.id in data[req.id]["content"]
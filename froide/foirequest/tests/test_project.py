@@ -9,7 +9,11 @@ import pytest
 
 from froide.foirequest.models import FoiProject, FoiRequest
 from froide.foirequest.models.message import FoiMessage
-from froide.foirequest.tasks import create_project_messages, create_project_requests
+from froide.foirequest.tasks import (
+    create_project_message_batch,
+    create_project_messages,
+    create_project_requests,
+)
 from froide.foirequest.tests import factories
 from froide.helper.db_utils import save_obj_with_slug
 from froide.publicbody.models import PublicBody
@@ -205,3 +209,22 @@ def test_project_mass_mail(project_with_requests, faker):
     assert project_with_requests.user.email not in out_mails
     pb_mails = set(project_foireqs.values_list("public_body__email", flat=True))
     assert out_mails == pb_mails
+
+
+@pytest.mark.django_db
+def test_project_message_batch_continues_after_error(project_with_requests, faker):
+    project_foireqs = project_with_requests.foirequest_set.all()
+    # Not part of the project, creating its message fails
+    other_request = factories.FoiRequestFactory.create(user=project_with_requests.user)
+    subject = faker.text()
+    mail.outbox = []
+
+    create_project_message_batch(
+        [other_request.id] + list(project_foireqs.values_list("id", flat=True)),
+        project_with_requests.user.id,
+        subject=subject,
+        message=faker.text(),
+    )
+
+    assert not FoiMessage.objects.filter(subject=subject, request=other_request)
+    assert len(mail.outbox) == project_foireqs.count()
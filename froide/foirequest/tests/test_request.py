@@ -23,10 +23,13 @@ import pytest
 import time_machine
 from pytest_django.asserts import assertContains, assertFormError, assertNotContains
 
+from froide.foirequest import foi_mail
 from froide.foirequest.foi_mail import (
     add_message_from_email,
     generate_foirequest_files,
+    open_foirequest_package,
     package_foirequest,
+    remove_old_packages,
 )
 from froide.foirequest.forms import get_escalation_message_form, get_send_message_form
 from froide.foirequest.models import (
@@ -2110,6 +2113,53 @@ def test_package(world):
         assert bool(re.match(r"^%s$" % fname, zname))
 
 
+@pytest.mark.django_db
+def test_package_cache(world, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        foi_mail, "get_package_cache_dir", lambda foirequest: str(tmp_path)
+    )
+    fr = FoiRequest.objects.all()[0]
+    with open_foirequest_package(fr):
+        pass
+    package_names = os.listdir(tmp_path)
+    assert len(package_names) == 1
+
+    old_package_file = open_foirequest_package(fr)
+    assert os.listdir(tmp_path) == package_names
+
+    fr.save()
+    with open_foirequest_package(fr) as package_file:
+        with zipfile.ZipFile(package_file, "r") as zfile:
+            assert len(zfile.namelist()) == 5
+    new_package_names = os.listdir(tmp_path)
+    assert len(new_package_names) == 1
+    assert new_package_names != package_names
+
+    # Still readable after the rebuild removed it
+    with old_package_file:
+        with zipfile.ZipFile(old_package_file, "r") as zfile:
+            assert len(zfile.namelist()) == 5
+
+
+@pytest.mark.django_db
+def test_remove_old_packages(world, settings, tmp_path):
+    settings.PRIVATE_MEDIA_ROOT = str(tmp_path)
+    fr = FoiRequest.objects.all()[0]
+    with open_foirequest_package(fr):
+        pass
+    cache_dir = foi_mail.get_package_cache_dir(fr)
+    assert cache_dir.startswith(str(tmp_path))
+    package_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+
+    assert remove_old_packages() == 0
+    assert os.path.exists(package_path)
+
+    old = datetime.now().timestamp() - timedelta(days=30).total_seconds()
+    os.utime(package_path, (old, old))
+    assert remove_old_packages() == 1
+    assert not os.path.exists(cache_dir)
+
+
 @pytest.mark.django_db
 def test_postal_after_last(world, client, pb, faker):
     """
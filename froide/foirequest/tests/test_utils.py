@@ -1,7 +1,11 @@
 from django.test import TestCase
 
 from froide.foirequest.tests import factories
-from froide.foirequest.utils import get_publicbody_for_email
+from froide.foirequest.utils import (
+    PublicBodyEmailInfo,
+    PublicBodyEmailMatcher,
+    get_publicbody_for_email,
+)
 from froide.publicbody.factories import FoiLawFactory, PublicBodyFactory
 
 
@@ -38,3 +42,29 @@ class FoiRequestPublicBodyInfoTest(TestCase):
 
         pb = get_publicbody_for_email(self.mediator.email, self.req)
         self.assertEqual(pb, self.mediator)
+
+    def test_get_publicbody_for_email_host(self):
+        pb = PublicBodyFactory(email="info@mail.other.example.org")
+        PublicBodyFactory(email="info@notother.example.org")
+        self.assertEqual(pb.email_host_reversed, "org.example.other.mail")
+
+        found = get_publicbody_for_email("someone@other.example.org", self.req)
+        self.assertEqual(found, pb)
+
+
+class PublicBodyEmailMatcherTest(TestCase):
+    def test_match_order(self):
+        pb1 = PublicBodyFactory.build(email="a@sub.example.org")
+        pb2 = PublicBodyFactory.build(email="b@other.example.org")
+        matcher = PublicBodyEmailMatcher(
+            [
+                PublicBodyEmailInfo(email=pb1.email, name="", publicbody=pb1),
+                PublicBodyEmailInfo(email=pb2.email, name="", publicbody=pb2),
+                PublicBodyEmailInfo(email="c@example.net", name=""),
+            ]
+        )
+        self.assertEqual(matcher.match("B@Other.example.org"), pb2)
+        self.assertEqual(matcher.match("x@other.example.org"), pb2)
+        self.assertEqual(matcher.match("x@example.org"), pb1)
+        self.assertIsNone(matcher.match("x@example.org", compare_tld=False))
+        self.assertIsNone(matcher.match("c@example.net"))
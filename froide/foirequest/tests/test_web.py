@@ -1,7 +1,7 @@
 import itertools
 import unittest
 import urllib.parse
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Callable, Optional
 from unittest import mock
 
@@ -494,6 +494,63 @@ def test_attachment_not_approved(world, client):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_request_page_attachment_fragment_cache(world, client):
+    att = FoiAttachment.objects.filter(approved=True, belongs_to__isnull=False)[0]
+    foirequest = att.belongs_to.request
+    client.force_login(foirequest.user)
+    response = client.get(foirequest.get_absolute_url())
+    assertContains(response, att.name)
+
+    att.name = "renamed_attachment.pdf"
+    att.save()
+    response = client.get(foirequest.get_absolute_url())
+    assertContains(response, "renamed_attachment.pdf")
+
+
+@pytest.mark.django_db
+def test_request_page_message_thread_window(world, client):
+    from froide.foirequest.views.request import MESSAGE_THREAD_WINDOW
+
+    req = factories.FoiRequestFactory.create(site=world, public=True)
+    messages = [
+        factories.FoiMessageFactory.create(
+            request=req,
+            timestamp=datetime(2022, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i),
+        )
+        for i in range(3 * MESSAGE_THREAD_WINDOW)
+    ]
+    first = messages[:MESSAGE_THREAD_WINDOW]
+    hidden = messages[MESSAGE_THREAD_WINDOW:-MESSAGE_THREAD_WINDOW]
+    latest = messages[-MESSAGE_THREAD_WINDOW:]
+
+    response = client.get(req.get_absolute_url())
+    assert response.status_code == 200
+    for message in first + latest:
+        assertContains(response, 'id="%s"' % message.get_html_id())
+    for message in hidden:
+        assertNotContains(response, 'id="%s"' % message.get_html_id())
+    thread_url = reverse("foirequest-message_thread", kwargs={"slug": req.slug})
+    assertContains(response, thread_url)
+
+    response = client.get(
+        thread_url,
+        {"start": MESSAGE_THREAD_WINDOW, "end": 2 * MESSAGE_THREAD_WINDOW},
+    )
+    assert response.status_code == 200
+    for message in hidden:
+        assertContains(response, 'id="%s"' % message.get_html_id())
+    for message in first + latest:
+        assertNotContains(response, 'id="%s"' % message.get_html_id())
+
+    response = client.get(req.get_absolute_url(), {"messages": "all"})
+    for message in messages:
+        assertContains(response, 'id="%s"' % message.get_html_id())
+
+    response = client.get(thread_url, {"start": "a"})
+    assert response.status_code == 400
+
+
 @pytest.mark.django_db
 def test_request_public(world, client):
     att = FoiAttachment.objects.filter(approved=True)[0]
@@ -574,6 +631,33 @@ def test_queries_foirequest_loggedin(world, client):
         client.get(req.get_absolute_url())
 
 
+@pytest.mark.django_db
+def test_permission_checks_cached_per_request(world, rf):
+    from froide.foirequest.auth import (
+        can_read_foirequest_authenticated,
+        can_read_foirequests_authenticated,
+    )
+
+    user = User.objects.get(email="dummy@example.org")
+    other = factories.UserFactory.create()
+    req = factories.FoiRequestFactory.create(site=world, user=user)
+    other_req = factories.FoiRequestFactory.create(site=world, user=other)
+
+    request = rf.get("/")
+    request.user = user
+    assert can_read_foirequests_authenticated(
+        [req, other_req], request, allow_code=False
+    ) == [True, False]
+    with assertNumQueries(0):
+        assert can_read_foirequest_authenticated(req, request, allow_code=False)
+
+    # A new request with a different user is checked again
+    request = rf.get("/")
+    request.user = other
+    assert not can_read_foirequest_authenticated(req, request, allow_code=False)
+    assert can_read_foirequest_authenticated(other_req, request, allow_code=False)
+
+
 @pytest.fixture
 def req_with_unordered_messages(
     foi_request_factory, foi_message_factory, faker
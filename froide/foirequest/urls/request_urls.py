@@ -46,6 +46,7 @@ from ..views import (
     set_tags,
     shortlink,
     show_attachment,
+    show_message_thread,
     suggest_public_body,
     upload_attachments,
     upload_postal_message,
@@ -63,6 +64,11 @@ urlpatterns = [
     # Shortlink for message
     path("m/<int:obj_id>/", message_shortlink, name="foirequest-message_shortlink"),
     path("<slug:slug>/", FoiRequestView.as_view(), name="foirequest-show"),
+    path(
+        "<slug:slug>/messages/",
+        show_message_thread,
+        name="foirequest-message_thread",
+    ),
     path(
         "<slug:slug>/suggest/public-body/",
         suggest_public_body,
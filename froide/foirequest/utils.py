@@ -1,12 +1,13 @@
 import datetime
 import json
+import os
 import re
 import zipfile
 from dataclasses import dataclass
 from datetime import timedelta
 from io import BytesIO
-from pathlib import PurePath
-from typing import Iterator, List, Optional, Tuple, Union
+from pathlib import Path, PurePath
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from django import forms
 from django.conf import settings
@@ -26,8 +27,8 @@ from froide.foirequest.models.message import FoiMessage
 from froide.helper.content_urls import get_content_url
 from froide.helper.date_utils import format_seconds
 from froide.helper.email_utils import delete_mails_by_recipient
+from froide.helper.search.index_queue import search_index_queue
 from froide.helper.storage import make_unique_filename
-from froide.helper.tasks import search_instance_save
 from froide.helper.text_utils import (
     apply_text_replacements,
     find_all_emails,
@@ -264,38 +265,49 @@ def get_domain(email):
     return strip_subdomains(host)
 
 
-def compare_publicbody_email_with_transform(
-    email: str, pb_info_list: List[PublicBodyEmailInfo], transform=str.lower
-):
-    email = transform(email)
+class PublicBodyEmailMatcher:
+    """
+    Match an email against a list of public body email infos
+    by exact address, full host or domain with one lookup each.
+    The first entry in list order wins like in a linear scan.
+    """
 
-    for pb_info in pb_info_list:
-        if pb_info.publicbody and transform(pb_info.email) == email:
-            return pb_info.publicbody
+    def __init__(self, pb_info_list: Iterable[PublicBodyEmailInfo] = ()):
+        self.by_email: Dict[str, PublicBody] = {}
+        self.by_host: Dict[str, PublicBody] = {}
+        self.by_domain: Dict[str, PublicBody] = {}
+        for pb_info in pb_info_list:
+            self.add(pb_info)
+
+    def add(self, pb_info: PublicBodyEmailInfo):
+        if not pb_info.publicbody:
+            return
+        email = pb_info.email.lower()
+        self.by_email.setdefault(email, pb_info.publicbody)
+        host = get_host(email)
+        if host is None:
+            return
+        self.by_host.setdefault(host, pb_info.publicbody)
+        self.by_domain.setdefault(strip_subdomains(host), pb_info.publicbody)
+
+    def match(self, email: str, compare_tld=True) -> Optional[PublicBody]:
+        email = email.lower()
+        pb = self.by_email.get(email)
+        if pb:
+            return pb
+        host = get_host(email)
+        if host is None:
+            return None
+        pb = self.by_host.get(host)
+        if pb or not compare_tld:
+            return pb
+        return self.by_domain.get(strip_subdomains(host))
 
 
 def compare_publicbody_email(
     email: str, pb_info_list: List[PublicBodyEmailInfo], compare_tld=True
 ) -> Optional[PublicBody]:
-    # Compare email direct
-    pb = compare_publicbody_email_with_transform(email, pb_info_list)
-    if pb:
-        return pb
-
-    # Compare email full host
-    pb = compare_publicbody_email_with_transform(
-        email, pb_info_list, transform=get_host
-    )
-    if pb:
-        return pb
-
-    if not compare_tld:
-        return None
-
-    # Compare email domain without subdomains
-    return compare_publicbody_email_with_transform(
-        email, pb_info_list, transform=get_domain
-    )
+    return PublicBodyEmailMatcher(pb_info_list).match(email, compare_tld=compare_tld)
 
 
 def get_publicbody_for_email(
@@ -304,7 +316,9 @@ def get_publicbody_for_email(
     if not email:
         return None
 
-    pb_info_list = list(get_emails_from_request(foirequest))
+    from .delivery_cache import get_publicbody_ids_for_host, get_request_emails
+
+    pb_info_list = get_request_emails(foirequest)
 
     pb = compare_publicbody_email(email, pb_info_list)
     if pb:
@@ -314,10 +328,12 @@ def get_publicbody_for_email(
     email_host = get_host(email)
     if email_host is None:
         return None
-    pbs = PublicBody.objects.filter(email__endswith=email_host)
-    if len(pbs) == 1:
-        return pbs[0]
-    elif foirequest.public_body in pbs:
+    pb_ids = get_publicbody_ids_for_host(email_host)
+    if len(pb_ids) == 1:
+        pb = PublicBody.objects.filter(id=pb_ids[0]).first()
+        if pb is not None:
+            return pb
+    elif foirequest.public_body_id in pb_ids:
         # likely the request's public body
         return foirequest.public_body
 
@@ -470,15 +486,17 @@ def get_emails_from_request(
     pb_info_list = list(
         get_emails_from_request_iterator(foirequest, include_mediator=include_mediator)
     )
+    matcher = PublicBodyEmailMatcher(pb_info_list)
 
     for pb_info in pb_info_list:
         email = pb_info.email.lower()
         if email in already:
             continue
         if not pb_info.publicbody:
-            pb = compare_publicbody_email(email, pb_info_list, compare_tld=False)
+            pb = matcher.match(email, compare_tld=False)
             if pb:
                 pb_info.publicbody = pb
+                matcher.add(pb_info)
         yield pb_info
         already.add(email)
 
@@ -746,6 +764,7 @@ def add_ical_events(foirequest, cal):
 
 
 def export_user_data(user):
+    from froide.account.export import json_array
     from froide.helper.api_utils import get_fake_api_context
 
     from .models import FoiAttachment, FoiProject
@@ -788,13 +807,12 @@ def export_user_data(user):
                 ).encode("utf-8"),
             )
         for attachment in all_attachments:
-            try:
-                yield (
-                    "requests/%s/%s/%s" % (foirequest.id, message.id, attachment.name),
-                    attachment.get_bytes(),
-                )
-            except IOError:
-                pass
+            if not attachment.file or not os.path.exists(attachment.file.path):
+                continue
+            yield (
+                "requests/%s/%s/%s" % (foirequest.id, message.id, attachment.name),
+                Path(attachment.file.path),
+            )
 
     drafts = user.requestdraft_set.all()
     if drafts:
@@ -838,22 +856,20 @@ def export_user_data(user):
         )
 
     events = user.foievent_set.all()
-    if events:
+    if events.exists():
         yield (
             "events.json",
-            json.dumps(
-                [
-                    {
-                        "timestamp": (e.timestamp.isoformat() if e.timestamp else None),
-                        "publicbody": e.public_body_id,
-                        "request": e.request_id,
-                        "event_name": e.event_name,
-                        "public": e.public,
-                        "context": e.context,
-                    }
-                    for e in events
-                ]
-            ).encode("utf-8"),
+            json_array(
+                {
+                    "timestamp": (e.timestamp.isoformat() if e.timestamp else None),
+                    "publicbody": e.public_body_id,
+                    "request": e.request_id,
+                    "event_name": e.event_name,
+                    "public": e.public,
+                    "context": e.context,
+                }
+                for e in events.iterator()
+            ),
         )
 
     projects = FoiProject.objects.get_for_user(user)
@@ -886,8 +902,9 @@ def export_user_data(user):
 
 
 def update_foirequest_index(queryset):
-    for foirequest_id in queryset.values_list("id", flat=True):
-        search_instance_save.delay("foirequest.foirequest", foirequest_id)
+    search_index_queue.add(
+        "foirequest.foirequest", queryset.values_list("id", flat=True)
+    )
 
 
 def select_foirequest_template(foirequest, base_template: str):
@@ -54,7 +54,7 @@ from .project import (
     make_project_public,
     project_shortlink,
 )
-from .request import FoiRequestView, auth, shortlink
+from .request import FoiRequestView, auth, shortlink, show_message_thread
 from .request_actions import (
     SetProjectView,
     SetTeamView,
@@ -141,6 +141,7 @@ __all__ = [
     "shortlink",
     "auth",
     "FoiRequestView",
+    "show_message_thread",
     "SetProjectView",
     "message_shortlink",
     "mark_attachment_as_moderated",
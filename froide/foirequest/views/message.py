@@ -1,11 +1,12 @@
 import json
 import logging
+import tempfile
 from functools import partial
 
 from django.conf import settings
 from django.contrib import messages
 from django.db import transaction
-from django.http import Http404, HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
@@ -1004,16 +1005,22 @@ def download_message_letter_pdf(request, foirequest, message_id):
 
 @allow_read_foirequest_authenticated
 def download_message_package(request, foirequest, message_id):
-    from ..foi_mail import package_message
+    from ..foi_mail import write_message_package
 
     message = get_object_or_404(FoiMessage, request=foirequest, pk=message_id)
-    response = HttpResponse(package_message(message), content_type="application/zip")
+    package_file = tempfile.TemporaryFile()
+    write_message_package(message, package_file)
+    package_file.seek(0)
     name = "%s-%s" % (
         foirequest.slug,
         message.pk,
     )
-    response["Content-Disposition"] = 'attachment; filename="%s.zip"' % name
-    return response
+    return FileResponse(
+        package_file,
+        as_attachment=True,
+        filename="%s.zip" % name,
+        content_type="application/zip",
+    )
 
 
 @allow_write_foirequest
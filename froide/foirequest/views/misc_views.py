@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib.sitemaps import Sitemap
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import render
 
 from froide.frontpage.models import FeaturedRequest
@@ -8,7 +8,7 @@ from froide.helper.cache import cache_anonymous_page
 from froide.publicbody.models import PublicBody
 
 from ..decorators import allow_read_foirequest_authenticated
-from ..foi_mail import package_foirequest
+from ..foi_mail import open_foirequest_package
 from ..models import FoiRequest
 from ..pdf_generator import FoiRequestPDFGenerator
 
@@ -33,15 +33,17 @@ def index(request):
 
 @allow_read_foirequest_authenticated
 def download_foirequest_zip(request, foirequest):
-    response = HttpResponse(
-        package_foirequest(foirequest), content_type="application/zip"
-    )
+    package_file = open_foirequest_package(foirequest)
     name = "%s-%s" % (
         foirequest.slug,
         foirequest.pk,
     )
-    response["Content-Disposition"] = 'attachment; filename="%s.zip"' % name
-    return response
+    return FileResponse(
+        package_file,
+        as_attachment=True,
+        filename="%s.zip" % name,
+        content_type="application/zip",
+    )
 
 
 @allow_read_foirequest_authenticated
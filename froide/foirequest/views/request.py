@@ -1,6 +1,10 @@
+import hashlib
 import json
+from collections import defaultdict
 from urllib.parse import quote
 
+from django.conf import settings
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -20,6 +24,12 @@ from ..utils import select_foirequest_template
 
 Document = get_document_model()
 
+ATTACHMENT_FRAGMENT_TIMEOUT = 60 * 60 * 24
+# Long threads only render this many first and latest messages
+MESSAGE_THREAD_WINDOW = 10
+# unless fewer messages than this would be left out
+MESSAGE_THREAD_MIN_HIDDEN = 10
+
 
 def shortlink(request, obj_id, url_path=""):
     foirequest = get_object_or_404(FoiRequest, pk=obj_id)
@@ -62,6 +72,31 @@ def show_foirequest(
     return render(request, template_name, context, status=status)
 
 
+def show_message_thread(request, slug):
+    """
+    Render messages left out of a windowed thread
+    """
+    obj = get_object_or_404(FoiRequest, slug=slug)
+    if not can_read_foirequest(obj, request):
+        return render_403(request)
+
+    can_write = can_write_foirequest(obj, request)
+    messages = obj.get_messages(with_tags=can_write)
+    try:
+        start = max(int(request.GET.get("start", 0)), 0)
+        end = int(request.GET.get("end", len(messages)))
+    except ValueError:
+        return HttpResponseBadRequest()
+    shown_messages = messages[start:end]
+    prepare_messages(obj, messages, shown_messages, can_write)
+
+    return render(
+        request,
+        "foirequest/body/message_thread.html",
+        {"object": obj, "messages": shown_messages},
+    )
+
+
 class FoiRequestView(DetailView):
     queryset = FoiRequest.objects.select_related(
         "public_body",
@@ -121,64 +156,119 @@ def get_foirequest_documents_context(request, obj):
     return context
 
 
-def get_foirequest_context(request, obj):
-    context = {}
+class MessageThreadGap:
+    """
+    Stands in for messages left out of a windowed thread
+    """
 
-    all_attachments = FoiAttachment.objects.select_related("redacted").filter(
-        belongs_to__request=obj
-    )
-    context.update(get_foirequest_documents_context(request, obj))
-    context["show_documents"] = obj.status_is_final() and context["has_documents"]
+    is_thread_gap = True
 
-    can_write = can_write_foirequest(obj, request)
+    def __init__(self, obj, start, end):
+        self.start = start
+        self.end = end
+        self.url = "{}?start={}&end={}".format(
+            reverse("foirequest-message_thread", kwargs={"slug": obj.slug}),
+            start,
+            end,
+        )
+        self.all_url = "{}?messages=all#correspondence".format(obj.get_absolute_url())
+
+    @property
+    def count(self):
+        return self.end - self.start
+
+
+def get_message_thread(request, obj, messages):
+    """
+    Window long threads to their first and latest messages
+    """
+    total = len(messages)
+    hidden = total - 2 * MESSAGE_THREAD_WINDOW
+    if request.GET.get("messages") == "all" or hidden < MESSAGE_THREAD_MIN_HIDDEN:
+        return {"messages": messages, "shown": messages, "gap": None}
+    start, end = MESSAGE_THREAD_WINDOW, total - MESSAGE_THREAD_WINDOW
+    gap = MessageThreadGap(obj, start, end)
+    return {
+        "messages": messages[:start] + [gap] + messages[end:],
+        "shown": messages[:start] + messages[end:],
+        "gap": gap,
+    }
 
-    messages = obj.get_messages(with_tags=can_write)
 
-    for message in messages:
+def prepare_messages(obj, messages, shown_messages, can_write):
+    """
+    Attach attachments and events to the messages that get rendered
+    """
+    all_attachments = FoiAttachment.objects.select_related("redacted")
+    if len(shown_messages) == len(messages):
+        all_attachments = all_attachments.filter(belongs_to__request=obj)
+    else:
+        all_attachments = all_attachments.filter(
+            belongs_to__in=[m.id for m in shown_messages]
+        )
+
+    attachments_by_message = defaultdict(list)
+    for att in all_attachments:
+        attachments_by_message[att.belongs_to_id].append(att)
+
+    for message in shown_messages:
         message.request = obj
-        message.all_attachments = [
-            a for a in all_attachments if a.belongs_to_id == message.id
-        ]
+        message.all_attachments = attachments_by_message[message.id]
 
         # Preempt attribute access
         for att in message.all_attachments:
             att.belongs_to = message
 
         message.listed_attachments = [
-            a
-            for a in all_attachments
-            if a.belongs_to_id == message.id and can_see_attachment(a, can_write)
+            a for a in message.all_attachments if can_see_attachment(a, can_write)
         ]
         message.hidden_attachments = [
             a for a in message.listed_attachments if a.is_irrelevant
         ]
-        message.can_edit_attachments = message.can_edit or bool(
-            [a for a in message.listed_attachments if a.can_edit]
+        message.can_edit_attachments = message.can_edit or any(
+            a.can_edit for a in message.listed_attachments
         )
         message.approved_attachments = [
-            a
-            for a in message.listed_attachments
-            if a.approved and a not in message.hidden_attachments
+            a for a in message.listed_attachments if a.approved and not a.is_irrelevant
         ]
         message.unapproved_attachments = [
             a
             for a in message.listed_attachments
-            if not a.approved and a not in message.hidden_attachments
+            if not a.approved and not a.is_irrelevant
         ]
+        set_attachments_fragment_cache(message)
 
-    events = (
+    events = list(
         FoiEvent.objects.filter(request=obj)
         .select_related("user", "request", "public_body")
         .order_by("timestamp")
     )
 
-    event_count = len(events)
-    last_index = event_count
-    for message in reversed(obj.messages):
-        message.events = [
-            ev for ev in events[:last_index] if ev.timestamp >= message.timestamp
-        ]
-        last_index = last_index - len(message.events)
+    # Events are sorted, so each message gets the events
+    # between its timestamp and the next message
+    last_index = len(events)
+    for message in reversed(messages):
+        first_index = last_index
+        while (
+            first_index > 0 and events[first_index - 1].timestamp >= message.timestamp
+        ):
+            first_index -= 1
+        message.events = events[first_index:last_index]
+        last_index = first_index
+
+
+def get_foirequest_context(request, obj):
+    context = {}
+
+    context.update(get_foirequest_documents_context(request, obj))
+    context["show_documents"] = obj.status_is_final() and context["has_documents"]
+
+    can_write = can_write_foirequest(obj, request)
+
+    messages = obj.get_messages(with_tags=can_write)
+    message_thread = get_message_thread(request, obj, messages)
+    prepare_messages(obj, messages, message_thread["shown"], can_write)
+    context["message_thread"] = message_thread
 
     # TODO: remove active_tab
     active_tab = "info"
@@ -224,6 +314,27 @@ def get_foirequest_context(request, obj):
     return context
 
 
+def set_attachments_fragment_cache(message):
+    """
+    Set version and timeout of the cached attachments fragment of a message
+
+    The version changes with any field of the message's attachments.
+    """
+    state = [message.last_modified_at]
+    for att in message.all_attachments:
+        state.append(
+            [getattr(att, f.attname) for f in FoiAttachment._meta.concrete_fields]
+        )
+    message.attachments_fragment_version = hashlib.sha1(
+        repr(state).encode("utf-8")
+    ).hexdigest()
+    if any(a.is_mail_decoration for a in message.listed_attachments):
+        # Mail decorations are rendered with expiring media URLs
+        message.attachments_fragment_timeout = settings.FOI_MEDIA_TOKEN_EXPIRY // 2
+    else:
+        message.attachments_fragment_timeout = ATTACHMENT_FRAGMENT_TIMEOUT
+
+
 def get_active_tab(obj, context):
     if "postal_reply_form" in context:
         return "add-postal-reply"
@@ -1,6 +1,7 @@
 import json
 import re
 from datetime import timedelta
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core import mail
@@ -15,7 +16,8 @@ from froide.foirequest.models import FoiRequest
 from froide.foirequest.models.message import MessageKind
 from froide.foirequest.tests import factories
 from froide.foirequest.tests.test_api_request import OAuthAPIMixin
-from froide.follow.notifications import run_batch_update
+from froide.follow.notifications import get_follower_shards, run_batch_update
+from froide.follow.tasks import update_followers
 
 from .configuration import FoiRequestFollowConfiguration
 from .models import FoiRequestFollower
@@ -306,6 +308,24 @@ class FoiRequestFollowerTest(TestCase):
         # Don't send updates to dummy for dummy's own comment
         self.assertEqual(len(mail.outbox), 0)
 
+    def test_sharded_updates(self):
+        mail.outbox = []
+        req = FoiRequest.objects.all()[0]
+        followers = FoiRequestFollowerFactory.create_batch(3, content_object=req)
+        with mock.patch("froide.follow.notifications.FOLLOWER_SHARD_SIZE", 2):
+            shards = get_follower_shards(FoiRequestFollower, req)
+            self.assertEqual(len(shards), 2)
+            update_followers.delay(
+                "message_received", FoiRequestFollower._meta.label_lower, req.id
+            )
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox),
+            sorted(f.user.email for f in followers),
+        )
+        for follower in followers:
+            message = [m for m in mail.outbox if m.to[0] == follower.user.email][0]
+            self.assertIn("/%s-%d/" % (CONF_SLUG, follower.pk), message.body)
+
 
 class ApiTest(OAuthAPIMixin, TestCase):
     def setUp(self):
@@ -1,6 +1,8 @@
 import itertools
+import logging
+import time
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from django.conf import settings
 from django.utils import translation
@@ -12,6 +14,13 @@ from froide.helper.notifications import Notification
 from .configuration import follow_registry
 from .models import FollowerIdent, FollowerItem
 
+logger = logging.getLogger(__name__)
+
+# Followers of one content object handled by one task
+FOLLOWER_SHARD_SIZE = 1000
+
+FollowerRange = Tuple[int, int]
+
 update_follower_email = mail_registry.register(
     "follow/emails/update_follower", ("count", "user", "update_list")
 )
@@ -21,8 +30,32 @@ batch_update_follower_email = mail_registry.register(
 )
 
 
+def get_follower_shards(
+    follower_model, content_object, shard_size: Optional[int] = None
+) -> List[FollowerRange]:
+    """
+    Split confirmed followers into id ranges of at most shard_size followers
+    """
+    if shard_size is None:
+        shard_size = FOLLOWER_SHARD_SIZE
+    follower_ids = list(
+        follower_model.objects.filter(content_object=content_object, confirmed=True)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    return [
+        (
+            follower_ids[offset],
+            follower_ids[min(offset + shard_size, len(follower_ids)) - 1],
+        )
+        for offset in range(0, len(follower_ids), shard_size)
+    ]
+
+
 def get_follower_updates(
     notifications: List[Notification],
+    follower_model=None,
+    follower_range: Optional[FollowerRange] = None,
 ) -> Dict[FollowerIdent, FollowerItem]:
     follower_updates = defaultdict(list)
 
@@ -42,14 +75,21 @@ def get_follower_updates(
 
         configurations = follow_registry.list_by_content_model(content_object.__class__)
         for configuration in configurations:
+            if follower_model is not None and configuration.model != follower_model:
+                continue
             if not configuration.wants_update(update_list):
                 continue
 
-            follower_model = configuration.model
-
-            followers = follower_model.objects.filter(
+            followers = configuration.model.objects.filter(
                 content_object=content_object, confirmed=True
             ).select_related("user")
+            if follower_range is not None:
+                followers = followers.filter(
+                    id__gte=follower_range[0], id__lte=follower_range[1]
+                )
+
+            # Event texts only depend on the language
+            events_by_language = {}
             for follower in followers:
                 if not any(
                     n
@@ -58,6 +98,8 @@ def get_follower_updates(
                 ):
                     continue
                 ident = follower.get_ident()
+                # Avoid loading the content object for every unfollow link
+                follower.content_object = content_object
 
                 if follower.user and follower.user.language:
                     lang = follower.user.language
@@ -65,26 +107,47 @@ def get_follower_updates(
                     lang = settings.LANGUAGE_CODE
 
                 with translation.override(lang):
+                    if lang not in events_by_language:
+                        events_by_language[lang] = [
+                            n.event.as_text() for n in update_list
+                        ]
                     follower_updates[ident].append(
                         FollowerItem(
                             section=section,
                             content_object=content_object,
                             object_label=update_list[0].object_label,
                             unfollow_link=follower.get_unfollow_link(),
-                            events=[n.event.as_text() for n in update_list],
+                            events=events_by_language[lang],
                         )
                     )
 
     return follower_updates
 
 
-def send_notification(notification: Notification):
-    follower_updates = get_follower_updates([notification])
+def send_notification(
+    notification: Notification,
+    follower_model=None,
+    follower_range: Optional[FollowerRange] = None,
+):
+    start = time.monotonic()
+    follower_updates = get_follower_updates(
+        [notification], follower_model=follower_model, follower_range=follower_range
+    )
 
     # Send out update on comments and event to followers
     for follower_ident, update_list in follower_updates.items():
         send_update(follower_ident, update_list, batch=False)
 
+    logger.info(
+        "Sent %s update of %s %s to %d followers (range %s) in %.2fs",
+        notification.event_type,
+        notification.object.__class__.__name__,
+        notification.object.id,
+        len(follower_updates),
+        follower_range,
+        time.monotonic() - start,
+    )
+
 
 def run_batch_update(start=None, end=None):
     if start is None and end is None:
@@ -136,4 +199,5 @@ def send_update(user_or_email: FollowerIdent, update_list, batch=False):
     else:
         mail_intent = update_follower_email
 
-    mail_intent.send(user=user, email=email, context=context)
+    # Follower updates are not urgent, send them through the bulk queue
+    mail_intent.send(user=user, email=email, context=context, priority=False)
@@ -1,30 +1,90 @@
 import logging
+from typing import Optional
 
 from froide.celery import app as celery_app
 
 from .configuration import follow_registry
-from .notifications import run_batch_update, send_notification
+from .notifications import get_follower_shards, run_batch_update, send_notification
 
 
-@celery_app.task
-def update_followers(event_type: str, model_name: str, content_object_id: int):
+def make_notification(event_type: str, model_name: str, content_object_id: int):
     try:
         configuration = follow_registry.get_by_model_name(model_name)
     except LookupError:
-        return
+        return None, None
 
     content_model = configuration.content_model
 
     try:
         content_object = content_model.objects.get(id=content_object_id)
     except content_model.DoesNotExist:
-        return
+        return None, None
     try:
         notification = configuration.make_notification(event_type, content_object)
     except LookupError:
         logging.exception("Could not make message for event_type %s", event_type)
+        return None, None
+    return configuration, notification
+
+
+@celery_app.task
+def update_followers(event_type: str, model_name: str, content_object_id: int):
+    configuration, notification = make_notification(
+        event_type, model_name, content_object_id
+    )
+    if notification is None:
+        return
+
+    # Followers of every follow configuration of the content model
+    configurations = follow_registry.list_by_content_model(
+        notification.object.__class__
+    )
+    shards = [
+        (
+            follower_configuration,
+            get_follower_shards(follower_configuration.model, notification.object),
+        )
+        for follower_configuration in configurations
+    ]
+    if all(len(follower_ranges) <= 1 for _conf, follower_ranges in shards):
+        send_notification(notification)
+        return
+
+    # Popular content objects get their followers notified in parallel
+    for follower_configuration, follower_ranges in shards:
+        for follower_range in follower_ranges:
+            update_followers_shard.delay(
+                event_type,
+                model_name,
+                content_object_id,
+                follower_range,
+                follower_model_name=follower_configuration.model_name,
+            )
+
+
+@celery_app.task
+def update_followers_shard(
+    event_type: str,
+    model_name: str,
+    content_object_id: int,
+    follower_range,
+    follower_model_name: Optional[str] = None,
+):
+    configuration, notification = make_notification(
+        event_type, model_name, content_object_id
+    )
+    if notification is None:
         return
-    send_notification(notification)
+    if follower_model_name is not None:
+        try:
+            configuration = follow_registry.get_by_model_name(follower_model_name)
+        except LookupError:
+            return
+    send_notification(
+        notification,
+        follower_model=configuration.model,
+        follower_range=tuple(follower_range),
+    )
 
 
 @celery_app.task
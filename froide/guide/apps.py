@@ -1,6 +1,7 @@
 import json
 
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.utils.translation import gettext_lazy as _
 
 
@@ -13,10 +14,17 @@ class GuideConfig(AppConfig):
         from froide.account.export import registry
         from froide.foirequest.models import FoiRequest
 
-        from .signals import start_guidance_task
+        from .models import Action, Rule
+        from .signals import rules_changed, start_guidance_task
 
         FoiRequest.message_received.connect(start_guidance_task)
 
+        for model in (Rule, Action):
+            post_save.connect(rules_changed, sender=model)
+            post_delete.connect(rules_changed, sender=model)
+        for field in ("jurisdictions", "publicbodies", "categories", "actions"):
+            m2m_changed.connect(rules_changed, sender=getattr(Rule, field).through)
+
         account_merged.connect(merge_user)
         registry.register(export_user_data)
 
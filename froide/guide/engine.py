@@ -0,0 +1,204 @@
+"""
+Process-wide compiled view of all guidance rules.
+
+Rules are loaded once with their actions and indexed by jurisdiction,
+public body and category. Incoming text is first scanned against one
+combined pattern of all include patterns, so messages that no rule can
+match only cost a single regex search.
+
+The engine is rebuilt when the cached version changes, which happens when
+a rule or an action is saved or deleted (see signals.py). The version
+expires after RULE_ENGINE_VERSION_TIMEOUT and engines are not reused for
+longer than that without one, so processes that don't share a cache
+(e.g. with LocMemCache or DummyCache) pick up changes within the timeout.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+
+from .models import Rule
+
+logger = logging.getLogger(__name__)
+
+RULE_ENGINE_VERSION_KEY = "froide:guide:rule_engine_version"
+RULE_ENGINE_VERSION_TIMEOUT = 5 * 60
+# Combining patterns with backreferences would shift their group numbers
+BACKREFERENCE_RE = re.compile(r"\\[1-9]|\(\?P=")
+
+RuleMatch = Tuple[Rule, Optional[re.Match], Optional[re.Match]]
+
+
+def get_rule_engine_version() -> Optional[str]:
+    return cache.get(RULE_ENGINE_VERSION_KEY)
+
+
+def set_rule_engine_version() -> str:
+    version = str(time.time_ns())
+    if not cache.add(RULE_ENGINE_VERSION_KEY, version, RULE_ENGINE_VERSION_TIMEOUT):
+        version = cache.get(RULE_ENGINE_VERSION_KEY, version)
+    return version
+
+
+def invalidate_rule_engine():
+    cache.set(RULE_ENGINE_VERSION_KEY, str(time.time_ns()), RULE_ENGINE_VERSION_TIMEOUT)
+
+
+def combine_patterns(patterns: List[re.Pattern]) -> Optional[re.Pattern]:
+    if not patterns:
+        return None
+    try:
+        return re.compile("|".join("(?:%s)" % p.pattern for p in patterns))
+    except re.error:
+        # e.g. inline global flags, fall back to searching each rule
+        return None
+
+
+class RuleEngine:
+    def __init__(self, rules: List[Rule]) -> None:
+        self.rules = sorted(rules, key=lambda r: (r.priority, r.name))
+        self.rule_ids = {}
+        self.publicbodies = {}
+        self.categories = {}
+        # Rules by jurisdiction id, None for rules without jurisdiction
+        by_jurisdiction: Dict[Optional[int], List[Rule]] = defaultdict(list)
+
+        prefilter_patterns = []
+        self.always_search: Set[int] = set()
+        for index, rule in enumerate(self.rules):
+            self.rule_ids[rule.id] = index
+            jurisdiction_ids = {j.id for j in rule.jurisdictions.all()}
+            self.publicbodies[rule.id] = {p.id for p in rule.publicbodies.all()}
+            self.categories[rule.id] = {c.id for c in rule.categories.all()}
+            for jurisdiction_id in jurisdiction_ids or [None]:
+                by_jurisdiction[jurisdiction_id].append(rule)
+            if rule.includes_re is None:
+                continue
+            if BACKREFERENCE_RE.search(rule.includes_re.pattern):
+                self.always_search.add(rule.id)
+            else:
+                prefilter_patterns.append(rule.includes_re)
+        self.by_jurisdiction = dict(by_jurisdiction)
+        self.prefilter_re = combine_patterns(prefilter_patterns)
+        if self.prefilter_re is None:
+            self.always_search.update(
+                r.id for r in self.rules if r.includes_re is not None
+            )
+
+    @classmethod
+    def load(cls) -> "RuleEngine":
+        rules = Rule.objects.all().prefetch_related(
+            "jurisdictions", "publicbodies", "categories", "actions", "actions__tag"
+        )
+        return cls(list(rules))
+
+    def get_rules(self, foirequest, active_only: bool = True) -> List[Rule]:
+        """
+        Rules that apply to the request, in priority order
+        """
+        public_body = foirequest.public_body
+        publicbody_id = public_body.id if public_body is not None else None
+        if public_body is not None:
+            category_ids = {c.id for c in public_body.categories.all()}
+        else:
+            category_ids = set()
+
+        candidates = self.by_jurisdiction.get(None, [])
+        jurisdiction_id = foirequest.jurisdiction_id
+        if jurisdiction_id is not None and jurisdiction_id in self.by_jurisdiction:
+            candidates = candidates + self.by_jurisdiction[jurisdiction_id]
+            candidates.sort(key=lambda r: self.rule_ids[r.id])
+
+        rules = []
+        for rule in candidates:
+            if active_only and not rule.is_active:
+                continue
+            publicbodies = self.publicbodies[rule.id]
+            if publicbodies and publicbody_id not in publicbodies:
+                continue
+            categories = self.categories[rule.id]
+            if categories and not categories & category_ids:
+                continue
+            if rule.references_re:
+                if not rule.references_re.search(foirequest.reference):
+                    continue
+            rules.append(rule)
+        return rules
+
+    def match_rules(
+        self, rules: List[Rule], tags: Set[int], text: str
+    ) -> Iterator[RuleMatch]:
+        """
+        Yield matching rules lazily, tags may change between matches
+        """
+        any_include = True
+        if self.prefilter_re is not None:
+            any_include = self.prefilter_re.search(text) is not None
+
+        for rule in rules:
+            if rule.has_tag_id and rule.has_tag_id not in tags:
+                continue
+            if rule.has_no_tag_id and rule.has_no_tag_id in tags:
+                continue
+
+            include_match = None
+            if rule.includes_re:
+                if not any_include and rule.id not in self.always_search:
+                    continue
+                include_match = rule.includes_re.search(text)
+                if include_match is None:
+                    continue
+            exclude_match = None
+            if rule.excludes_re:
+                exclude_match = rule.excludes_re.search(text)
+                if exclude_match is not None:
+                    continue
+            yield rule, include_match, exclude_match
+
+
+class RuleEngineCache:
+    def __init__(self):
+        self.engine = None
+        self.version = None
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    def is_current(self, version: Optional[str]) -> bool:
+        if self.engine is None:
+            return False
+        if version is None:
+            # Version expired or the cache doesn't keep it (DummyCache)
+            age = time.monotonic() - self.loaded_at
+            return age < RULE_ENGINE_VERSION_TIMEOUT
+        return version == self.version
+
+    def get(self) -> RuleEngine:
+        version = get_rule_engine_version()
+        with self.lock:
+            if self.is_current(version):
+                return self.engine
+            if version is None:
+                # Set before loading, a concurrent change replaces it
+                version = set_rule_engine_version()
+            start = time.monotonic()
+            self.engine = RuleEngine.load()
+            self.version = version
+            self.loaded_at = start
+            logger.info(
+                "Compiled %d guidance rules in %.2fs",
+                len(self.engine.rules),
+                time.monotonic() - start,
+            )
+            return self.engine
+
+
+rule_engine_cache = RuleEngineCache()
+
+
+def get_rule_engine() -> RuleEngine:
+    return rule_engine_cache.get()
@@ -2,6 +2,7 @@ from functools import partial
 
 from django.db import transaction
 
+from .engine import invalidate_rule_engine
 from .tasks import run_guidance_task
 
 
@@ -9,3 +10,7 @@ def start_guidance_task(sender, message=None, **kwargs):
     if not message or not message.is_response:
         return
     transaction.on_commit(partial(run_guidance_task.delay, message.id))
+
+
+def rules_changed(sender, **kwargs):
+    invalidate_rule_engine()
@@ -0,0 +1,117 @@
+import pytest
+
+from froide.foirequest.models import MessageTag
+
+from .engine import RULE_ENGINE_VERSION_TIMEOUT, RuleEngineCache, get_rule_engine
+from .models import Action, Guidance, Rule
+from .utils import run_guidance, run_guidance_batch
+
+
+def get_guidance_state(messages):
+    guidances = {
+        (g.message_id, g.action_id, g.rule_id, str(g.matches))
+        for g in Guidance.objects.filter(message__in=messages)
+    }
+    tags = {(m.id, t.id) for m in messages for t in m.tags.all()}
+    return guidances, tags
+
+
+@pytest.mark.django_db
+def test_guidance_batch_matches_single(foi_message_factory, jurisdiction_factory):
+    fee_tag = MessageTag.objects.create(name="fee", slug="fee")
+    fee_action = Action.objects.create(name="fee", label="Fee", tag=fee_tag)
+    fee_rule = Rule.objects.create(name="fee", priority=1, includes="fee\ncost")
+    fee_rule.actions.add(fee_action)
+
+    # Applies to messages tagged by the rule before it
+    appeal_action = Action.objects.create(name="appeal", label="Appeal")
+    appeal_rule = Rule.objects.create(
+        name="appeal", priority=2, has_tag=fee_tag, excludes="waived"
+    )
+    appeal_rule.actions.add(appeal_action)
+
+    other_action = Action.objects.create(name="other", label="Other")
+    other_rule = Rule.objects.create(name="other", priority=3, includes="fee")
+    other_rule.jurisdictions.add(jurisdiction_factory())
+    other_rule.actions.add(other_action)
+
+    messages = [
+        foi_message_factory(plaintext="The fee is 20 Euro."),
+        foi_message_factory(plaintext="The cost will be waived."),
+        foi_message_factory(plaintext="Here are the documents."),
+        foi_message_factory(plaintext="A fee", is_response=False),
+    ]
+
+    for message in messages:
+        run_guidance(message)
+    single_state = get_guidance_state(messages)
+
+    Guidance.objects.all().delete()
+    for message in messages:
+        message.tags.clear()
+
+    results = run_guidance_batch(messages)
+    assert get_guidance_state(messages) == single_state
+    assert [m.id for m, _result in results] == [m.id for m in messages[:3]]
+
+    guidances, tags = single_state
+    assert {(message_id, action_id) for message_id, action_id, *_ in guidances} == {
+        (messages[0].id, fee_action.id),
+        (messages[0].id, appeal_action.id),
+        (messages[1].id, fee_action.id),
+    }
+    assert tags == {(messages[0].id, fee_tag.id), (messages[1].id, fee_tag.id)}
+
+    # Running again keeps the guidances
+    results = run_guidance_batch(messages)
+    assert get_guidance_state(messages) == single_state
+    assert all(result.created == 0 and result.deleted == 0 for _m, result in results)
+
+
+@pytest.mark.django_db
+def test_rule_changes_invalidate_engine(foi_message_factory):
+    message = foi_message_factory(plaintext="Your request was refused.")
+    action = Action.objects.create(name="refusal", label="Refusal")
+    rule = Rule.objects.create(name="refusal", includes="denied")
+
+    engine = get_rule_engine()
+    assert get_rule_engine() is engine
+
+    # Adding an action
+    rule.actions.add(action)
+    assert get_rule_engine() is not engine
+    assert run_guidance(message).guidances == []
+
+    # Changing a pattern
+    rule.includes = "refused"
+    rule.save()
+    result = run_guidance(message)
+    assert [g.action_id for g in result.guidances] == [action.id]
+
+    # Deactivating the rule removes its guidance
+    rule.is_active = False
+    rule.save()
+    result = run_guidance(message)
+    assert result.guidances == []
+    assert result.deleted == 1
+
+    # Deleting an action
+    rule.is_active = True
+    rule.save()
+    assert len(run_guidance(message).guidances) == 1
+    action.delete()
+    assert run_guidance(message).guidances == []
+
+
+@pytest.mark.django_db
+def test_rule_engine_without_shared_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    }
+    engine_cache = RuleEngineCache()
+    engine = engine_cache.get()
+    assert engine_cache.get() is engine
+
+    # Rebuilt once the version would have expired
+    engine_cache.loaded_at -= RULE_ENGINE_VERSION_TIMEOUT
+    assert engine_cache.get() is not engine
@@ -1,6 +1,6 @@
 import re
-from collections import defaultdict, namedtuple
-from typing import Any, Iterator, List, Optional, Set, Tuple
+from collections import Counter, defaultdict, namedtuple
+from typing import Any, Iterator, List, Tuple
 
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
@@ -10,7 +10,8 @@ from froide.helper.admin_utils import make_choose_object_action
 from froide.helper.email_sending import mail_registry
 from froide.helper.text_utils import split_text_by_separator
 
-from .models import Action, Guidance, Rule
+from .engine import get_rule_engine
+from .models import Action, Guidance
 
 guidance_notification_mail = mail_registry.register(
     "guide/emails/new_guidance",
@@ -29,7 +30,7 @@ GuidanceResult = namedtuple(
 
 WS = re.compile(r"\s+")
 
-RuleMatch = Optional[Tuple[Optional[re.Match], Optional[re.Match]]]
+GUIDANCE_BATCH_SIZE = 200
 
 
 def prepare_text(text: str) -> str:
@@ -45,64 +46,18 @@ class GuidanceApplicator:
         self.deleted_count = 0
         self.active_only = active_only
 
-    def filter_rules(self, rules: None = None) -> None:
-        foirequest = self.message.request
-        if rules is None:
-            rules = Rule.objects.all()
-
-        if self.active_only:
-            rules = rules.filter(is_active=True)
-
-        rules = (
-            rules.filter(
-                Q(jurisdictions=None) | Q(jurisdictions=foirequest.jurisdiction)
-            )
-            .filter(Q(publicbodies=None) | Q(publicbodies=foirequest.public_body))
-            .filter(
-                Q(categories=None)
-                | Q(categories__in=foirequest.public_body.categories.all())
-            )
-            .order_by("priority")
-        )
-        for rule in rules:
-            if rule.references_re:
-                if not rule.references_re.search(foirequest.reference):
-                    continue
-            yield rule
-
     def apply_rules(self) -> List[Any]:
         return list(self.apply_rules_generator())
 
-    def match_rule(self, rule: Rule, tags: Set[int], text: str) -> RuleMatch:
-        if rule.has_tag_id and rule.has_tag_id not in tags:
-            return
-        if rule.has_no_tag_id and rule.has_no_tag_id in tags:
-            return
-
-        include_match = None
-        if rule.includes_re:
-            include_match = rule.includes_re.search(text)
-            if include_match is None:
-                return
-        exclude_match = None
-        if rule.excludes_re:
-            exclude_match = rule.excludes_re.search(text)
-            if exclude_match is not None:
-                return
-        return (include_match, exclude_match)
-
     def apply_rules_generator(self) -> Iterator[Guidance]:
-        rules = self.filter_rules()
+        engine = get_rule_engine()
+        rules = engine.get_rules(self.message.request, active_only=self.active_only)
 
         message = self.message
         tags = set(message.tags.all().values_list("id", flat=True))
         text = prepare_text(message.plaintext)
 
-        for rule in rules:
-            result = self.match_rule(rule, tags, text)
-            if not result:
-                continue
-            include_match, exclude_match = result
+        for rule, include_match, exclude_match in engine.match_rules(rules, tags, text):
             # Rule applies
             ctx = {"includes": include_match, "excludes": exclude_match, "tags": tags}
             yield from self.apply_rule(rule, **ctx)
@@ -163,12 +118,95 @@ def run_guidance(
     return result
 
 
+def run_guidance_batch(
+    messages: List[FoiMessage], active_only: bool = True
+) -> List[Tuple[FoiMessage, GuidanceResult]]:
+    """
+    Run guidance on many messages with one query each
+    for loading, creating and deleting guidances
+    """
+    messages = [m for m in messages if m.is_response]
+    if not messages:
+        return []
+
+    engine = get_rule_engine()
+    existing = {}
+    for guidance in Guidance.objects.filter(message__in=messages, action__isnull=False):
+        existing.setdefault((guidance.message_id, guidance.action_id), guidance)
+
+    message_guidances = {}
+    new_guidances = []
+    for message in messages:
+        tags = {t.id for t in message.tags.all()}
+        text = prepare_text(message.plaintext)
+        rules = engine.get_rules(message.request, active_only=active_only)
+        guidances = {}
+        for rule, include_match, _exclude_match in engine.match_rules(
+            rules, tags, text
+        ):
+            for action in rule.actions.all():
+                if action.tag and action.tag_id not in tags:
+                    message.tags.add(action.tag)
+                    tags.add(action.tag_id)
+                if not action.label or action.id in guidances:
+                    continue
+                guidance = existing.get((message.id, action.id))
+                if guidance is None:
+                    matches = None
+                    if include_match:
+                        matches = {"span": list(include_match.span())}
+                    guidance = Guidance(
+                        message=message, action=action, rule=rule, matches=matches
+                    )
+                    guidance.created = True
+                    new_guidances.append(guidance)
+                else:
+                    guidance.created = False
+                guidances[action.id] = guidance
+        message_guidances[message.id] = list(guidances.values())
+
+    Guidance.objects.bulk_create(new_guidances)
+
+    # Delete all guidances that were there before
+    # but are not returned, keep custom guidances
+    keep_ids = [g.id for gs in message_guidances.values() for g in gs]
+    stale = list(
+        Guidance.objects.filter(message__in=messages, user__isnull=True)
+        .exclude(id__in=keep_ids)
+        .values_list("id", "message_id")
+    )
+    if stale:
+        Guidance.objects.filter(
+            id__in=[guidance_id for guidance_id, _m in stale]
+        ).delete()
+    deleted_counts = Counter(message_id for _g, message_id in stale)
+
+    results = []
+    for message in messages:
+        guidances = message_guidances[message.id]
+        created_count = sum(1 for g in guidances if g.created)
+        results.append(
+            (
+                message,
+                GuidanceResult(guidances, created_count, deleted_counts[message.id]),
+            )
+        )
+    return results
+
+
 def apply_guidance_generator(queryset):
-    for message in queryset:
-        result = run_guidance(message)
-        if result is None:
-            continue
-        yield message, result
+    message_ids = list(queryset.values_list("id", flat=True))
+    for offset in range(0, len(message_ids), GUIDANCE_BATCH_SIZE):
+        chunk_ids = message_ids[offset : offset + GUIDANCE_BATCH_SIZE]
+        messages = (
+            FoiMessage.objects.filter(id__in=chunk_ids)
+            .select_related("request", "request__user", "request__public_body")
+            .prefetch_related("tags", "request__public_body__categories")
+            .in_bulk()
+        )
+        yield from run_guidance_batch(
+            [messages[message_id] for message_id in chunk_ids if message_id in messages]
+        )
 
 
 def run_guidance_on_queryset(queryset, notify=False):
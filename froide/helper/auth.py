@@ -1,5 +1,6 @@
-from functools import lru_cache, reduce
+from functools import reduce, wraps
 from operator import or_
+from typing import Callable, Dict, Iterable, List, Optional
 
 from django.contrib.auth import get_permission_codename
 from django.contrib.auth.models import AnonymousUser
@@ -7,13 +8,90 @@ from django.core.exceptions import PermissionDenied
 from django.db.models import Q
 
 from froide.account.models import User
-from froide.team.models import Team
+from froide.team.models import Team, TeamMembership
 
 AUTH_MAPPING = {
     "read": "view",
     "write": "change",
 }
 
+# Team roles that grant a verb, None for any active membership
+TEAM_VERB_ROLES = {
+    "read": None,
+    "write": {TeamMembership.ROLE.OWNER, TeamMembership.ROLE.EDITOR},
+    "manage": {TeamMembership.ROLE.OWNER},
+}
+
+PERMISSION_CACHE_ATTR = "_froide_permission_cache"
+
+
+class PermissionCache:
+    """
+    Memoizes permission checks for the lifetime of one request
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.team_roles: Dict[int, Dict[int, str]] = {}
+
+    def get_team_roles(self, user) -> Dict[int, str]:
+        """
+        Roles of the user's active team memberships by team id
+        """
+        if user.pk not in self.team_roles:
+            self.team_roles[user.pk] = dict(
+                TeamMembership.objects.filter(
+                    user=user, status=TeamMembership.MEMBERSHIP_STATUS.ACTIVE
+                ).values_list("team_id", "role")
+            )
+        return self.team_roles[user.pk]
+
+
+def get_permission_cache(request) -> Optional[PermissionCache]:
+    if request is None:
+        return None
+    try:
+        # Don't fall through to the wrapped request of a DRF request,
+        # their authentication may differ
+        request_attrs = vars(request)
+    except TypeError:
+        return None
+    permission_cache = request_attrs.get(PERMISSION_CACHE_ATTR)
+    if permission_cache is None:
+        permission_cache = PermissionCache()
+        request_attrs[PERMISSION_CACHE_ATTR] = permission_cache
+    return permission_cache
+
+
+def request_cached(func):
+    """
+    Cache the result of a permission check on the request it is checked for
+    """
+
+    @wraps(func)
+    def wrapper(obj, request=None, *args, **kwargs):
+        permission_cache = get_permission_cache(request)
+        pk = getattr(obj, "pk", None)
+        if permission_cache is None or pk is None:
+            return func(obj, request, *args, **kwargs)
+        user = getattr(request, "user", None)
+        key = (
+            func,
+            obj.__class__,
+            pk,
+            getattr(user, "pk", None),
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        try:
+            return permission_cache.results[key]
+        except KeyError:
+            result = func(obj, request, *args, **kwargs)
+            permission_cache.results[key] = result
+            return result
+
+    return wrapper
+
 
 def check_permission(obj, request, verb):
     user = request.user
@@ -54,13 +132,27 @@ def has_authenticated_access(obj, request, verb="write", scope=None):
     if token is None and check_permission(obj, request, verb):
         return True
 
-    if hasattr(obj, "team") and obj.team and obj.team.can_do(verb, user):
+    if has_team_access(obj, request, verb):
         return True
 
     return False
 
 
-@lru_cache()
+def has_team_access(obj, request, verb):
+    permission_cache = get_permission_cache(request)
+    team_id = getattr(obj, "team_id", None)
+    if permission_cache is not None and team_id is not None and verb in TEAM_VERB_ROLES:
+        role = permission_cache.get_team_roles(request.user).get(team_id)
+        if role is None:
+            return False
+        roles = TEAM_VERB_ROLES[verb]
+        return roles is None or role in roles
+    if not hasattr(obj, "team"):
+        return False
+    return bool(obj.team and obj.team.can_do(verb, request.user))
+
+
+@request_cached
 def can_read_object(obj, request=None):
     if hasattr(obj, "is_public") and obj.is_public():
         return True
@@ -69,19 +161,19 @@ def can_read_object(obj, request=None):
     return has_authenticated_access(obj, request, verb="read")
 
 
-@lru_cache()
+@request_cached
 def can_read_object_authenticated(obj, request=None):
     if request is None:
         return False
     return has_authenticated_access(obj, request, verb="read")
 
 
-@lru_cache()
+@request_cached
 def can_write_object(obj, request, scope=None):
     return has_authenticated_access(obj, request, scope=scope)
 
 
-@lru_cache()
+@request_cached
 def can_manage_object(obj, request):
     """
     Team owner permission
@@ -89,7 +181,7 @@ def can_manage_object(obj, request):
     return has_authenticated_access(obj, request, "manage")
 
 
-@lru_cache()
+@request_cached
 def can_moderate_object(obj, request):
     return check_permission(obj, request, "moderate")
 
@@ -102,6 +194,21 @@ ACCESS_MAPPING = {
 }
 
 
+def can_read_many(
+    objs: Iterable, request=None, check: Optional[Callable] = None
+) -> List[bool]:
+    """
+    Check read access for many objects of a list
+    sharing the request's permission cache
+    """
+    if check is None:
+        check = can_read_object
+    permission_cache = get_permission_cache(request)
+    if permission_cache is not None and request.user.is_authenticated:
+        permission_cache.get_team_roles(request.user)
+    return [check(obj, request) for obj in objs]
+
+
 def can_access_object(verb, obj, request):
     try:
         access_func = ACCESS_MAPPING[verb]
@@ -239,11 +346,6 @@ def require_crew(view_func):
     return decorator
 
 
-def clear_lru_caches():
-    for f in ACCESS_MAPPING.values():
-        f.cache_clear()
-
-
 def is_crew(user: User | AnonymousUser) -> bool:
     if user.is_authenticated:
         return user.is_crew
@@ -1,4 +1,7 @@
 import collections
+import json
+import logging
+import os
 import re
 from collections import defaultdict, namedtuple
 from pathlib import Path
@@ -6,11 +9,14 @@ from typing import Iterable, List, Optional
 
 from dogtail import Dogtail
 
-from .signals import email_left_queue
+from .signals import email_batch_left_queue, email_left_queue
+
+logger = logging.getLogger(__name__)
 
 PostfixLogLine = namedtuple("PostfixLogLine", ["date", "queue_id", "data"])
 
 DEFAULT_POSTFIX_LOG_PATHS = [Path("/var/log/mail.log"), Path("/var/log/mail.log.1")]
+DELIVERY_BATCH_SIZE = 500
 
 
 class PostfixLogfileParser(collections.abc.Iterator):
@@ -27,6 +33,7 @@ class PostfixLogfileParser(collections.abc.Iterator):
     PROCESS_RE = r"(?P<process>[^:]+)"
     FIELDS_RE = r"(?P<fields>.*)"
     LINE_RE = rf"^{TIMESTAMP_RE} {USER_RE} {PROCESS_RE}: {QUEUE_ID_REGEX}: {FIELDS_RE}$"
+    LINE_PATTERN = re.compile(LINE_RE)
 
     def __init__(
         self,
@@ -80,7 +87,10 @@ class PostfixLogfileParser(collections.abc.Iterator):
             Optional[PostfixLogLine]: If the logline was parsed successfullt, a PostfixLogLine namedtuple is returned. If it could not be parsed, None is returned
         """
 
-        match = re.match(self.LINE_RE, line)
+        # Cheap check before running the full line pattern
+        if "postfix" not in line:
+            return None
+        match = self.LINE_PATTERN.match(line)
         if not match:
             return
         line_data = match.groupdict()
@@ -135,22 +145,24 @@ class PostfixLogfileParser(collections.abc.Iterator):
 class DogtailPostfixLogfileParser(PostfixLogfileParser):
     """A logfile parser that keeps track of its position in the logfile using dogtail.
 
-    It tries to ignore parts of the log that were already fully processed.
-    However it can only ignore parts at the beginning of the log where all mails
-    where queue ids seen in the logfile until then left the queue.
-    This means that if a message bounces for a longer time, the log position
-    cannot be updated until this message is either delivered successfully or is
-    deleted from the queue.
-    Until then parts of the log will be processed again and again and the messages
-    is this part will be returned by the iterator on every invocation.
+    Messages that have not left the queue yet are persisted to a state file
+    next to the offset file, so every run continues at the end of the last
+    run instead of re-reading the log from the oldest incomplete message.
+    The state is bounded to MAX_PENDING_MESSAGES, dropping the oldest
+    messages first, e.g. when their removal was never logged.
+
+    Call iteration_done() after the yielded messages have been handled
+    to persist offset and state.
     """
 
     DEFAULT_DOGTAIL_OFFSET_PATH = Path("./mail_log.offset")
+    MAX_PENDING_MESSAGES = 10000
 
     def __init__(
         self,
         log_paths: Optional[Iterable[str]] = None,
         offset_path: Optional[Path] = None,
+        state_path: Optional[Path] = None,
     ):
         if log_paths is None:
             log_paths = DEFAULT_POSTFIX_LOG_PATHS
@@ -158,24 +170,51 @@ class DogtailPostfixLogfileParser(PostfixLogfileParser):
         if offset_path is None:
             offset_path = self.DEFAULT_DOGTAIL_OFFSET_PATH
 
+        if state_path is None:
+            offset_path = Path(offset_path)
+            state_path = offset_path.with_name(offset_path.name + ".state")
+        self.state_path = Path(state_path)
+
         self.logfile_reader = Dogtail(
             log_paths,
             offset_path=offset_path,
         )
         super().__init__(self.logfile_reader)
-        self._msg_log = defaultdict(lambda: {"log": [], "data": {}, "offset": None})
+        self._msg_log.update(self.load_state())
         self._log_read = False
 
+    def load_state(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("Ignoring corrupt mail log state %s", self.state_path)
+            return {}
+
+    def save_state(self):
+        pending = list(self._msg_log.items())
+        drop_count = len(pending) - self.MAX_PENDING_MESSAGES
+        if drop_count > 0:
+            logger.warning(
+                "Dropping %d incomplete messages from mail log state", drop_count
+            )
+            pending = pending[drop_count:]
+        temp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(dict(pending), f)
+        os.replace(temp_path, self.state_path)
+
     def iteration_done(self):
-        if not self._msg_log:
-            if self._log_read:
-                self.logfile_reader.update_offset_file()
-        else:
-            first_logoffset = min(x["offset"] for x in self._msg_log.values())
-            self.logfile_reader.write_offset_to_file(first_logoffset)
+        if not self._log_read:
+            return
+        # Write state first: a crash in between repeats lines instead of losing them
+        self.save_state()
+        self.logfile_reader.update_offset_file()
 
     def __next__(self):
-        for line, offset in self.logfile_reader:
+        for line, _offset in self.logfile_reader:
             self._log_read = True
             parsed_line = self._parse_line(line)
             if parsed_line is None:
@@ -184,29 +223,38 @@ class DogtailPostfixLogfileParser(PostfixLogfileParser):
             self._msg_log[parsed_line.queue_id]["log"].append(line)
             self._msg_log[parsed_line.queue_id]["data"].update(parsed_line.data)
 
-            if self._msg_log[parsed_line.queue_id]["offset"] is None:
-                self._msg_log[parsed_line.queue_id]["offset"] = offset
-
             if self._is_completed_message(self._msg_log[parsed_line.queue_id]):
                 msg = self._msg_log[parsed_line.queue_id]
                 del self._msg_log[parsed_line.queue_id]
                 return msg
 
-        self.iteration_done()
-
         raise StopIteration
 
 
+def send_delivery_batch(deliveries: List[dict]):
+    if deliveries:
+        email_batch_left_queue.send(sender=__name__, deliveries=deliveries)
+
+
 def check_delivery_from_log(
     log_paths: Optional[List[str]] = None, offset_path: Optional[Path] = None
 ):
     parser = DogtailPostfixLogfileParser(log_paths, offset_path)
+    deliveries = []
     for message in parser:
-        email_left_queue.send(
-            sender=__name__,
-            to=message["data"].get("to"),
-            from_address=message["data"].get("from"),
-            message_id=message["data"].get("message-id"),
-            status=message["data"].get("status"),
-            log=message["log"],
-        )
+        delivery = {
+            "to": message["data"].get("to"),
+            "from_address": message["data"].get("from"),
+            "message_id": message["data"].get("message-id"),
+            "status": message["data"].get("status"),
+            "log": message["log"],
+        }
+        # Receivers that can handle many deliveries at once
+        # should skip batched ones and listen to email_batch_left_queue
+        email_left_queue.send(sender=__name__, batched=True, **delivery)
+        deliveries.append(delivery)
+        if len(deliveries) >= DELIVERY_BATCH_SIZE:
+            send_delivery_batch(deliveries)
+            deliveries = []
+    send_delivery_batch(deliveries)
+    parser.iteration_done()
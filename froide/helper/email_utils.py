@@ -81,6 +81,7 @@ GENERIC_ERROR = DsnStatus(5, 0, 0)
 MAILBOX_FULL = DsnStatus(5, 5, 2)
 
 UID_RE = re.compile(r"UID\s+(?P<uid>\d+)")
+IMAP_FETCH_BATCH_SIZE = 50
 
 
 def get_imap_message_uid(flag_bytes):
@@ -104,16 +105,27 @@ def get_mail_client(host, port, user, password, ssl=True):
 
 
 def get_unread_mails(
-    mailbox: Union[imaplib.IMAP4_SSL, imaplib.IMAP4], flag=False
+    mailbox: Union[imaplib.IMAP4_SSL, imaplib.IMAP4],
+    flag=False,
+    batch_size=IMAP_FETCH_BATCH_SIZE,
 ) -> Iterator[Tuple[Optional[str], bytes]]:
+    """
+    Fetch unseen mails in batches of UIDs so that a large backlog
+    only needs one FETCH (and one STORE) round trip per batch.
+    """
     status, count = mailbox.select("Inbox")
-    typ, data = mailbox.search(None, "UNSEEN")
-    for num in data[0].split():
-        status, data = mailbox.fetch(num, "(BODY[] UID)")
-        uid = get_imap_message_uid(data[0][0])
+    typ, data = mailbox.uid("SEARCH", None, "UNSEEN")
+    uids = [uid.decode("ascii") for uid in data[0].split()]
+    for offset in range(0, len(uids), batch_size):
+        uid_set = ",".join(uids[offset : offset + batch_size])
+        status, data = mailbox.uid("FETCH", uid_set, "(BODY[] UID)")
         if flag:
-            mailbox.store(num, "+FLAGS", "\\Flagged")
-        yield uid, data[0][1]
+            mailbox.uid("STORE", uid_set, "+FLAGS", "\\Flagged")
+        for item in data:
+            # Responses are (envelope, body) tuples separated by b")"
+            if not isinstance(item, tuple):
+                continue
+            yield get_imap_message_uid(item[0]), item[1]
 
     mailbox.close()
 
@@ -182,6 +194,17 @@ def unflag_mail(mailbox, uid):
     mailbox.close()
 
 
+def get_reversed_email_host(email: Optional[str]) -> str:
+    """
+    Return the host of email with reversed labels (e.g. ``org.example.mail``)
+    so that subdomain lookups become indexable prefix queries.
+    """
+    if not email or "@" not in email:
+        return ""
+    host = email.rsplit("@", 1)[1].lower()
+    return ".".join(reversed(host.split(".")))
+
+
 def make_address(email: str, name: Optional[str] = None):
     if name:
         return '"%s" <%s>' % (name.replace('"', ""), email)
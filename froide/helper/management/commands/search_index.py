@@ -1,4 +1,5 @@
 import itertools
+import time
 
 from django_elasticsearch_dsl.management.commands.search_index import (
     Command as DESCommand,
@@ -22,7 +23,9 @@ def grouper(n, iterable):
 class Command(DESCommand):
     def _populate(self, models, options):
         for doc in registry.get_documents(models):
-            qs = doc().get_queryset()
+            # Reuse one instance so per document caches survive across chunks
+            doc_instance = doc()
+            qs = doc_instance.get_queryset()
             count = qs.count()
             self.stdout.write(
                 "Indexing {} '{}' objects " "with custom chunk_size {}".format(
@@ -30,6 +33,7 @@ class Command(DESCommand):
                 )
             )
             working_chunk_divider = None
+            start = time.monotonic()
             obj_iterator = qs.iterator(chunk_size=DB_CHUNK_SIZE)
             for i, obj_group in enumerate(grouper(CHUNK_SIZE, obj_iterator)):
                 percentage = round((i * CHUNK_SIZE) / count * 100, 2)
@@ -44,7 +48,7 @@ class Command(DESCommand):
                     sub_groups = list(grouper(sub_group_size, obj_group))
                     try:
                         for sub_group in sub_groups:
-                            doc().update(sub_group, chunk_size=sub_group_size)
+                            doc_instance.update(sub_group, chunk_size=sub_group_size)
                         working_chunk_divider = divider
                         break
                     except ConnectionError:
@@ -60,4 +64,9 @@ class Command(DESCommand):
                         tries += 1
                         divider = tries
 
-            self.stdout.write("Done")
+            duration = time.monotonic() - start
+            self.stdout.write(
+                "Done: {} objects in {:.1f}s ({:.1f} documents/s)".format(
+                    count, duration, count / duration if duration else 0
+                )
+            )
@@ -0,0 +1,117 @@
+"""
+Coalesce search index updates into bulk requests.
+
+Saved instances are collected per model and flushed when the
+surrounding transaction commits, so each model gets one task per chunk
+of primary keys instead of one task per saved instance. Instances
+collected in a transaction that is rolled back are dropped.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Set
+
+from django.apps import apps
+from django.db import transaction
+
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.registries import registry
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHUNK_SIZE = 500
+
+
+class SearchIndexQueue(threading.local):
+    def __init__(self):
+        self.pending: Dict[str, Set[int]] = defaultdict(set)
+        self.batch_depth = 0
+        self.flush_registered = False
+
+    def add(self, model_name: str, pks: Iterable[int]):
+        if self.flush_registered and not self.is_flush_pending():
+            # The transaction of the pending updates was rolled back
+            self.pending = defaultdict(set)
+            self.flush_registered = False
+        self.pending[model_name].update(pk for pk in pks if pk is not None)
+        if not self.batch_depth:
+            self.register_flush()
+
+    def is_flush_pending(self) -> bool:
+        connection = transaction.get_connection()
+        return any(func == self.flush for _sids, func, *_ in connection.run_on_commit)
+
+    def register_flush(self):
+        if self.flush_registered:
+            return
+        self.flush_registered = True
+        # Runs immediately outside of a transaction
+        transaction.on_commit(self.flush)
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect updates until the outermost batch exits
+        """
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+        if not self.batch_depth:
+            self.register_flush()
+
+    def flush(self):
+        from ..tasks import search_instances_save
+
+        self.flush_registered = False
+        pending, self.pending = self.pending, defaultdict(set)
+        for model_name, pks in pending.items():
+            if not pks:
+                continue
+            logger.info(
+                "Queueing search index update of %d %s instances", len(pks), model_name
+            )
+            pks = sorted(pks)
+            for offset in range(0, len(pks), INDEX_CHUNK_SIZE):
+                search_instances_save.delay(
+                    model_name, pks[offset : offset + INDEX_CHUNK_SIZE]
+                )
+
+
+search_index_queue = SearchIndexQueue()
+
+
+def update_search_index(model_name: str, pks: Iterable[int]):
+    """
+    Load instances with each document's queryset and send one bulk request
+    """
+    if not DEDConfig.autosync_enabled():
+        return
+
+    start = time.monotonic()
+    model = apps.get_model(model_name)
+    pks = list(pks)
+    for doc in registry.get_documents(models=[model]):
+        if doc.django.ignore_signals:
+            continue
+        doc_instance = doc()
+        queryset = doc_instance.get_queryset().filter(pk__in=pks)
+        doc_instance.update(queryset)
+
+    has_related = any(
+        model in doc.django.related_models for doc in registry.get_documents()
+    )
+    if has_related:
+        for instance in model._default_manager.filter(pk__in=pks):
+            registry.update_related(instance)
+
+    logger.info(
+        "Updated search index of %d %s instances in %.2fs",
+        len(pks),
+        model_name,
+        time.monotonic() - start,
+    )
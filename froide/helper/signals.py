@@ -1,3 +1,5 @@
 from django.dispatch import Signal
 
-email_left_queue = Signal()  # args: ['to', 'from', 'message_id', 'status', 'log']
+# args: ['to', 'from', 'message_id', 'status', 'log', 'batched']
+email_left_queue = Signal()
+email_batch_left_queue = Signal()  # args: ['deliveries']
@@ -50,7 +50,8 @@ def delete_file_if_last_reference(
 
 class HashedFilenameStorage(FileSystemStorage):
     def get_hash_parts(self, content):
-        hex_name = sha256(content)
+        # Uploads may come with their hash computed while receiving them
+        hex_name = getattr(content, "content_hash", None) or sha256(content)
         hex_name_02 = hex_name[:2]
         hex_name_24 = hex_name[2:4]
         hex_name_46 = hex_name[4:6]
@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from django.apps import apps
 from django.db import models
@@ -33,6 +33,18 @@ def search_instance_save(model_name: str, pk: int) -> None:
         logger.exception(e)
 
 
+@celery_app.task(autoretry_for=(ConnectionTimeout,), retry_backoff=True)
+def search_instances_save(model_name: str, pks: List[int]) -> None:
+    from .search.index_queue import update_search_index
+
+    try:
+        update_search_index(model_name, pks)
+    except ConnectionTimeout:
+        raise
+    except Exception as e:
+        logger.exception(e)
+
+
 @celery_app.task
 def search_instance_pre_delete(model_name: str, pk: int) -> None:
     instance = get_instance(model_name, pk)
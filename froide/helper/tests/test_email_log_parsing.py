@@ -1,4 +1,5 @@
 import io
+import json
 import os.path
 import shutil
 import tempfile
@@ -11,6 +12,7 @@ from froide.foirequest.tests import factories
 from froide.problem.models import ProblemReport
 
 from ..email_log_parsing import (
+    DogtailPostfixLogfileParser,
     PostfixLogfileParser,
     PostfixLogLine,
     check_delivery_from_log,
@@ -217,6 +219,19 @@ def test_multiple_partial():
     assert invocations[0]["log"] == MAIL_1_LOG
 
 
+def test_pending_state(monkeypatch):
+    with tempfile.TemporaryDirectory() as dir:
+        check_delivery_from_log([p("maillog_002.txt")], Path(dir + "/mail_log.offset"))
+        with open(dir + "/mail_log.offset.state") as f:
+            assert len(json.load(f)) == 1
+
+    monkeypatch.setattr(DogtailPostfixLogfileParser, "MAX_PENDING_MESSAGES", 0)
+    with tempfile.TemporaryDirectory() as dir:
+        check_delivery_from_log([p("maillog_002.txt")], Path(dir + "/mail_log.offset"))
+        with open(dir + "/mail_log.offset.state") as f:
+            assert json.load(f) == {}
+
+
 def test_logfile_rotation():
     invocations = []
 
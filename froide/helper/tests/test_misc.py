@@ -1,15 +1,28 @@
+import json
+import os
 import re
 from datetime import datetime, timedelta
+from unittest import mock
 
+from django.db import transaction
 from django.test import TestCase
 from django.test.utils import override_settings
 
 from ..csv_utils import dict_to_csv_stream
 from ..date_utils import calc_easter, calculate_month_range_de
 from ..email_sending import mail_registry
+from ..email_utils import get_unread_mails
+from ..search import index_queue
 from ..storage import make_unique_filename
-from ..text_diff import mark_differences
-from ..text_utils import remove_closing, replace_email_name, split_text_by_separator
+from ..text_diff import DIFF_BACKENDS, get_differences, mark_differences
+from ..text_utils import (
+    redact_user_strings,
+    remove_closing,
+    replace_email_name,
+    split_text_by_separator,
+)
+
+TEST_DATA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "testdata"))
 
 
 def rec(x):
@@ -92,6 +105,73 @@ Mit freundlichen Grüßen"""
         )
         self.assertEqual(fake_res, res)
 
+    def test_redact_user_strings(self):
+        user_replacements = [
+            ("Musterstr. 12", "<<address>>"),
+            ("max@example.org", "<<email>>"),
+            (rec(r"Sehr geehrter? ((Herr|Frau) .*),"), "<<name>>"),
+            ("Mustermann", "<<name>>"),
+            ("Max", "<<name>>"),
+            ("Max Mustermann", "<<name>>"),
+        ]
+        content = (
+            "Sehr geehrter Herr Mustermann,\n"
+            "MAX MUSTERMANN wohnt in der Musterstr. 12 und nicht bei Maximilian.\n"
+            "Max Max schreibt an max@example.org oder max_mustermann."
+        )
+        self.assertEqual(
+            redact_user_strings(content, user_replacements),
+            "Sehr geehrter <<name>>,\n"
+            "<<name>> wohnt in der <<address>> und nicht bei Maximilian.\n"
+            "<<name>> <<name>> schreibt an <<email>> oder <<name>>_<<name>>.",
+        )
+
+    def test_redact_user_strings_greetings(self):
+        # Greetings may reuse group names and match at the same position
+        user_replacements = [
+            ("Musterstr. 12", "<<address>>"),
+            (rec(r"Sehr geehrter? (?P<n>(Herr|Frau) \w+)"), "<<name>>"),
+            (rec(r"(?P<n>Sehr) geehrter?"), "<<greeting>>"),
+            (rec(r"Liebe (?P<n>.*) aus Musterstr. 12"), "<<unused>>"),
+            ("Mustermann", "<<name>>"),
+        ]
+        content = (
+            "Sehr geehrter Herr Mustermann,\n"
+            "Liebe Grüße aus Musterstr. 12 von Herr Mustermann"
+        )
+        self.assertEqual(
+            redact_user_strings(content, user_replacements),
+            "<<greeting>> geehrter <<name>>,\nLiebe Grüße aus <<address>> von <<name>>",
+        )
+
+
+class TestTextDiffBackends(TestCase):
+    def test_backends_match_corpus(self):
+        with open(os.path.join(TEST_DATA_ROOT, "text_diff_corpus.json")) as f:
+            corpus = json.load(f)
+        for backend in DIFF_BACKENDS:
+            with self.settings(TEXT_DIFF_BACKEND=backend):
+                for case in corpus:
+                    differences = [
+                        list(x)
+                        for x in get_differences(case["original"], case["redacted"])
+                    ]
+                    self.assertEqual(differences, case["differences"])
+
+    def test_redaction_backend_long_text(self):
+        paragraph = (
+            "Sehr geehrte Frau Erika Musterfrau,\n"
+            "vielen Dank für Ihre Anfrage vom 1. Januar an max@example.org.\n"
+        )
+        original = paragraph * 500
+        redacted = original.replace("Erika Musterfrau", "<< Name entfernt >>").replace(
+            "max@example.org", "<<E-Mail-Adresse>>"
+        )
+        with self.settings(TEXT_DIFF_BACKEND="redaction"):
+            differences = list(get_differences(original, redacted))
+        self.assertEqual(sum(1 for same, _ in differences if not same), 1000)
+        self.assertEqual("".join(part for _, part in differences), original)
+
 
 class TestTextSplitting(TestCase):
     def test_no_text_split(self):
@@ -184,6 +264,90 @@ class TestMailIntent(TestCase):
                 raise
 
 
+class FakeMailbox:
+    def __init__(self, mails):
+        self.mails = mails
+        self.commands = []
+
+    def select(self, name):
+        return "OK", [b"%d" % len(self.mails)]
+
+    def uid(self, command, *args):
+        self.commands.append((command, args))
+        if command == "SEARCH":
+            return "OK", [b" ".join(self.mails.keys())]
+        if command == "FETCH":
+            data = []
+            for uid in args[0].split(","):
+                body = self.mails[uid.encode("ascii")]
+                envelope = b"1 (UID %s BODY[] {%d}" % (uid.encode("ascii"), len(body))
+                data.extend([(envelope, body), b")"])
+            return "OK", data
+        return "OK", [None]
+
+    def close(self):
+        pass
+
+
+class TestUnreadMails(TestCase):
+    def test_batched_fetch(self):
+        mails = {b"%d" % i: b"mail %d" % i for i in range(1, 6)}
+        mailbox = FakeMailbox(mails)
+
+        result = list(get_unread_mails(mailbox, flag=True, batch_size=2))
+
+        self.assertEqual(result, [(uid.decode(), body) for uid, body in mails.items()])
+        fetches = [args for command, args in mailbox.commands if command == "FETCH"]
+        self.assertEqual([f[0] for f in fetches], ["1,2", "3,4", "5"])
+        stores = [args for command, args in mailbox.commands if command == "STORE"]
+        self.assertEqual([s[0] for s in stores], ["1,2", "3,4", "5"])
+
+
+class TestSearchIndexQueue(TestCase):
+    @mock.patch("froide.helper.tasks.search_instances_save.delay")
+    def test_coalesce_and_chunk(self, delay):
+        queue = index_queue.SearchIndexQueue()
+        with self.captureOnCommitCallbacks(execute=True):
+            with queue.batch():
+                queue.add("foirequest.foirequest", [3, 1, 2])
+                queue.add("foirequest.foirequest", [2, 3, None])
+                queue.add("publicbody.publicbody", [5])
+        delay.assert_has_calls(
+            [
+                mock.call("foirequest.foirequest", [1, 2, 3]),
+                mock.call("publicbody.publicbody", [5]),
+            ]
+        )
+        self.assertEqual(delay.call_count, 2)
+
+        delay.reset_mock()
+        with mock.patch.object(index_queue, "INDEX_CHUNK_SIZE", 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                queue.add("foirequest.foirequest", range(1, 6))
+        self.assertEqual(
+            [c.args[1] for c in delay.call_args_list], [[1, 2], [3, 4], [5]]
+        )
+
+    @mock.patch("froide.helper.tasks.search_instances_save.delay")
+    def test_flush_once_per_transaction(self, delay):
+        queue = index_queue.SearchIndexQueue()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            queue.add("foirequest.foirequest", [1])
+            queue.add("foirequest.foirequest", [2])
+        self.assertEqual(len(callbacks), 1)
+        delay.assert_called_once_with("foirequest.foirequest", [1, 2])
+
+        # Updates of a rolled back transaction are dropped
+        delay.reset_mock()
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                queue.add("foirequest.foirequest", [3])
+                raise ValueError
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.add("foirequest.foirequest", [4])
+        delay.assert_called_once_with("foirequest.foirequest", [4])
+
+
 class TestCSVFormulaEscape(TestCase):
     def test_formula_escape(self):
         data = [
@@ -1,7 +1,9 @@
 import re
+from bisect import bisect_left
 from difflib import SequenceMatcher
-from typing import Iterator, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
+from django.conf import settings
 from django.utils.html import escape
 from django.utils.safestring import SafeString, mark_safe
 
@@ -9,6 +11,13 @@ SPLITTER = r"([\u0000-\u002C\u003B-\u003F\u005B-\u005e\u0060\u007B-\u007E])"
 SPLITTER_RE = re.compile(SPLITTER)
 SPLITTER_MATCH_RE = re.compile("^%s$" % SPLITTER)
 CONTENT_CACHE_THRESHOLD = 5000
+# Tokens that need to match to continue after a redaction
+ANCHOR_SIZE = 8
+# Redactions longer than this are left to SequenceMatcher
+MAX_GAP_SIZE = 500
+
+Opcode = Tuple[str, int, int, int, int]
+MatchingBlock = Tuple[int, int, int]
 
 
 def get_diff_chunks(content: str) -> List[str]:
@@ -19,14 +28,213 @@ def is_diff_separator(s: str) -> bool:
     return bool(SPLITTER_MATCH_RE.match(s))
 
 
+def get_sequencematcher_opcodes(a: Sequence, b: Sequence) -> List[Opcode]:
+    return SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+
+def get_opcodes_from_blocks(blocks: List[MatchingBlock]) -> List[Opcode]:
+    """
+    Opcodes like SequenceMatcher.get_opcodes from matching blocks
+    that end with the (len(a), len(b), 0) sentinel
+    """
+    i = j = 0
+    opcodes = []
+    for ai, bj, size in blocks:
+        tag = ""
+        if i < ai and j < bj:
+            tag = "replace"
+        elif i < ai:
+            tag = "delete"
+        elif j < bj:
+            tag = "insert"
+        if tag:
+            opcodes.append((tag, i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return opcodes
+
+
+def get_resync_blocks(a: Sequence, b: Sequence) -> List[MatchingBlock]:
+    """
+    Walk both sequences in step, after a difference continue at the next
+    run of ANCHOR_SIZE tokens that both share shortly after it
+    """
+    n, m = len(a), len(b)
+    b_grams: Dict[tuple, List[int]] = {}
+    for j in range(m - ANCHOR_SIZE + 1):
+        b_grams.setdefault(tuple(b[j : j + ANCHOR_SIZE]), []).append(j)
+
+    blocks = []
+    i = j = 0
+    while i < n and j < m:
+        if a[i] == b[j]:
+            size = 1
+            while i + size < n and j + size < m and a[i + size] == b[j + size]:
+                size += 1
+            blocks.append((i, j, size))
+            i, j = i + size, j + size
+            continue
+        resync = None
+        for next_i in range(i, min(n - ANCHOR_SIZE + 1, i + MAX_GAP_SIZE)):
+            positions = b_grams.get(tuple(a[next_i : next_i + ANCHOR_SIZE]), ())
+            index = bisect_left(positions, j)
+            if index < len(positions) and positions[index] < j + MAX_GAP_SIZE:
+                resync = next_i, positions[index]
+                break
+        if resync is None:
+            break
+        i, j = resync
+    return blocks
+
+
+def merge_blocks(blocks: List[MatchingBlock]) -> List[MatchingBlock]:
+    merged: List[MatchingBlock] = []
+    for i, j, size in blocks:
+        if not size:
+            continue
+        if merged:
+            last_i, last_j, last_size = merged[-1]
+            if last_i + last_size == i and last_j + last_size == j:
+                merged[-1] = (last_i, last_j, last_size + size)
+                continue
+        merged.append((i, j, size))
+    return merged
+
+
+def select_anchors(blocks: List[MatchingBlock], n: int, m: int) -> List[MatchingBlock]:
+    """
+    Keep blocks longer than any match in the gaps around them,
+    SequenceMatcher picks these before looking into the gaps
+    """
+    anchors = []
+    for index, (i, j, size) in enumerate(blocks):
+        if index > 0:
+            prev_i, prev_j, prev_size = blocks[index - 1]
+            prev_i, prev_j = prev_i + prev_size, prev_j + prev_size
+        else:
+            prev_i, prev_j = 0, 0
+        if index + 1 < len(blocks):
+            next_i, next_j, _size = blocks[index + 1]
+        else:
+            next_i, next_j = n, m
+        # A match in a gap can't be longer than its shorter side
+        gap = max(
+            min(i - prev_i, j - prev_j),
+            min(next_i - i - size, next_j - j - size),
+        )
+        if size > gap:
+            anchors.append((i, j, size))
+    return anchors
+
+
+def get_redaction_opcodes(a: Sequence, b: Sequence) -> List[Opcode]:
+    """
+    Diff specialised for a redacted text b derived from a by replacing
+    spans. A linear scan finds the long unchanged stretches between
+    redactions, SequenceMatcher then only runs on the short gaps between
+    them. Repetitive texts with insertions or deletions can end up with
+    a different but equally short alignment than SequenceMatcher's.
+    """
+    n, m = len(a), len(b)
+    # Compare integer ids instead of strings
+    token_ids: Dict[str, int] = {}
+    a_ids = [token_ids.setdefault(t, len(token_ids)) for t in a]
+    b_ids = [token_ids.setdefault(t, len(token_ids)) for t in b]
+
+    prefix = 0
+    while prefix < n and prefix < m and a_ids[prefix] == b_ids[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < n - prefix
+        and suffix < m - prefix
+        and a_ids[n - suffix - 1] == b_ids[m - suffix - 1]
+    ):
+        suffix += 1
+
+    middle_blocks = get_resync_blocks(
+        a_ids[prefix : n - suffix], b_ids[prefix : m - suffix]
+    )
+    blocks = merge_blocks(
+        [(0, 0, prefix)]
+        + [(i + prefix, j + prefix, size) for i, j, size in middle_blocks]
+        + [(n - suffix, m - suffix, suffix)]
+    )
+    anchors = select_anchors(blocks, n, m)
+
+    # Extend to the maximal match like SequenceMatcher would find it
+    extended = []
+    for i, j, size in anchors:
+        while i > 0 and j > 0 and a_ids[i - 1] == b_ids[j - 1]:
+            i, j, size = i - 1, j - 1, size + 1
+        while i + size < n and j + size < m and a_ids[i + size] == b_ids[j + size]:
+            size += 1
+        extended.append((i, j, size))
+
+    # Longer blocks win tokens claimed by two neighbours, like
+    # SequenceMatcher placing its longest match first
+    placed: List[Optional[MatchingBlock]] = [None] * len(extended)
+    order = sorted(range(len(extended)), key=lambda k: (-extended[k][2], k))
+    for index in order:
+        i, j, size = extended[index]
+        lo_i = lo_j = 0
+        for k in range(index - 1, -1, -1):
+            if placed[k] is not None:
+                lo_i, lo_j = placed[k][0] + placed[k][2], placed[k][1] + placed[k][2]
+                break
+        hi_i, hi_j = n, m
+        for k in range(index + 1, len(placed)):
+            if placed[k] is not None:
+                hi_i, hi_j = placed[k][:2]
+                break
+        start = max(0, lo_i - i, lo_j - j)
+        end = min(size, hi_i - i, hi_j - j)
+        if end > start:
+            placed[index] = (i + start, j + start, end - start)
+
+    result: List[MatchingBlock] = []
+    last_i = last_j = 0
+    for block in placed:
+        if block is None:
+            continue
+        i, j, size = block
+        result.extend(get_gap_blocks(a_ids, b_ids, last_i, i, last_j, j))
+        result.append(block)
+        last_i, last_j = i + size, j + size
+    result.extend(get_gap_blocks(a_ids, b_ids, last_i, n, last_j, m))
+
+    result = merge_blocks(result)
+    result.append((n, m, 0))
+    return get_opcodes_from_blocks(result)
+
+
+def get_gap_blocks(
+    a: Sequence, b: Sequence, alo: int, ahi: int, blo: int, bhi: int
+) -> List[MatchingBlock]:
+    if alo == ahi or blo == bhi:
+        return []
+    matcher = SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+    return [(alo + i, blo + j, size) for i, j, size in matcher.get_matching_blocks()]
+
+
+DIFF_BACKENDS: Dict[str, Callable[[Sequence, Sequence], List[Opcode]]] = {
+    "sequencematcher": get_sequencematcher_opcodes,
+    "redaction": get_redaction_opcodes,
+}
+
+
+def get_diff_opcodes(a: Sequence, b: Sequence) -> List[Opcode]:
+    return DIFF_BACKENDS[settings.TEXT_DIFF_BACKEND](a, b)
+
+
 def get_differences_by_chunk(
     content_a: str, content_b: str
 ) -> Iterator[Tuple[bool, str]]:
     a_list = get_diff_chunks(content_a)
     b_list = get_diff_chunks(content_b)
-    matcher = SequenceMatcher(None, a_list, b_list, autojunk=False)
     last_same = False
-    for tag, i1, i2, _j1, _j2 in matcher.get_opcodes():
+    for tag, i1, i2, _j1, _j2 in get_diff_opcodes(a_list, b_list):
         if i1 == i2:
             continue
         is_same = tag == "equal"
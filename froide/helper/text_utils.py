@@ -92,14 +92,113 @@ Replacements = List[Union[Tuple[str, str], Tuple[Pattern[str], str]]]
 ReplacementsDict = Dict[Union[str, Pattern[str]], str]
 
 
-def redact_user_strings(content: str, user_replacements: Replacements) -> str:
-    for needle, repl in user_replacements:
-        if isinstance(needle, str):
-            content = replace_word(needle, repl, content)
+# Patterns with their own inline flags or back references
+# can't be joined into one alternation
+UNCOMBINABLE_RE = re.compile(r"\(\?[aiLmsux]+\)|\\[1-9]|\(\?P=")
+
+
+def get_trie_pattern(needles: List[str]) -> str:
+    """
+    Regex alternation of needles nested as a trie, the engine
+    then never compares a shared prefix twice and prefers the
+    longest needle at a position
+    """
+    trie: Dict[str, Any] = {}
+    for needle in needles:
+        node = trie
+        for char in needle:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def get_node_pattern(node: Dict[str, Any]) -> str:
+        alternatives = [
+            re.escape(char) + get_node_pattern(child)
+            for char, child in node.items()
+            if char
+        ]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1:
+            pattern = alternatives[0]
+            if "" in node and len(pattern) > 1:
+                pattern = "(?:%s)" % pattern
         else:
-            content = replace_custom(needle, repl, content)
+            pattern = "(?:%s)" % "|".join(alternatives)
+        if "" in node:
+            pattern += "?"
+        return pattern
 
-    return content
+    return get_node_pattern(trie)
+
+
+class RedactionPlan:
+    """
+    Applies user replacements in as few scans over the content as possible.
+
+    Consecutive literal needles are matched case insensitively as whole
+    words (or anywhere with word_boundary=False) through one trie shaped
+    regex, the longest needle wins. Regex rules such as greetings keep
+    replace_custom semantics: each replaces the first group of its first
+    match everywhere, in the order the replacements are given.
+    """
+
+    def __init__(self, user_replacements: Replacements, word_boundary: bool = True):
+        self.word_boundary = word_boundary
+        self.steps: List[Tuple[Pattern[str], Union[Callable, str]]] = []
+        literals: Dict[str, str] = {}
+        for needle, repl in user_replacements:
+            if isinstance(needle, str):
+                if needle:
+                    literals.setdefault(needle.lower(), repl)
+                continue
+            if literals:
+                self.steps.append(self.get_literal_step(literals))
+                literals = {}
+            self.steps.append((needle, repl))
+        if literals:
+            self.steps.append(self.get_literal_step(literals))
+
+    def get_literal_step(
+        self, literals: Dict[str, str]
+    ) -> Tuple[Pattern[str], Callable]:
+        pattern = get_trie_pattern(list(literals))
+        if self.word_boundary:
+            pattern = r"(?<![^\W_])%s(?![^\W_])" % pattern
+        regex = re.compile(pattern, flags=re.U | re.I)
+        return regex, functools.partial(get_literal_replacement, literals)
+
+    def apply(self, content: str) -> str:
+        for regex, repl in self.steps:
+            if callable(repl):
+                content = regex.sub(repl, content)
+            else:
+                content = replace_custom(regex, repl, content)
+        return content
+
+
+def get_literal_replacement(literals: Dict[str, str], match: re.Match) -> str:
+    text = match.group(0)
+    try:
+        return literals[text.lower()]
+    except KeyError:
+        # Case folding changed the length of the match
+        for needle, repl in literals.items():
+            if re.fullmatch(re.escape(needle), text, flags=re.U | re.I):
+                return repl
+    return text
+
+
+@functools.lru_cache(maxsize=512)
+def get_redaction_plan(
+    user_replacements: Tuple[Union[Tuple[str, str], Tuple[Pattern[str], str]], ...],
+    word_boundary: bool = True,
+) -> RedactionPlan:
+    return RedactionPlan(list(user_replacements), word_boundary=word_boundary)
+
+
+def redact_user_strings(content: str, user_replacements: Replacements) -> str:
+    plan = get_redaction_plan(tuple(user_replacements))
+    return plan.apply(content)
 
 
 def redact_subject(
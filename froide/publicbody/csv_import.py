@@ -1,65 +1,165 @@
+import codecs
 import csv
 import json
-from io import BytesIO, StringIO
+from dataclasses import dataclass, field
+from functools import reduce
+from io import BytesIO
+from operator import or_
+from typing import Dict, List, Optional
 
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Point
 from django.contrib.sites.models import Site
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 import requests
 
 from froide.georegion.models import GeoRegion
-from froide.helper.search.utils import trigger_search_index_update_qs
+from froide.helper.email_utils import get_reversed_email_host
+from froide.helper.search.index_queue import search_index_queue
 from froide.helper.text_utils import slugify
-from froide.publicbody.models import Category, Classification, Jurisdiction, PublicBody
+from froide.publicbody.models import (
+    CategorizedPublicBody,
+    Category,
+    Classification,
+    Jurisdiction,
+    PublicBody,
+)
 
 User = get_user_model()
 
+IMPORT_CHUNK_SIZE = 500
+
+# M2M field name -> (through model, public body column, target column)
+M2M_THROUGH = {
+    "laws": (PublicBody.laws.through, "publicbody_id", "foilaw_id"),
+    "regions": (PublicBody.regions.through, "publicbody_id", "georegion_id"),
+    "categories": (CategorizedPublicBody, "content_object_id", "tag_id"),
+}
+
 
 class NotUniquelyIdentifiable(Exception):
     pass
 
 
+@dataclass
+class ImportChange:
+    publicbody: PublicBody
+    created: bool
+    fields: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ImportRow:
+    values: Dict
+    lookup: Optional[tuple] = None
+    parent: Optional[tuple] = None
+    regions: Optional[list] = None
+    categories: Optional[list] = None
+    publicbody: Optional[PublicBody] = None
+    new_parent: Optional[PublicBody] = None
+    m2m: Dict = field(default_factory=dict)
+    update_fields: List[str] = field(default_factory=list)
+
+
+def is_empty(value):
+    return value is None or (isinstance(value, str) and not value)
+
+
 class CSVImporter(object):
-    def __init__(self, user=None):
+    """
+    Imports public bodies from CSV in chunks of rows.
+
+    All references of a chunk are resolved with one query per kind,
+    existing public bodies are diffed against the rows and only changed
+    ones are written with bulk queries. Changed public bodies are
+    reindexed in bulk after the import. With dry_run nothing is written,
+    the planned changes are returned all the same.
+    """
+
+    def __init__(self, user=None, dry_run=False):
         if user is None:
             self.user = User.objects.order_by("id")[0]
         else:
             self.user = user
+        self.dry_run = dry_run
         self.site = Site.objects.get_current()
-        self.topic_cache = {}
         self.classification_cache = {}
-        self.default_topic = None
         self.jur_cache = {}
         self.category_cache = {}
+        self.georegion_cache = {}
+        # New public bodies by slug, parents may refer to them
+        self.new_by_slug = {}
+        self.changes: List[ImportChange] = []
 
     def import_from_url(self, url):
         response = requests.get(url)
         # Force requests to evaluate as UTF-8
         response.encoding = "utf-8"
         csv_file = BytesIO(response.content)
-        self.import_from_file(csv_file)
+        return self.import_from_file(csv_file)
 
     def import_from_file(self, csv_file):
         """
         csv_file should be encoded in utf-8
         """
         self.import_time = timezone.now()
-        csv_file = StringIO(csv_file.read().decode("utf-8"))
-        reader = csv.DictReader(csv_file)
-        for row in reader:
-            self.import_row(row)
-
-        # Trigger search index update for updated pbs
-        # as update did not trigger it.
-        updated_pbs = PublicBody.objects.filter(updated_at=self.import_time).exclude(
-            created_at=self.import_time
+        self.changes = []
+        reader = csv.DictReader(codecs.iterdecode(csv_file, "utf-8"))
+        with search_index_queue.batch():
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk)
+
+        if self.changes and not self.dry_run:
+            if apps.is_installed("froide.foirequest"):
+                from froide.foirequest.delivery_cache import invalidate_publicbodies
+
+                # Bulk queries do not send the signals that invalidate it
+                invalidate_publicbodies()
+        return self.changes
+
+    def import_chunk(self, rows):
+        items = [self.prepare_row(row) for row in rows]
+        self.resolve_references(items)
+        for item in items:
+            self.apply_references(item)
+        existing = self.get_existing(items)
+        current_m2m = self.get_current_m2m(existing)
+
+        creates = []
+        updates = []
+        for item in items:
+            # Parents may be created by a previous row
+            self.apply_parent(item)
+            pb = self.find_existing(item, existing)
+            if pb is None:
+                creates.append(self.plan_create(item))
+            else:
+                change = self.plan_update(item, pb, current_m2m)
+                if change is not None:
+                    updates.append(change)
+
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            self.create_publicbodies(creates)
+            self.update_publicbodies(updates)
+            self.update_m2m(creates + updates, current_m2m)
+        search_index_queue.add(
+            PublicBody._meta.label_lower,
+            [item.publicbody.id for item in creates + updates],
         )
-        trigger_search_index_update_qs(updated_pbs)
 
-    def import_row(self, row):
+    def prepare_row(self, row):
         # generate slugs
         if "name" in row:
             row["name"] = row["name"].strip()
@@ -74,37 +174,34 @@ class CSVImporter(object):
         if "slug" not in row and "name" in row:
             row["slug"] = slugify(row["name"])
 
-        if "classification" in row:
-            row["classification"] = self.get_classification(
-                row.pop("classification", None)
-            )
+        item = ImportRow(values=row)
 
-        categories = row.pop("categories", [])
+        categories = row.pop("categories", None)
         if categories:
-            categories_list = categories.split(",")
-            categories = list(self.get_categories(categories_list))
-
-        # resolve foreign keys
-        if "jurisdiction__slug" in row:
-            row["jurisdiction"] = self.get_jurisdiction(row.pop("jurisdiction__slug"))
+            item.categories = [c.strip() for c in categories.split(",")]
 
         regions = None
         if "georegion_id" in row:
-            regions = [self.get_georegion(id=row.pop("georegion_id"))]
+            georegion_id = row.pop("georegion_id")
+            if georegion_id:
+                regions = [("id", georegion_id)]
         elif "georegion_identifier" in row:
-            regions = [self.get_georegion(identifier=row.pop("georegion_identifier"))]
+            identifier = row.pop("georegion_identifier")
+            if identifier:
+                regions = [("identifier", identifier)]
         elif "regions" in row:
             regions = row.pop("regions")
             if regions:
-                regions = [self.get_georegion(id=r) for r in regions.split(",")]
+                regions = [("id", r) for r in regions.split(",")]
+        item.regions = regions or None
 
         parent = row.pop("parent__name", None)
         if parent:
-            row["parent"] = PublicBody._default_manager.get(slug=slugify(parent))
+            item.parent = ("slug", slugify(parent))
 
         parent = row.pop("parent__id", None)
         if parent:
-            row["parent"] = PublicBody._default_manager.get(pk=parent)
+            item.parent = ("id", parent)
 
         extra_data = row.pop("extra_data", None)
         if extra_data:
@@ -133,106 +230,312 @@ class CSVImporter(object):
             if lat and lng:
                 row["geo"] = Point(float(lng), float(lat))
 
-        try:
-            if "id" in row and row["id"]:
-                pb = PublicBody._default_manager.get(id=row["id"])
-            elif row.get("source_reference"):
-                pb = PublicBody._default_manager.get(
-                    source_reference=row["source_reference"]
-                )
-            elif regions is not None:
-                pb = PublicBody._default_manager.get(
-                    slug=row["slug"], regions__in=regions
-                )
+        if row.get("id"):
+            item.lookup = ("id", row["id"])
+        elif row.get("source_reference"):
+            item.lookup = ("source_reference", row["source_reference"])
+        elif item.regions:
+            item.lookup = ("slug", row.get("slug"))
+        row.pop("id", None)
+        return item
+
+    def resolve_references(self, items):
+        rows = [item.values for item in items]
+        self.load_classifications(
+            {row["classification"] for row in rows if row.get("classification")}
+        )
+        self.load_jurisdictions(
+            {row["jurisdiction__slug"] for row in rows if "jurisdiction__slug" in row}
+        )
+        self.load_categories({c for item in items for c in item.categories or ()})
+        self.load_georegions({r for item in items for r in item.regions or ()})
+
+        parent_ids = {i.parent[1] for i in items if i.parent and i.parent[0] == "id"}
+        parent_slugs = {
+            i.parent[1] for i in items if i.parent and i.parent[0] == "slug"
+        }
+        self.parents = {}
+        for pk in PublicBody._default_manager.filter(id__in=parent_ids).values_list(
+            "id", flat=True
+        ):
+            self.parents[("id", str(pk))] = pk
+        for pk, slug in PublicBody._default_manager.filter(
+            slug__in=parent_slugs
+        ).values_list("id", "slug"):
+            key = ("slug", slug)
+            # Ambiguous slugs are resolved to None
+            self.parents[key] = None if key in self.parents else pk
+
+    def load_jurisdictions(self, slugs):
+        missing = slugs - set(self.jur_cache)
+        if not missing:
+            return
+        for jur in Jurisdiction.objects.filter(slug__in=missing):
+            jur.laws = jur.get_all_laws()
+            self.jur_cache[jur.slug] = jur
+        for slug in missing - set(self.jur_cache):
+            raise ValueError(_('Jurisdiction slug "%s" does not exist.') % slug)
+
+    def load_categories(self, cats):
+        missing = cats - set(self.category_cache)
+        if not missing:
+            return
+        ids = {}
+        names = {}
+        for cat in missing:
+            try:
+                ids[int(cat)] = cat
+            except ValueError:
+                names[str(cat).replace('"', "")] = cat
+        categories = Category.objects.filter(
+            models.Q(id__in=ids) | models.Q(name__in=names)
+        )
+        for category in categories:
+            if category.id in ids:
+                self.category_cache[ids[category.id]] = category
+            if category.name in names:
+                self.category_cache[names[category.name]] = category
+        for cat in missing - set(self.category_cache):
+            raise ValueError(_('Category name "%s" does not exist.') % cat)
+
+    def load_georegions(self, keys):
+        missing = keys - set(self.georegion_cache)
+        if not missing:
+            return
+        ids = {value for kind, value in missing if kind == "id"}
+        identifiers = {value for kind, value in missing if kind == "identifier"}
+        for region in GeoRegion.objects.filter(id__in=ids):
+            self.georegion_cache[("id", str(region.id))] = region
+        regions = GeoRegion.objects.exclude(kind="zipcode").filter(
+            region_identifier__in=identifiers
+        )
+        for region in regions:
+            self.georegion_cache[("identifier", region.region_identifier)] = region
+        for kind, value in missing - set(self.georegion_cache):
+            if kind == "id":
+                args = (value, None)
             else:
-                raise NotUniquelyIdentifiable
-
-            # If it exists, update it
-            row.pop("id", None)  # Do not update id though
-            row.pop("slug", None)  # Do not update slug either
-            row["_updated_by"] = self.user
-            row["updated_at"] = self.import_time
-            PublicBody._default_manager.filter(id=pb.id).update(**row)
-            if row.get("jurisdiction"):
-                pb.laws.clear()
-                pb.laws.add(*row["jurisdiction"].laws)
-            if regions:
-                pb.regions.set(regions)
-            if categories:
-                pb.categories.set(categories)
-            return pb
-        except (PublicBody.DoesNotExist, NotUniquelyIdentifiable):
-            pass
-        row.pop("id", None)  # Remove id if present
-        pb = PublicBody(**row)
+                args = (None, value)
+            raise ValueError(_("GeoRegion %s/%s does not exist.") % args)
+
+    def load_classifications(self, names):
+        missing = names - set(self.classification_cache)
+        if not missing:
+            return
+        for classification in Classification.objects.filter(name__in=missing):
+            self.classification_cache[classification.name] = classification
+        for name in missing - set(self.classification_cache):
+            raise ValueError(_('Classification "%s" does not exist.') % name)
+
+    def apply_references(self, item):
+        row = item.values
+        if "classification" in row:
+            name = row.pop("classification")
+            row["classification"] = self.classification_cache[name] if name else None
+
+        if "jurisdiction__slug" in row:
+            row["jurisdiction"] = self.jur_cache[row.pop("jurisdiction__slug")]
+            item.m2m["laws"] = {law.id for law in row["jurisdiction"].laws}
+
+        if item.regions:
+            item.regions = [self.georegion_cache[key] for key in item.regions]
+            item.m2m["regions"] = {region.id for region in item.regions}
+
+        if item.categories:
+            item.categories = [self.category_cache[c] for c in item.categories]
+            item.m2m["categories"] = {category.id for category in item.categories}
+
+    def apply_parent(self, item):
+        row = item.values
+        if item.parent is None:
+            return
+        parent_id = self.parents.get(item.parent)
+        if parent_id is not None:
+            row["parent_id"] = parent_id
+        elif item.parent[0] == "slug" and item.parent[1] in self.new_by_slug:
+            item.new_parent = self.new_by_slug[item.parent[1]]
+        else:
+            raise ValueError(_('Parent "%s" does not exist.') % item.parent[1])
+
+    def get_existing(self, items):
+        lookups = {"id": set(), "source_reference": set(), "slug": set()}
+        region_ids = set()
+        for item in items:
+            if item.lookup is None:
+                continue
+            lookups[item.lookup[0]].add(item.lookup[1])
+            if item.lookup[0] == "slug":
+                region_ids.update(r.id for r in item.regions)
+        query = models.Q(id__in=lookups["id"]) | models.Q(
+            source_reference__in=lookups["source_reference"]
+        )
+        if lookups["slug"]:
+            query |= models.Q(
+                id__in=PublicBody._default_manager.filter(
+                    slug__in=lookups["slug"], regions__in=region_ids
+                ).values("id")
+            )
+        pbs = list(PublicBody._default_manager.filter(query))
+        existing = {
+            "id": {str(pb.id): pb for pb in pbs},
+            "source_reference": {},
+            "slug": {},
+        }
+        for pb in pbs:
+            if pb.source_reference:
+                existing["source_reference"].setdefault(pb.source_reference, [])
+                existing["source_reference"][pb.source_reference].append(pb)
+
+        if lookups["slug"]:
+            slug_regions = PublicBody._default_manager.filter(
+                slug__in=lookups["slug"], regions__in=region_ids
+            ).values_list("id", "slug", "regions")
+            for pb_id, slug, region_id in slug_regions:
+                matches = existing["slug"].setdefault((slug, region_id), [])
+                if existing["id"][str(pb_id)] not in matches:
+                    matches.append(existing["id"][str(pb_id)])
+        return existing
+
+    def find_existing(self, item, existing):
+        if item.lookup is None:
+            return None
+        kind, value = item.lookup
+        if kind == "id":
+            return existing["id"].get(str(value))
+        if kind == "source_reference":
+            matches = existing["source_reference"].get(value, [])
+        else:
+            matches = []
+            for region in item.regions:
+                for pb in existing["slug"].get((value, region.id), []):
+                    if pb not in matches:
+                        matches.append(pb)
+        if len(matches) > 1:
+            raise NotUniquelyIdentifiable(
+                _('Public body "%s" is not uniquely identifiable.') % value
+            )
+        return matches[0] if matches else None
+
+    def get_current_m2m(self, existing):
+        ids = [pb.id for pb in existing["id"].values()]
+        current = {}
+        for name, (through, pb_column, target_column) in M2M_THROUGH.items():
+            current[name] = {pb_id: set() for pb_id in ids}
+            pairs = through.objects.filter(**{pb_column + "__in": ids}).values_list(
+                pb_column, target_column
+            )
+            for pb_id, target_id in pairs:
+                current[name][pb_id].add(target_id)
+        return current
+
+    def plan_create(self, item):
+        pb = PublicBody(**item.values)
+        if item.new_parent is not None:
+            pb.parent = item.new_parent
+        pb.email_host_reversed = get_reversed_email_host(pb.email)
         pb._created_by = self.user
         pb._updated_by = self.user
         pb.created_at = self.import_time
         pb.updated_at = self.import_time
         pb.confirmed = True
         pb.site = self.site
-        pb.save()
-        if row.get("jurisdiction"):
-            pb.laws.add(*row["jurisdiction"].laws)
-        if regions:
-            pb.regions.set(regions)
-        if categories:
-            pb.categories.set(categories)
-        return pb
+        item.publicbody = pb
+        self.new_by_slug[pb.slug] = pb
+        self.changes.append(ImportChange(pb, created=True))
+        return item
 
-    def get_jurisdiction(self, slug):
-        if slug not in self.jur_cache:
-            try:
-                jur = Jurisdiction.objects.get(slug=slug)
-            except Jurisdiction.DoesNotExist:
-                raise ValueError(
-                    _('Jurisdiction slug "%s" does not exist.') % slug
-                ) from None
-            jur.laws = jur.get_all_laws()
-            self.jur_cache[slug] = jur
-        return self.jur_cache[slug]
+    def plan_update(self, item, pb, current_m2m):
+        changed = []
+        # Do not update slug
+        item.values.pop("slug", None)
+        for name, value in item.values.items():
+            model_field = PublicBody._meta.get_field(name)
+            if model_field.is_relation:
+                old = getattr(pb, model_field.attname)
+                new = value.pk if isinstance(value, models.Model) else value
+                if old != new:
+                    setattr(pb, model_field.attname, new)
+                    changed.append(model_field.name)
+                continue
+            old = getattr(pb, name)
+            if is_empty(old) and is_empty(value):
+                continue
+            if old != value:
+                setattr(pb, name, value)
+                changed.append(name)
+        if item.new_parent is not None:
+            pb.parent = item.new_parent
+            changed.append("parent")
+        if "email" in changed:
+            pb.email_host_reversed = get_reversed_email_host(pb.email)
 
-    def get_categories(self, cats):
-        for cat in cats:
-            if cat in self.category_cache:
-                yield self.category_cache[cat]
-            else:
-                try:
-                    try:
-                        id = int(cat)
-                        category = Category.objects.get(id=id)
-                    except ValueError:
-                        cat_string = str(cat).replace('"', "")
-                        category = Category.objects.get(name=cat_string)
-                except Category.DoesNotExist:
-                    raise ValueError(
-                        _('Category name "%s" does not exist.') % cat
-                    ) from None
-                self.category_cache[cat] = category
-                yield category
-
-    def get_georegion(self, id=None, identifier=None, name=None):
-        try:
-            if id is not None:
-                return GeoRegion.objects.get(id=id)
-            if identifier is not None:
-                return GeoRegion.objects.exclude(kind="zipcode").get(
-                    region_identifier=identifier
-                )
-        except GeoRegion.DoesNotExist:
-            raise ValueError(
-                _("GeoRegion %s/%s does not exist.") % (id, identifier)
-            ) from None
-        return None
-
-    def get_classification(self, name):
-        if not name:
+        m2m_changed = [
+            name
+            for name, target_ids in item.m2m.items()
+            if target_ids != current_m2m[name][pb.id]
+        ]
+        if not changed and not m2m_changed:
             return None
-        if name not in self.classification_cache:
-            try:
-                self.classification_cache[name] = Classification.objects.get(name=name)
-            except Classification.DoesNotExist:
-                raise ValueError(
-                    _('Classification "%s" does not exist.') % name
-                ) from None
-        return self.classification_cache[name]
+
+        pb._updated_by = self.user
+        pb.updated_at = self.import_time
+        item.publicbody = pb
+        item.update_fields = changed
+        self.changes.append(
+            ImportChange(pb, created=False, fields=changed + m2m_changed)
+        )
+        return item
+
+    def create_publicbodies(self, items):
+        pending = items
+        while pending:
+            # Parents need to be created before their children
+            ready = [
+                item
+                for item in pending
+                if item.new_parent is None or item.new_parent.pk is not None
+            ]
+            if not ready:
+                raise ValueError(_("Public bodies have circular parents."))
+            PublicBody._default_manager.bulk_create([item.publicbody for item in ready])
+            pending = [item for item in pending if item.publicbody.pk is None]
+
+    def update_publicbodies(self, items):
+        by_fields = {}
+        for item in items:
+            fields = set(item.update_fields) | {"updated_at", "_updated_by"}
+            if "email" in fields:
+                fields.add("email_host_reversed")
+            by_fields.setdefault(tuple(sorted(fields)), []).append(item.publicbody)
+        for fields, pbs in by_fields.items():
+            PublicBody._default_manager.bulk_update(
+                pbs, fields, batch_size=IMPORT_CHUNK_SIZE
+            )
+
+    def update_m2m(self, items, current_m2m):
+        for name, (through, pb_column, target_column) in M2M_THROUGH.items():
+            removed = []
+            added = []
+            for item in items:
+                if name not in item.m2m:
+                    continue
+                pb_id = item.publicbody.id
+                current = current_m2m[name].get(pb_id, set())
+                target_ids = item.m2m[name]
+                if current - target_ids:
+                    removed.append(
+                        models.Q(
+                            **{
+                                pb_column: pb_id,
+                                target_column + "__in": current - target_ids,
+                            }
+                        )
+                    )
+                added.extend(
+                    through(**{pb_column: pb_id, target_column: target_id})
+                    for target_id in target_ids - current
+                )
+            if removed:
+                through.objects.filter(reduce(or_, removed)).delete()
+            if added:
+                through.objects.bulk_create(added, ignore_conflicts=True)
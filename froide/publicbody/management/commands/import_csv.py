@@ -8,6 +8,11 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("filename", type=str)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the planned changes",
+        )
 
     def handle(self, *args, **options):
         translation.activate(settings.LANGUAGE_CODE)
@@ -16,12 +21,28 @@ class Command(BaseCommand):
 
         filename = options["filename"]
 
-        importer = CSVImporter()
+        importer = CSVImporter(dry_run=options["dry_run"])
 
         if filename.startswith("http://") or filename.startswith("https://"):
-            importer.import_from_url(filename)
+            changes = importer.import_from_url(filename)
         else:
             with open(filename, "rb") as f:
-                importer.import_from_file(f)
+                changes = importer.import_from_file(f)
+
+        if options["dry_run"]:
+            for change in changes:
+                if change.created:
+                    self.stdout.write("Create: %s\n" % change.publicbody.name)
+                else:
+                    self.stdout.write(
+                        "Update %s (%s): %s\n"
+                        % (
+                            change.publicbody.name,
+                            change.publicbody.id,
+                            ", ".join(change.fields),
+                        )
+                    )
+            self.stdout.write("Dry run, nothing was imported.\n")
+            return
 
         self.stdout.write("Import done.\n")
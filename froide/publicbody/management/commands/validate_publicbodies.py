@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from datetime import timedelta
 from io import StringIO
 
 from django.conf import settings
@@ -9,7 +10,12 @@ from django.utils.translation import gettext_lazy as _
 from froide.helper.email_sending import send_mail
 
 from ...models import PublicBody
-from ...validators import PublicBodyValidator
+from ...validators import (
+    VALIDATION_MAX_AGE,
+    VALIDATION_WORKERS,
+    ContactValidationEngine,
+    PublicBodyValidator,
+)
 
 
 class Command(BaseCommand):
@@ -17,6 +23,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("filename", type=str, nargs="?", default=None)
+        parser.add_argument("--workers", type=int, default=VALIDATION_WORKERS)
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=VALIDATION_MAX_AGE.days,
+            help="Validate stored results older than this many days again",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Validate all values, ignoring stored results",
+        )
 
     @contextmanager
     def get_stream(self, filename):
@@ -36,7 +54,9 @@ class Command(BaseCommand):
         filename = options["filename"]
 
         pbs = PublicBody.objects.all()
-        validator = PublicBodyValidator(pbs)
+        max_age = timedelta(days=0 if options["force"] else options["max_age"])
+        engine = ContactValidationEngine(workers=options["workers"], max_age=max_age)
+        validator = PublicBodyValidator(pbs, engine=engine)
 
         with self.get_stream(filename) as stream:
             validator.write_csv(stream)
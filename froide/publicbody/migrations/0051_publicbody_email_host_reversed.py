@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+from froide.helper.email_utils import get_reversed_email_host
+
+
+def set_email_host_reversed(apps, schema_editor):
+    PublicBody = apps.get_model("publicbody", "PublicBody")
+    qs = PublicBody.objects.exclude(email="").only("id", "email")
+    batch = []
+    for pb in qs.iterator(chunk_size=2000):
+        pb.email_host_reversed = get_reversed_email_host(pb.email)
+        batch.append(pb)
+        if len(batch) >= 2000:
+            PublicBody.objects.bulk_update(batch, ["email_host_reversed"])
+            batch = []
+    if batch:
+        PublicBody.objects.bulk_update(batch, ["email_host_reversed"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("publicbody", "0050_alter_publicbody_email"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicbody",
+            name="email_host_reversed",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(set_email_host_reversed, migrations.RunPython.noop),
+    ]
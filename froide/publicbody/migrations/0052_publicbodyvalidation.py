@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-17 14:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("publicbody", "0051_publicbody_email_host_reversed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicBodyValidation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field", models.CharField(max_length=20)),
+                ("value", models.TextField()),
+                ("error", models.BooleanField(default=False)),
+                ("result", models.TextField(blank=True)),
+                (
+                    "checked_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "publicbody",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="validations",
+                        to="publicbody.publicbody",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Public body validation",
+                "verbose_name_plural": "Public body validations",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="publicbodyvalidation",
+            constraint=models.UniqueConstraint(
+                fields=("publicbody", "field"), name="unique_publicbody_validation"
+            ),
+        ),
+    ]
@@ -25,6 +25,7 @@ from froide.helper.date_utils import (
     calculate_month_range_de,
     calculate_workingday_range,
 )
+from froide.helper.email_utils import get_reversed_email_host
 from froide.helper.templatetags.markup import markdown
 
 DEFAULT_LAW = settings.FROIDE_CONFIG.get("default_law", 1)
@@ -356,6 +357,16 @@ class PublicBodyManager(CurrentSiteManager):
     def get_for_search_index(self):
         return self.get_queryset()
 
+    def filter_by_email_host(self, email_host):
+        """
+        Public bodies with email addresses on email_host or its subdomains
+        """
+        reversed_host = get_reversed_email_host("@" + email_host)
+        return self.get_queryset().filter(
+            models.Q(email_host_reversed=reversed_host)
+            | models.Q(email_host_reversed__startswith=reversed_host + ".")
+        )
+
 
 class PublicBody(models.Model):
     name = models.CharField(_("Name"), max_length=255)
@@ -387,6 +398,9 @@ class PublicBody(models.Model):
     )
 
     email = models.EmailField(_("Email"), blank=True, default="", max_length=255)
+    email_host_reversed = models.CharField(
+        max_length=255, blank=True, default="", db_index=True, editable=False
+    )
     fax = models.CharField(max_length=50, blank=True)
     contact = models.TextField(_("Contact"), blank=True)
     address = models.TextField(_("Address"), blank=True)
@@ -486,6 +500,14 @@ class PublicBody(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.email_host_reversed = get_reversed_email_host(self.email)
+        if "update_fields" in kwargs and "email" in kwargs["update_fields"]:
+            kwargs["update_fields"] = {"email_host_reversed"}.union(
+                kwargs["update_fields"]
+            )
+        super().save(*args, **kwargs)
+
     @property
     def created_by(self):
         return self._created_by
@@ -769,3 +791,31 @@ class PublicBodyChangeProposal(models.Model):
                 "is_changed": set(categories) != set(self.publicbody.categories.all()),
             },
         }
+
+
+class PublicBodyValidation(models.Model):
+    """
+    Last validation result of one contact field of a public body
+    """
+
+    publicbody = models.ForeignKey(
+        PublicBody, on_delete=models.CASCADE, related_name="validations"
+    )
+    field = models.CharField(max_length=20)
+    # The validated value, a changed value needs to be validated again
+    value = models.TextField()
+    error = models.BooleanField(default=False)
+    result = models.TextField(blank=True)
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Public body validation")
+        verbose_name_plural = _("Public body validations")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["publicbody", "field"], name="unique_publicbody_validation"
+            )
+        ]
+
+    def __str__(self):
+        return "{} {}".format(self.publicbody_id, self.field)
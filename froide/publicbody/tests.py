@@ -1,6 +1,8 @@
 import json
 import os
 import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import BytesIO
 
 from django.contrib.gis.geos import MultiPolygon
@@ -18,7 +20,8 @@ from froide.publicbody.factories import (
 )
 
 from .csv_import import CSVImporter
-from .models import FoiLaw, Jurisdiction, PublicBody
+from .models import FoiLaw, Jurisdiction, PublicBody, PublicBodyValidation
+from .validators import ContactValidationEngine, validate_publicbodies
 
 
 class PublicBodyTest(TestCase):
@@ -160,6 +163,42 @@ Public Body X 76,pb-76@76.example.com,bund,,,http://example.com,,Ministry,Some c
         now_count = PublicBody.objects.all().count()
         self.assertEqual(now_count - 1, prev_count)
 
+    def test_csv_import_dry_run_and_parents(self):
+        ClassificationFactory.create(name="Ministry")
+        category = CategoryFactory.create(name="Health")
+        csv = """name,email,jurisdiction__slug,classification,parent__name,categories,source_reference
+Parent Body 77,pb-77@77.example.com,bund,Ministry,,Health,source:77
+Child Body 78,pb-78@78.example.com,bund,Ministry,Parent Body 77,,source:78"""
+        prev_count = PublicBody.objects.all().count()
+
+        imp = CSVImporter(dry_run=True)
+        changes = imp.import_from_file(BytesIO(csv.encode("utf-8")))
+        self.assertEqual([c.created for c in changes], [True, True])
+        self.assertEqual(PublicBody.objects.all().count(), prev_count)
+
+        imp = CSVImporter()
+        imp.import_from_file(BytesIO(csv.encode("utf-8")))
+        self.assertEqual(PublicBody.objects.all().count(), prev_count + 2)
+        parent = PublicBody.objects.get(source_reference="source:77")
+        child = PublicBody.objects.get(source_reference="source:78")
+        self.assertEqual(child.parent, parent)
+        self.assertEqual(list(parent.categories.all()), [category])
+        self.assertTrue(parent.laws.exists())
+        self.assertEqual(parent.email_host_reversed, "com.example.77")
+
+        # Unchanged rows are not updated again
+        imp = CSVImporter()
+        self.assertEqual(imp.import_from_file(BytesIO(csv.encode("utf-8"))), [])
+
+        csv = csv.replace("pb-78@78.example.com", "pb-78@79.example.com")
+        imp = CSVImporter(dry_run=True)
+        changes = imp.import_from_file(BytesIO(csv.encode("utf-8")))
+        self.assertEqual(
+            [(c.publicbody, c.fields) for c in changes], [(child, ["email"])]
+        )
+        child.refresh_from_db()
+        self.assertEqual(child.email, "pb-78@78.example.com")
+
     def test_csv_command(self):
         from django.core.management import call_command
 
@@ -265,3 +304,84 @@ class ApiTest(TestCase):
         self.assertEqual(response.status_code, 200)
         obj = json.loads(response.content.decode("utf-8"))
         self.assertEqual(obj["objects"], [])
+
+
+class StubResolver:
+    def __init__(self, domains):
+        self.domains = domains
+        self.queries = []
+
+    def resolve(self, domain, rdtype="A"):
+        import dns.resolver
+
+        self.queries.append((domain, rdtype))
+        if domain not in self.domains:
+            raise dns.resolver.NXDOMAIN()
+        mx = type("MX", (), {"preference": 10, "exchange": "mail." + domain})
+        return [mx]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path == "/old/":
+            self.send_response(301)
+            self.send_header("Location", "/new/")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ValidationTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_validate_publicbodies(self):
+        pbs = [
+            PublicBodyFactory.create(
+                email="info%d@example.org" % i,
+                url=self.base_url + "/",
+                fax="",
+            )
+            for i in range(3)
+        ]
+        bad_email = PublicBodyFactory.create(
+            email="info@invalid.example.org", url=self.base_url + "/", fax=""
+        )
+        moved = PublicBodyFactory.create(url=self.base_url + "/old/", fax="")
+        pbs.extend([bad_email, moved])
+        queryset = PublicBody.objects.filter(id__in=[pb.id for pb in pbs])
+
+        resolver = StubResolver({"example.org", moved.email.split("@")[1]})
+        engine = ContactValidationEngine(resolver=resolver, host_interval=0)
+        results = {r["id"]: r for r in validate_publicbodies(queryset, engine)}
+
+        self.assertEqual(set(results), {bad_email.id})
+        self.assertTrue(results[bad_email.id]["email_error"])
+        self.assertFalse(results[bad_email.id]["url_error"])
+        # Every domain and URL is only checked once
+        self.assertEqual(len(resolver.queries), 3)
+        self.assertEqual(sorted(self.server.paths), ["/", "/new/", "/old/"])
+        validation = PublicBodyValidation.objects.get(publicbody=moved, field="url")
+        self.assertEqual(validation.result, self.base_url + "/new/")
+
+        # Stored results are reused, changed values are validated again
+        PublicBody.objects.filter(id=bad_email.id).update(email="info@example.org")
+        self.server.paths = []
+        resolver = StubResolver({"example.org"})
+        engine = ContactValidationEngine(resolver=resolver, host_interval=0)
+        results = list(validate_publicbodies(queryset, engine))
+        self.assertEqual(results, [])
+        self.assertEqual(resolver.queries, [("example.org", "MX")])
+        self.assertEqual(self.server.paths, [])
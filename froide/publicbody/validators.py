@@ -1,11 +1,21 @@
 import csv
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
 
 from django import forms
 from django.conf import settings
+from django.utils import timezone
 
+import dns.exception
+import dns.name
+import dns.resolver
 import requests
 from pyisemail import is_email
+from pyisemail.diagnosis import BaseDiagnosis, DNSDiagnosis, ValidDiagnosis
 
 try:
     import phonenumbers
@@ -15,15 +25,25 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+VALIDATION_WORKERS = 16
+VALIDATION_CHUNK_SIZE = 500
+# Results older than this are validated again
+VALIDATION_MAX_AGE = timedelta(days=30)
+# Minimum seconds between two requests to the same host
+HOST_REQUEST_INTERVAL = 1.0
+URL_TIMEOUT = 10
+DNS_TIMEOUT = 5
+
 
 class PublicBodyValidator:
-    def __init__(self, pbs):
+    def __init__(self, pbs, engine=None):
         self.pbs = pbs
+        self.engine = engine
 
     def get_validation_results(self):
         self.is_valid = True
 
-        for res in validate_publicbodies(self.pbs):
+        for res in validate_publicbodies(self.pbs, engine=self.engine):
             self.is_valid = False
             yield res
 
@@ -37,61 +57,233 @@ class PublicBodyValidator:
             writer.writerow(result)
 
 
-def validate_publicbodies(queryset):
-    validators = [
-        (validate_email, "email"),
-        (validate_url, "url"),
-    ]
-    if phonenumbers is not None:
-        validators.append(
-            (
-                validate_fax,
-                "fax",
-            )
-        )
-
-    for pb in queryset.iterator():
-        result = run_validators(validators, pb)
-        if not result["error"]:
-            continue
-        result["id"] = pb.id
-        result["name"] = pb.name
-        yield result
-
-
-def run_validators(validators, pb):
-    results = {"error": False}
-    for validator, attr in validators:
-        val = getattr(pb, attr)
-        results[attr] = None
-        results[attr + "_error"] = False
-        if not val:
-            continue
+class KeyedCache:
+    """
+    Compute a value once per key, even when asked from many threads
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.results = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def get(self, key):
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.results:
+                try:
+                    self.results[key] = (self.func(key), None)
+                except forms.ValidationError as e:
+                    self.results[key] = (None, e)
+        value, error = self.results[key]
+        if error is not None:
+            raise error
+        return value
+
+
+class HostRateLimiter:
+    """
+    Space out requests to the same host by a minimum interval
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ContactValidationEngine:
+    """
+    Validates contact data of public bodies concurrently.
+
+    DNS lookups and URL checks are done once per domain and URL, requests
+    to the same host are rate limited. Results are stored per public body
+    and field, so only changed or stale values are validated again.
+    """
+
+    def __init__(
+        self,
+        workers=VALIDATION_WORKERS,
+        max_age=VALIDATION_MAX_AGE,
+        host_interval=HOST_REQUEST_INTERVAL,
+        resolver=None,
+        session=None,
+    ):
+        self.workers = workers
+        self.max_age = max_age
+        if resolver is None:
+            resolver = dns.resolver.Resolver()
+            resolver.lifetime = DNS_TIMEOUT
+        self.resolver = resolver
+        self.session = session
+        self.local = threading.local()
+        self.rate_limiter = HostRateLimiter(host_interval)
+        self.domain_cache = KeyedCache(self.get_domain_diagnosis)
+        self.url_cache = KeyedCache(self.fetch_url)
+
+        self.validators = [
+            (self.validate_email, "email"),
+            (self.validate_url, "url"),
+        ]
+        if phonenumbers is not None:
+            self.validators.append((validate_fax, "fax"))
+
+    def get_session(self):
+        if self.session is not None:
+            return self.session
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def get_domain_diagnosis(self, domain):
         try:
-            logger.debug("Validating %s of %s (%s)", attr, pb.name, pb.id)
-            ret = validator(val)
+            records = self.resolver.resolve(domain, "MX")
+        except (dns.resolver.NXDOMAIN, dns.name.NameTooLong):
+            return DNSDiagnosis("NO_RECORD")
+        except dns.resolver.NoAnswer:
+            try:
+                self.resolver.resolve(domain, "A")
+            except dns.exception.DNSException:
+                return DNSDiagnosis("NO_RECORD")
+            return DNSDiagnosis("NO_MX_RECORD")
+        except dns.resolver.NoNameservers:
+            return DNSDiagnosis("NO_NAMESERVERS")
+        except dns.exception.Timeout:
+            return DNSDiagnosis("DNS_TIMEDOUT")
+        if len(records) == 1:
+            if records[0].preference == 0 and len(records[0].exchange) <= 1:
+                return DNSDiagnosis("NULL_MX_RECORD")
+        return ValidDiagnosis()
+
+    def validate_email(self, email):
+        diagnosis = is_email(email, diagnose=True)
+        if diagnosis < BaseDiagnosis.CATEGORIES["DNSWARN"]:
+            domain = email.rsplit("@", 1)[1].lower()
+            diagnosis = max(diagnosis, self.domain_cache.get(domain))
+        if diagnosis.diagnosis_type != "VALID":
+            raise forms.ValidationError(diagnosis.diagnosis_type, code=diagnosis.code)
+
+    def fetch_url(self, url):
+        self.rate_limiter.wait(urlsplit(url).hostname)
+        try:
+            response = self.get_session().get(url, timeout=URL_TIMEOUT)
+        except Exception as e:
+            raise forms.ValidationError(str(e)) from e
+        if response.history:
+            return response.url
+
+    def validate_url(self, url):
+        return self.url_cache.get(url)
+
+    def run_validator(self, validator, value):
+        try:
+            ret = validator(value)
         except forms.ValidationError as e:
-            results[attr] = "\n".join(e)
-            results[attr + "_error"] = True
-            results["error"] = True
-        else:
-            results[attr] = ret
-    return results
+            return True, "\n".join(e)
+        return False, ret or ""
+
+    def validate(self, queryset):
+        """
+        Yield validation results of public bodies with invalid contact data
+        """
+        queryset = queryset.only("id", "name", "email", "url", "fax")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            chunk = []
+            for pb in queryset.iterator(chunk_size=VALIDATION_CHUNK_SIZE):
+                chunk.append(pb)
+                if len(chunk) >= VALIDATION_CHUNK_SIZE:
+                    yield from self.validate_chunk(chunk, executor)
+                    chunk = []
+            if chunk:
+                yield from self.validate_chunk(chunk, executor)
 
+    def validate_chunk(self, pbs, executor):
+        from .models import PublicBodyValidation
 
-def validate_email(email):
-    diagnosis = is_email(email, diagnose=True, check_dns=True)
-    if diagnosis.diagnosis_type != "VALID":
-        raise forms.ValidationError(diagnosis.diagnosis_type, code=diagnosis.code)
+        stored = {
+            (v.publicbody_id, v.field): v
+            for v in PublicBodyValidation.objects.filter(
+                publicbody_id__in=[pb.id for pb in pbs]
+            )
+        }
+        now = timezone.now()
+        futures = {}
+        for pb in pbs:
+            for validator, attr in self.validators:
+                value = getattr(pb, attr)
+                if not value:
+                    continue
+                validation = stored.get((pb.id, attr))
+                if (
+                    validation is not None
+                    and validation.value == value
+                    and validation.checked_at > now - self.max_age
+                ):
+                    continue
+                logger.debug("Validating %s of %s (%s)", attr, pb.name, pb.id)
+                futures[(pb.id, attr, value)] = executor.submit(
+                    self.run_validator, validator, value
+                )
 
+        updated = []
+        for (pb_id, attr, value), future in futures.items():
+            error, result = future.result()
+            validation = PublicBodyValidation(
+                publicbody_id=pb_id,
+                field=attr,
+                value=value,
+                error=error,
+                result=result,
+                checked_at=now,
+            )
+            stored[(pb_id, attr)] = validation
+            updated.append(validation)
+        if updated:
+            PublicBodyValidation.objects.bulk_create(
+                updated,
+                update_conflicts=True,
+                unique_fields=["publicbody", "field"],
+                update_fields=["value", "error", "result", "checked_at"],
+            )
+        logger.info("Validated %d values of %d public bodies", len(updated), len(pbs))
 
-def validate_url(url):
-    try:
-        response = requests.get(url, timeout=10)
-    except Exception as e:
-        raise forms.ValidationError(str(e)) from e
-    if response.history:
-        return response.url
+        for pb in pbs:
+            result = self.get_result(pb, stored)
+            if not result["error"]:
+                continue
+            result["id"] = pb.id
+            result["name"] = pb.name
+            yield result
+
+    def get_result(self, pb, stored):
+        results = {"error": False}
+        for _validator, attr in self.validators:
+            results[attr] = None
+            results[attr + "_error"] = False
+            if not getattr(pb, attr):
+                continue
+            validation = stored[(pb.id, attr)]
+            results[attr] = validation.result or None
+            if validation.error:
+                results[attr + "_error"] = True
+                results["error"] = True
+        return results
+
+
+def validate_publicbodies(queryset, engine=None):
+    if engine is None:
+        engine = ContactValidationEngine()
+    yield from engine.validate(queryset)
 
 
 def validate_fax(fax):
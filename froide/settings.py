@@ -148,7 +148,12 @@ class Base(Configuration):
     # Sub path in MEDIA_ROOT that will hold FOI attachments
     FOI_MEDIA_PATH = values.Value("foi")
     FOI_MEDIA_TOKEN_EXPIRY = 2 * 60
+    # Cache rendered request and message PDFs in FOI_MEDIA_PATH
+    FOI_PDF_CACHE = values.BooleanValue(True)
     INTERNAL_MEDIA_PREFIX = values.Value("/protected/")
+    # Absolute filesystem path to files that must never be served from
+    # MEDIA_ROOT, e.g. spooled raw mails and request packages
+    PRIVATE_MEDIA_ROOT = values.Value(BASE_DIR / "private")
 
     # Absolute path to the directory static files should be collected to.
     # Don't put anything in this directory yourself; store your static files
@@ -376,6 +381,8 @@ class Base(Configuration):
     # ALLOWED_HOSTS = ()
     ALLOWED_REDIRECT_HOSTS = ()
 
+    # Database sessions indexed by user
+    SESSION_ENGINE = values.Value("froide.account.session_backend")
     SESSION_COOKIE_AGE = values.IntegerValue(3628800)  # six weeks
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = False
@@ -439,6 +446,14 @@ class Base(Configuration):
             "task": "froide.upload.tasks.remove_expired_uploads",
             "schedule": crontab(hour=3, minute=30),
         },
+        "package-maintenance": {
+            "task": "froide.foirequest.tasks.remove_old_packages_task",
+            "schedule": crontab(hour=3, minute=45),
+        },
+        "pdf-cache-maintenance": {
+            "task": "froide.foirequest.tasks.remove_old_cached_pdfs_task",
+            "schedule": crontab(hour=3, minute=50),
+        },
     }
 
     CELERY_TASK_ALWAYS_EAGER = values.BooleanValue(True)
@@ -446,6 +461,7 @@ class Base(Configuration):
     CELERY_TASK_ROUTES = {
         "froide.foirequest.tasks.fetch_mail": {"queue": "emailfetch"},
         "froide.foirequest.tasks.process_mail": {"queue": "email"},
+        "froide.foirequest.tasks.process_spooled_mail": {"queue": "email"},
         "djcelery_email_send_multiple": {"queue": "emailsend"},
         "froide.helper.tasks.search_*": {"queue": "searchindex"},
         "froide.foirequest.tasks.redact_attachment_task": {"queue": "redact"},
@@ -512,6 +528,8 @@ class Base(Configuration):
     OAUTH2_PROVIDER_APPLICATION_MODEL = "account.Application"
 
     LOGIN_URL = "account-login"
+    # Number of threads running data exporters concurrently
+    ACCOUNT_EXPORT_WORKERS = values.IntegerValue(4)
 
     REST_FRAMEWORK = {
         "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -632,6 +650,11 @@ class Base(Configuration):
     # allow override of settings.LANGUAGE_CODE for Tesseract
     TESSERACT_LANGUAGE = None
 
+    # Diff used to mark redactions, "sequencematcher" or "redaction".
+    # "redaction" is much faster on long texts but can mark a few spans
+    # differently after insertions or deletions.
+    TEXT_DIFF_BACKEND = values.Value("sequencematcher")
+
     # ###### Email ##############
 
     # Django settings
@@ -708,6 +731,10 @@ class TestBase(Base):
         "django.contrib.auth.hashers.MD5PasswordHasher",
     ]
 
+    FOI_PDF_CACHE = False
+    # Test data is only visible in the test's database connection
+    ACCOUNT_EXPORT_WORKERS = 1
+
     ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = (
         "django_elasticsearch_dsl.signals.BaseSignalProcessor"
     )
@@ -750,6 +777,10 @@ class TestBase(Base):
     def MEDIA_ROOT(self):
         return super().PROJECT_ROOT / "tests" / "testdata"
 
+    @property
+    def PRIVATE_MEDIA_ROOT(self):
+        return super().PROJECT_ROOT / "tests" / "testdata" / "private"
+
     ALLOWED_HOSTS = ("localhost", "testserver")
 
     ELASTICSEARCH_INDEX_PREFIX = "froide_test"
@@ -13,5 +13,6 @@ tus_api_extensions = [
     "termination",
     "checksum",
     "expiration",
+    "concatenation",
 ]
 tus_api_checksum_algorithms = ["md5", "sha1", "sha224", "sha256", "sha384", "sha512"]
@@ -1,8 +1,11 @@
+import io
 import json
 import logging
+import uuid
+from urllib.parse import urlparse
 
 from django.http import Http404
-from django.urls import reverse
+from django.urls import Resolver404, resolve, reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -23,9 +26,9 @@ from . import (
 )
 from . import settings as tus_settings
 from .exceptions import Conflict, TusParseError
-from .models import Upload, states
+from .models import Upload, concat_types, states
 from .serializers import UploadCreateSerializer, UploadSerializer
-from .utils import augment_request, checksum_matches, encode_upload_metadata
+from .utils import augment_request, encode_upload_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +46,7 @@ class TusUploadStreamParser(BaseParser):
     media_type = "application/offset+octet-stream"
 
     def parse(self, stream, media_type=None, parser_context=None):
-        return DataAndFiles({"chunk": stream.body}, {})
+        return DataAndFiles({"chunk": stream}, {})
 
 
 class UploadMetadata(BaseMetadata):
@@ -102,6 +105,9 @@ class TusHeadMixin(object):
         if upload.upload_metadata:
             headers["Upload-Metadata"] = encode_upload_metadata(upload.get_metadata())
 
+        if upload.upload_concat:
+            headers["Upload-Concat"] = upload.upload_concat
+
         # Add upload expiry to headers
         add_expiry_header(upload, headers)
 
@@ -120,6 +126,24 @@ class TusCreateMixin(mixins.CreateModelMixin):
         # Get file size from request
         upload_length = getattr(request, constants.UPLOAD_LENGTH_FIELD_NAME, -1)
 
+        # Get partial uploads of a final upload (https://tus.io/protocols/resumable-upload#concatenation)
+        upload_concat = ""
+        partial_uploads = []
+        concat_type, upload_urls = getattr(
+            request, constants.UPLOAD_CONCAT_FIELD_NAME, ("", [])
+        )
+        if concat_type == concat_types.PARTIAL:
+            upload_concat = concat_types.PARTIAL
+        elif concat_type == concat_types.FINAL:
+            partial_uploads = self.get_partial_uploads(upload_urls)
+            if partial_uploads is None:
+                return Response(
+                    'Invalid "Upload-Concat". Partial uploads must exist and be complete.',
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            upload_concat = "{};{}".format(concat_types.FINAL, " ".join(upload_urls))
+            upload_length = sum(upload.upload_length for upload in partial_uploads)
+
         # Validate upload_length
         max_file_size = getattr(self, "max_file_size", tus_settings.TUS_MAX_FILE_SIZE)
         if upload_length > max_file_size:
@@ -151,6 +175,7 @@ class TusCreateMixin(mixins.CreateModelMixin):
                 "upload_length": upload_length,
                 "upload_metadata": json.dumps(upload_metadata),
                 "filename": filename,
+                "upload_concat": upload_concat,
                 "user": request.user.pk if request.user.is_authenticated else None,
                 "token": (
                     request.session.get("upload_auth")
@@ -169,6 +194,9 @@ class TusCreateMixin(mixins.CreateModelMixin):
         # Get upload from serializer
         upload = serializer.instance
 
+        if partial_uploads:
+            upload.concatenate(partial_uploads)
+
         # Prepare response headers
         headers = self.get_success_headers(serializer.data)
 
@@ -187,6 +215,35 @@ class TusCreateMixin(mixins.CreateModelMixin):
             serializer.data, headers=headers, status=status.HTTP_201_CREATED
         )
 
+    def get_partial_uploads(self, upload_urls):
+        """
+        Returns the complete partial uploads in the order of their urls or None
+        :param list upload_urls:
+        :return list:
+        """
+        guids = []
+        for upload_url in upload_urls:
+            try:
+                match = resolve(urlparse(upload_url).path)
+                guids.append(uuid.UUID(match.kwargs["guid"]))
+            except (Resolver404, KeyError, ValueError):
+                return None
+
+        uploads = (
+            self.get_queryset()
+            .filter(guid__in=guids, upload_concat=concat_types.PARTIAL)
+            .in_bulk(field_name="guid")
+        )
+        partial_uploads = [uploads.get(guid) for guid in guids]
+        if any(
+            upload is None
+            or not upload.is_complete()
+            or not upload.temporary_file_exists()
+            for upload in partial_uploads
+        ):
+            return None
+        return partial_uploads
+
     def get_success_headers(self, data):
         try:
             return {
@@ -215,19 +272,12 @@ class TusCreateMixin(mixins.CreateModelMixin):
 
 class TusPatchMixin(mixins.UpdateModelMixin):
     def get_chunk(self, request):
-        if TusUploadStreamParser in self.parser_classes:
-            return request.data["chunk"]
-        return request.body
-
-    def validate_chunk(self, offset, chunk_bytes):
         """
-        Handler to validate chunks before they are actually written to the buffer file. Should throw a ValidationError
-          if something's off.
-        :param int offset:
-        :param six.binary_type chunk_bytes:
-        :return six.binary_type: The chunk_bytes
+        Returns the request body as a stream, so chunks are never read into memory as a whole
         """
-        return chunk_bytes
+        if TusUploadStreamParser in self.parser_classes:
+            return request.data.get("chunk")
+        return io.BytesIO(request.body)
 
     def update(self, request, *args, **kwargs):
         raise MethodNotAllowed
@@ -252,6 +302,12 @@ class TusPatchMixin(mixins.UpdateModelMixin):
         # Retrieve object
         upload = self.get_object()
 
+        # Final uploads are concatenated from partial uploads only
+        if upload.upload_concat.startswith(concat_types.FINAL):
+            return Response(
+                "Final uploads cannot be patched.", status=status.HTTP_403_FORBIDDEN
+            )
+
         # Get upload_offset
         upload_offset = getattr(request, constants.UPLOAD_OFFSET_NAME)
 
@@ -259,6 +315,26 @@ class TusPatchMixin(mixins.UpdateModelMixin):
         if upload_offset != upload.upload_offset:
             raise Conflict
 
+        # Check checksum algorithm (http://tus.io/protocols/resumable-upload.html#checksum)
+        upload_checksum = getattr(request, constants.UPLOAD_CHECKSUM_FIELD_NAME, None)
+        if upload_checksum is not None:
+            if upload_checksum[0] not in tus_api_checksum_algorithms:
+                return Response(
+                    "Unsupported Checksum Algorithm: {}.".format(upload_checksum[0]),
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        # Validate chunk length
+        chunk_length = int(request.headers.get("content-length") or 0)
+        if (
+            upload.upload_length >= 0
+            and upload_offset + chunk_length > upload.upload_length
+        ):
+            return Response(
+                'Invalid "Content-Length". Chunk exceeds "Upload-Length".',
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
         # Make sure there is a tempfile for the upload
         assert upload.get_or_create_temporary_file()
 
@@ -267,45 +343,28 @@ class TusPatchMixin(mixins.UpdateModelMixin):
             upload.start_receiving()
             upload.save()
 
-        # Get chunk from request
-        chunk_bytes = self.get_chunk(request)
+        # Get chunk stream from request
+        chunk_stream = self.get_chunk(request)
 
         # Check for data
-        if not chunk_bytes:
+        if chunk_stream is None or chunk_length == 0:
             return Response("No data.", status=status.HTTP_400_BAD_REQUEST)
 
-        # Check checksum  (http://tus.io/protocols/resumable-upload.html#checksum)
-        upload_checksum = getattr(request, constants.UPLOAD_CHECKSUM_FIELD_NAME, None)
-        if upload_checksum is not None:
-            if upload_checksum[0] not in tus_api_checksum_algorithms:
-                return Response(
-                    "Unsupported Checksum Algorithm: {}.".format(upload_checksum[0]),
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            else:
-                matches = checksum_matches(
-                    upload_checksum[0], upload_checksum[1], chunk_bytes
-                )
-                if not matches:
-                    return Response("Checksum Mismatch.", status=460)
-
-        # Run chunk validator
-        chunk_bytes = self.validate_chunk(upload_offset, chunk_bytes)
-
-        # Check for data
-        if not chunk_bytes:
-            return Response(
-                'No data. Make sure "validate_chunk" returns data.',
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         # Write file
-        chunk_size = int(request.headers.get("content-length", 102400))
         try:
-            upload.write_data(chunk_bytes, chunk_size)
+            checksum_matches = upload.write_stream(
+                chunk_stream, length=chunk_length, checksum=upload_checksum
+            )
         except Exception as e:
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
+        if not checksum_matches:
+            return Response("Checksum Mismatch.", status=460)
+
+        # Check for data
+        if upload.upload_offset == upload_offset:
+            return Response("No data.", status=status.HTTP_400_BAD_REQUEST)
+
         headers = {
             "Upload-Offset": upload.upload_offset,
         }
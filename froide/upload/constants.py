@@ -5,3 +5,4 @@ UPLOAD_LENGTH_FIELD_NAME = "tus_upload_length"
 UPLOAD_OFFSET_NAME = "tus_upload_offset"
 UPLOAD_METADATA_FIELD_NAME = "tus_upload_metadata"
 UPLOAD_CHECKSUM_FIELD_NAME = "tus_upload_checksum"
+UPLOAD_CONCAT_FIELD_NAME = "tus_upload_concat"
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("upload", "0002_upload_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="upload",
+            name="upload_concat",
+            field=models.TextField(blank=True),
+        ),
+    ]
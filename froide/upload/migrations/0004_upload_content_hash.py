@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("upload", "0003_upload_upload_concat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="upload",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import tempfile
@@ -13,7 +14,8 @@ from django.utils.translation import gettext_lazy as _
 
 from django_fsm import FSMField, transition
 
-from .utils import write_bytes_to_file
+from . import settings as tus_settings
+from .utils import concatenate_files, write_bytes_to_file, write_stream_to_file
 
 
 class states:
@@ -23,11 +25,21 @@ class states:
     DONE = "done"
 
 
+class concat_types:
+    PARTIAL = "partial"
+    FINAL = "final"
+
+
 class TusFile(File):
     """
     A TUS uploaded file, allow direct move
     """
 
+    def __init__(self, file, name=None, content_hash=""):
+        super().__init__(file, name=name)
+        # sha256 of the content if it was computed while uploading
+        self.content_hash = content_hash
+
     def temporary_file_path(self):
         """Return the full path of this file."""
         return self.file.name
@@ -53,6 +65,9 @@ class AbstractUpload(models.Model):
 
     expires = models.DateTimeField(null=True, blank=True)
 
+    upload_concat = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+
     class Meta:
         abstract = True
 
@@ -73,6 +88,61 @@ class AbstractUpload(models.Model):
             self.upload_offset += num_bytes_written
             self.save()
 
+    def write_stream(self, stream, length=None, checksum=None):
+        """
+        Copy the stream to the temporary file at the current offset.
+        The offset is only advanced if the checksum matches
+        :return bool: Whether or not the checksum matched
+        """
+        hashers = []
+        checksum_hasher = None
+        if checksum is not None:
+            checksum_hasher = hashlib.new(checksum[0])
+            hashers.append(checksum_hasher)
+        content_hasher = None
+        if self.upload_offset == 0 and length == self.upload_length:
+            # Whole file in one chunk, hash it for storage on the way
+            content_hasher = hashlib.sha256()
+            hashers.append(content_hasher)
+
+        num_bytes_written = write_stream_to_file(
+            self.temporary_file_path,
+            self.upload_offset,
+            stream,
+            length=length,
+            hashers=hashers,
+            makedirs=True,
+        )
+        if checksum_hasher is not None and checksum_hasher.hexdigest() != checksum[1]:
+            os.truncate(self.temporary_file_path, self.upload_offset)
+            return False
+
+        if num_bytes_written > 0:
+            self.upload_offset += num_bytes_written
+            update_fields = ["upload_offset"]
+            if content_hasher is not None and self.is_complete():
+                self.content_hash = content_hasher.hexdigest()
+                update_fields.append("content_hash")
+            self.save(update_fields=update_fields)
+        return True
+
+    def concatenate(self, partial_uploads):
+        """
+        Write the partial uploads into the temporary file and delete them
+        """
+        self.get_or_create_temporary_file()
+        content_hasher = hashlib.sha256()
+        self.upload_offset = concatenate_files(
+            self.temporary_file_path,
+            [upload.temporary_file_path for upload in partial_uploads],
+            hashers=[content_hasher],
+        )
+        self.content_hash = content_hasher.hexdigest()
+        self.start_receiving()
+        self.save()
+        for upload in partial_uploads:
+            upload.delete()
+
     @property
     def size(self):
         return self.upload_offset
@@ -94,7 +164,9 @@ class AbstractUpload(models.Model):
         if not self.is_complete():
             return None
         if self.temporary_file_exists():
-            return TusFile(open(self.temporary_file_path, "rb"))
+            return TusFile(
+                open(self.temporary_file_path, "rb"), content_hash=self.content_hash
+            )
         return None
 
     def generate_filename(self):
@@ -120,7 +192,12 @@ class AbstractUpload(models.Model):
 
     def get_or_create_temporary_file(self):
         if not self.temporary_file_path:
-            fd, path = tempfile.mkstemp(prefix="tus-upload-")
+            # Inside the media file system uploads can be moved instead of copied
+            if tus_settings.TUS_UPLOAD_DIR:
+                os.makedirs(tus_settings.TUS_UPLOAD_DIR, exist_ok=True)
+            fd, path = tempfile.mkstemp(
+                prefix="tus-upload-", dir=tus_settings.TUS_UPLOAD_DIR
+            )
             os.close(fd)
             self.temporary_file_path = path
             self.save()
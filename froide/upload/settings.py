@@ -10,3 +10,5 @@ TUS_UPLOAD_EXPIRES = TUS_SETTINGS.get(
 )
 TUS_MAX_FILE_SIZE = TUS_SETTINGS.get("MAX_FILE_SIZE", 4294967296)  # in bytes
 TUS_FILENAME_METADATA_FIELD = TUS_SETTINGS.get("FILENAME_METADATA_FIELD", "filename")
+# Directory for incomplete uploads, defaults to the system temp directory
+TUS_UPLOAD_DIR = TUS_SETTINGS.get("UPLOAD_DIR", None)
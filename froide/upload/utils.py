@@ -6,6 +6,9 @@ from base64 import b64decode, b64encode
 
 from . import constants
 
+# Size of blocks read from request streams and written to upload files
+UPLOAD_BLOCK_SIZE = 64 * 1024
+
 
 def encode_base64_to_string(data):
     """
@@ -75,6 +78,58 @@ def write_bytes_to_file(file_path, offset, bytes, makedirs=False):
     return num_bytes_written
 
 
+def write_stream_to_file(
+    file_path, offset, stream, length=None, hashers=(), makedirs=False
+):
+    """
+    Util to copy a stream to a local file at a specific offset in fixed-size blocks
+    :param str file_path:
+    :param int offset:
+    :param stream: A file-like object to read from
+    :param int length: Maximum amount of bytes to read from the stream
+    :param hashers: hashlib objects to update with the written bytes
+    :param bool makedirs: Whether or not to create the file_path's directories if they don't exist
+    :return int: The amount of bytes written
+    """
+    if makedirs:
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+
+    num_bytes_written = 0
+    mode = "r+b" if os.path.exists(file_path) else "wb"
+    with open(file_path, mode) as fh:
+        fh.seek(offset, os.SEEK_SET)
+        while length is None or num_bytes_written < length:
+            block_size = UPLOAD_BLOCK_SIZE
+            if length is not None:
+                block_size = min(block_size, length - num_bytes_written)
+            block = stream.read(block_size)
+            if not block:
+                break
+            for hasher in hashers:
+                hasher.update(block)
+            fh.write(block)
+            num_bytes_written += len(block)
+    return num_bytes_written
+
+
+def concatenate_files(file_path, source_paths, hashers=()):
+    """
+    Util to write the contents of several local files into one
+    :param str file_path: The local path of the file to write
+    :param list source_paths: The local paths of the files to concatenate
+    :param hashers: hashlib objects to update with the written bytes
+    :return int: The amount of bytes written
+    """
+    num_bytes_written = 0
+    for source_path in source_paths:
+        with open(source_path, "rb") as source:
+            num_bytes_written += write_stream_to_file(
+                file_path, num_bytes_written, source, hashers=hashers
+            )
+    return num_bytes_written
+
+
 def read_bytes_from_field_file(field_file):
     """
     Returns the bytes read from a FieldFile
@@ -159,6 +214,7 @@ def augment_request(request):
     parse_upload_length(request)
     parse_upload_checksum(request)
     parse_upload_metadata(request)
+    parse_upload_concat(request)
     return request
 
 
@@ -250,6 +306,32 @@ def parse_upload_metadata(request):
     setattr(request, constants.UPLOAD_METADATA_FIELD_NAME, upload_metadata)
 
 
+def parse_upload_concat(request):
+    upload_concat_header = get_header(request, "Upload-Concat", None)
+
+    if upload_concat_header is None:
+        return
+
+    if upload_concat_header == "partial":
+        upload_concat = ("partial", [])
+    elif upload_concat_header.startswith("final;"):
+        upload_urls = upload_concat_header[len("final;") :].split()
+        if not upload_urls:
+            raise ValueError(
+                'Invalid value for "Upload-Concat" header: {}.'.format(
+                    upload_concat_header
+                )
+            )
+        upload_concat = ("final", upload_urls)
+    else:
+        raise ValueError(
+            'Invalid value for "Upload-Concat" header: {}.'.format(upload_concat_header)
+        )
+
+    # Set upload concat type and partial upload urls
+    setattr(request, constants.UPLOAD_CONCAT_FIELD_NAME, upload_concat)
+
+
 def get_header(request, key, default_value=None):
     # First, we try to retrieve the key in the "headers" dictionary
     result = request.META.get("headers", {}).get(key, None)
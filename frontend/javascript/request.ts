@@ -42,7 +42,9 @@ const initRequestPage = (): void => {
   initReplyForm()
 
   // if url query parameter found, scroll to comment next
-  scrollToAnchor(messages)
+  void initMessageThreadGap(messages).then(() => {
+    scrollToAnchor(messages)
+  })
 
   // init reply buttons
   const replyButtonTop = document.getElementById('alpha-reply-button-top')
@@ -207,6 +209,67 @@ const parseMessageContainers = (): Message[] => {
   return messages
 }
 
+const loadMessageThreadGap = async (
+  gap: HTMLElement,
+  messages: Message[]
+): Promise<void> => {
+  const url = gap.dataset.fragmentUrl
+  if (!url) return
+  const response = await fetch(url, { credentials: 'same-origin' })
+  if (!response.ok) {
+    throw new Error(`Loading messages failed: ${response.status}`)
+  }
+  const template = document.createElement('template')
+  template.innerHTML = await response.text()
+  const loaded = Array.from(
+    template.content.querySelectorAll<HTMLElement>('.alpha-message')
+  )
+  gap.parentElement?.insertBefore(template.content, gap)
+  gap.remove()
+  if (loaded.length === 0) return
+  // keep messages in document order
+  const insertAt = messages.findIndex(
+    (m) =>
+      (loaded[0].compareDocumentPosition(m.element) &
+        Node.DOCUMENT_POSITION_FOLLOWING) !==
+      0
+  )
+  const newMessages = loaded.map((el) => new Message(el, false, false))
+  messages.splice(
+    insertAt === -1 ? messages.length : insertAt,
+    0,
+    ...newMessages
+  )
+}
+
+const initMessageThreadGap = async (messages: Message[]): Promise<void> => {
+  // long threads leave out older messages, load them on demand
+  const gap = document.querySelector<HTMLElement>('.js-message-thread-gap')
+  if (gap == null) return
+  const link = gap.querySelector('a')
+  link?.addEventListener('click', (e) => {
+    e.preventDefault()
+    link.classList.add('disabled')
+    loadMessageThreadGap(gap, messages).catch((err) => {
+      console.error(err)
+      // fall back to rendering the full thread
+      window.location.href = link.href
+    })
+  })
+  const urlParams = new URLSearchParams(window.location.search)
+  const msgParam = urlParams.get('msg')
+  const targetId = msgParam
+    ? `nachricht-${msgParam}`
+    : window.location.hash.substring(1)
+  if (targetId && document.getElementById(targetId) == null) {
+    try {
+      await loadMessageThreadGap(gap, messages)
+    } catch (err) {
+      console.error(err)
+    }
+  }
+}
+
 const initMessageMarks = (): void => {
   document
     .querySelectorAll<HTMLElement>('[data-messagemark]')